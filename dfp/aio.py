@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+# An asyncio version of the dfp modules' functions, for Python 3. Each takes
+# the same arguments as the blocking function it mirrors, plus an optional
+# `timeout` in seconds, and returns an awaitable that runs the blocking
+# function on a shared thread pool.
+#
+# Cancelling an awaitable, or reaching its timeout, stops a call that hasn't
+# started yet. A call that already started runs to completion in its thread,
+# because SOAP requests can't be interrupted; its result is discarded.
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dfp.associate_line_items_and_creatives
+import dfp.batch
+import dfp.create_creatives
+import dfp.create_custom_targeting
+import dfp.create_line_items
+import dfp.create_orders
+import dfp.get_ad_units
+import dfp.get_advertisers
+import dfp.get_custom_targeting
+import dfp.get_line_items
+import dfp.get_orders
+import dfp.get_placements
+import dfp.get_users
+import dfp.update_line_items
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+  """
+  Gets the thread pool that runs blocking DFP calls, creating it with
+  DFP_MAX_WORKERS threads the first time.
+
+  Returns:
+    a concurrent.futures.Executor
+  """
+  global _executor
+
+  with _executor_lock:
+    if _executor is None:
+      _executor = ThreadPoolExecutor(
+        max_workers=dfp.batch.get_max_workers())
+    return _executor
+
+def set_executor(executor):
+  """
+  Replaces the thread pool that runs blocking DFP calls, e.g. with one
+  managed by the host application. The previous pool is not shut down.
+
+  Args:
+    executor (concurrent.futures.Executor)
+  Returns:
+    None
+  """
+  global _executor
+
+  with _executor_lock:
+    _executor = executor
+
+def shutdown(wait=True):
+  """
+  Shuts down the thread pool. A new one is created on the next call.
+
+  Args:
+    wait (bool): whether to wait for running calls to finish
+  Returns:
+    None
+  """
+  global _executor
+
+  with _executor_lock:
+    executor, _executor = _executor, None
+  if executor is not None:
+    executor.shutdown(wait=wait)
+
+def _get_loop():
+  if hasattr(asyncio, 'get_running_loop'):
+    try:
+      return asyncio.get_running_loop()
+    except RuntimeError:
+      # Called outside a coroutine; use the thread's event loop.
+      pass
+  return asyncio.get_event_loop()
+
+def run(func, *args, **kwargs):
+  """
+  Runs a blocking function on the thread pool.
+
+  Args:
+    func (function)
+    args: the function's positional arguments
+    kwargs: the function's keyword arguments, and optionally `timeout`: the
+      number of seconds to wait before raising asyncio.TimeoutError
+  Returns:
+    an awaitable of the function's return value
+  """
+  timeout = kwargs.pop('timeout', None)
+  future = _get_loop().run_in_executor(get_executor(),
+    functools.partial(func, *args, **kwargs))
+  if timeout is None:
+    return future
+  return asyncio.wait_for(future, timeout)
+
+def _mirror(module, name):
+  """
+  Makes an async version of a blocking dfp function. The function is looked
+  up on each call, so it can be patched in tests.
+  """
+  blocking_func = getattr(module, name)
+
+  @functools.wraps(blocking_func)
+  def async_func(*args, **kwargs):
+    return run(getattr(module, name), *args, **kwargs)
+
+  return async_func
+
+get_user_id_by_email = _mirror(dfp.get_users, 'get_user_id_by_email')
+
+get_advertiser_id_by_name = _mirror(dfp.get_advertisers,
+  'get_advertiser_id_by_name')
+
+get_placement_ids_by_name = _mirror(dfp.get_placements,
+  'get_placement_ids_by_name')
+
+get_ad_unit_ids_by_name = _mirror(dfp.get_ad_units, 'get_ad_unit_ids_by_name')
+
+get_order_by_name = _mirror(dfp.get_orders, 'get_order_by_name')
+
+get_all_orders = _mirror(dfp.get_orders, 'get_all_orders')
+
+get_key_id_by_name = _mirror(dfp.get_custom_targeting, 'get_key_id_by_name')
+
+get_key_ids_by_name = _mirror(dfp.get_custom_targeting, 'get_key_ids_by_name')
+
+get_targeting_by_key_name = _mirror(dfp.get_custom_targeting,
+  'get_targeting_by_key_name')
+
+get_value_catalog = _mirror(dfp.get_custom_targeting, 'get_value_catalog')
+
+get_line_items_by_order_id = _mirror(dfp.get_line_items,
+  'get_line_items_by_order_id')
+
+create_order = _mirror(dfp.create_orders, 'create_order')
+
+create_creatives = _mirror(dfp.create_creatives, 'create_creatives')
+
+create_targeting_keys = _mirror(dfp.create_custom_targeting,
+  'create_targeting_keys')
+
+create_targeting_values = _mirror(dfp.create_custom_targeting,
+  'create_targeting_values')
+
+create_line_items = _mirror(dfp.create_line_items, 'create_line_items')
+
+update_line_items = _mirror(dfp.update_line_items, 'update_line_items')
+
+archive_line_items = _mirror(dfp.update_line_items, 'archive_line_items')
+
+make_licas = _mirror(dfp.associate_line_items_and_creatives, 'make_licas')
@@ -2,34 +2,30 @@
 import logging
 from googleads import dfp
 
-from dfp.client import get_client
+import settings
+from dfp.batch import DEFAULT_BATCH_SIZE, map_batches
+from dfp.client import get_service
+from dfp.retry import call_with_bisection
 
 
 logger = logging.getLogger(__name__)
 
-def make_licas(line_item_ids, creative_ids, size_overrides=[]):
+def generate_licas(line_item_ids, creative_ids, sizes):
   """
-  Attaches creatives to line items in DFP.
+  Lazily generates a line item <> creative association for every pair of
+  line item and creative.
 
   Args:
     line_item_ids (arr): an array of line item IDs
     creative_ids (arr): an array of creative IDs
+    sizes (arr): the size overrides; every association shares this array,
+      so it must not be modified
   Returns:
-    None
+    a generator of objects, each a LICA configuration
   """
-  dfp_client = get_client()
-  lica_service = dfp_client.GetService(
-    'LineItemCreativeAssociationService', version='v201802')
-
-  sizes = []
-
-  for size_override in size_overrides:
-    sizes.append(size_override)
-
-  licas = []
   for line_item_id in line_item_ids:
     for creative_id in creative_ids:
-      licas.append({
+      yield {
         'creativeId': creative_id,
         'lineItemId': line_item_id,
         # "Overrides the value set for Creative.size, which allows the
@@ -40,11 +36,48 @@ def make_licas(line_item_ids, creative_ids, size_overrides=[]):
         # This is equivalent to selecting "Size overrides" in the DFP creative
         # settings, as recommended: http://prebid.org/adops/step-by-step.html
         'sizes': sizes
-      })
-  licas = lica_service.createLineItemCreativeAssociations(licas)
+      }
+
+def _create_licas_batch(licas):
+  lica_service = get_service('LineItemCreativeAssociationService')
+
+  # If some associations are rejected, still create the others. Only the
+  # count is kept, so the created associations aren't held in memory.
+  return len(call_with_bisection(
+    lambda licas: lica_service.createLineItemCreativeAssociations(licas) or [],
+    licas))
+
+def make_licas(line_item_ids, creative_ids, size_overrides=[],
+  batch_size=None, max_workers=None):
+  """
+  Attaches creatives to line items in DFP, sending batches of associations
+  concurrently.
+
+  Args:
+    line_item_ids (arr): an array of line item IDs
+    creative_ids (arr): an array of creative IDs
+    size_overrides (arr): an array of objects, each containing 'width' and
+      'height' keys, to override the creative sizes
+    batch_size (int): the maximum number of associations per request;
+      defaults to the DFP_LICA_BATCH_SIZE setting
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
+  Returns:
+    None
+  """
+  if batch_size is None:
+    batch_size = getattr(settings, 'DFP_LICA_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+  # One copy of the sizes is shared by every association.
+  sizes = list(size_overrides)
+
+  num_created = sum(map_batches(_create_licas_batch,
+    generate_licas(line_item_ids, creative_ids, sizes),
+    batch_size=batch_size, max_workers=max_workers,
+    description='line item <> creative associations'))
 
-  if licas:
+  if num_created:
     logger.info(
-      u'Created {0} line item <> creative associations.'.format(len(licas)))
+      u'Created {0} line item <> creative associations.'.format(num_created))
   else:
     logger.info(u'No line item <> creative associations created.')
@@ -0,0 +1,230 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from dfp.exceptions import MultipleErrors
+
+
+logger = logging.getLogger(__name__)
+
+# The default number of objects to send to DFP in one request.
+DEFAULT_BATCH_SIZE = 200
+
+# The default number of requests to send to DFP at the same time.
+DEFAULT_MAX_WORKERS = 4
+
+
+def get_max_workers():
+  """
+  Returns the number of concurrent DFP requests allowed by settings.
+
+  Returns:
+    an integer
+  """
+  return getattr(settings, 'DFP_MAX_WORKERS', None) or DEFAULT_MAX_WORKERS
+
+def chunk(items, batch_size):
+  """
+  Splits items into lists of at most `batch_size` items. Items are consumed
+  lazily, so `items` may be a generator.
+
+  Args:
+    items (iterable)
+    batch_size (int)
+  Returns:
+    a generator of arrays
+  """
+  if batch_size < 1:
+    raise ValueError('The batch size must be at least 1.')
+
+  batch = []
+  for item in items:
+    batch.append(item)
+    if len(batch) >= batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+def _timed_call(func, batch):
+  start = time.time()
+  result = func(batch)
+  return result, time.time() - start
+
+def _log_batch(description, batch_num, batch, seconds):
+  logger.info(u'Batch {num}: {count} {description} in {seconds:.2f}s.'.format(
+    num=batch_num, count=len(batch), description=description,
+    seconds=seconds))
+
+def _wait_for_batch(pending, description, return_exceptions):
+  """
+  Waits for the oldest pending batch.
+
+  Returns:
+    a tuple of the batch's result, or its exception if `return_exceptions`
+      is True, and whether the batch failed
+  """
+  batch_num, batch, future = pending.popleft()
+  try:
+    result, seconds = future.result()
+  except Exception as error:
+    if not return_exceptions:
+      raise
+    return error, True
+  _log_batch(description, batch_num, batch, seconds)
+  return result, False
+
+def map_batches(func, items, batch_size=DEFAULT_BATCH_SIZE, max_workers=None,
+  description='items', return_exceptions=False):
+  """
+  Calls `func` on each batch of items using a pool of worker threads, and
+  yields each batch's result in input order as soon as it and every batch
+  before it are done. At most twice `max_workers` batches are held in memory
+  at once, which keeps memory bounded when `items` is a generator and
+  applies backpressure when the caller consumes results slowly.
+
+  Args:
+    func (function): called with an array of items; it should get its DFP
+      services with dfp.client.get_service, which are shared by the worker
+      threads
+    items (iterable)
+    batch_size (int): the maximum number of items per batch
+    max_workers (int): the maximum number of concurrent calls to `func`;
+      defaults to the DFP_MAX_WORKERS setting
+    description (str): what the items are, for logging
+    return_exceptions (bool): if True, a batch that fails yields its
+      exception instead of raising it; no more batches are started, but the
+      batches already started are finished and yielded, so the caller can
+      keep their results
+  Returns:
+    a generator: the result of `func` for each batch
+  """
+  if max_workers is None:
+    max_workers = get_max_workers()
+
+  batches = chunk(items, batch_size)
+
+  # Run in this thread when there is nothing to parallelize.
+  if max_workers <= 1:
+    for batch_num, batch in enumerate(batches, 1):
+      try:
+        result, seconds = _timed_call(func, batch)
+      except Exception as error:
+        if not return_exceptions:
+          raise
+        yield error
+        return
+      _log_batch(description, batch_num, batch, seconds)
+      yield result
+    return
+
+  executor = ThreadPoolExecutor(max_workers=max_workers)
+  pending = deque()
+  try:
+    for batch_num, batch in enumerate(batches, 1):
+      pending.append(
+        (batch_num, batch, executor.submit(_timed_call, func, batch)))
+
+      # Wait for the oldest batch once enough batches are in flight.
+      if len(pending) >= max_workers * 2:
+        result, failed = _wait_for_batch(pending, description,
+          return_exceptions)
+        yield result
+        if failed:
+          break
+
+    # Batches already sent may be created in DFP even if an earlier batch
+    # failed, so wait for each of them.
+    while pending:
+      result, _ = _wait_for_batch(pending, description, return_exceptions)
+      yield result
+  finally:
+    # Don't start batches that are still queued if a batch failed or the
+    # caller stopped early.
+    for _, _, future in pending:
+      future.cancel()
+    executor.shutdown(wait=True)
+
+def run_in_batches(func, items, batch_size=DEFAULT_BATCH_SIZE,
+  max_workers=None, description='items'):
+  """
+  Calls `func` on each batch of items concurrently and combines the results.
+
+  Args:
+    func (function): called with an array of items; returns an array
+    items (iterable)
+    batch_size (int): the maximum number of items per batch
+    max_workers (int): the maximum number of concurrent calls to `func`
+    description (str): what the items are, for logging
+  Returns:
+    an array: the results of all batches, in input order
+  """
+  start = time.time()
+  results = []
+  num_batches = 0
+  for batch_results in map_batches(func, items, batch_size=batch_size,
+    max_workers=max_workers, description=description):
+    results.extend(batch_results)
+    num_batches += 1
+
+  if num_batches > 1:
+    logger.info(u'Processed {count} {description} in {num} batches in '
+      '{seconds:.2f}s.'.format(count=len(results), description=description,
+        num=num_batches, seconds=time.time() - start))
+  return results
+
+def run_concurrently(calls, max_workers=None, description='lookups'):
+  """
+  Calls independent functions concurrently and waits for all of them, so
+  they take about as long as the slowest one. Every function runs even if
+  others fail, so that all errors are reported together.
+
+  Args:
+    calls (dict): a map of name to a function that takes no arguments; it
+      should get its DFP services with dfp.client.get_service
+    max_workers (int): the maximum number of concurrent calls; defaults to
+      the DFP_MAX_WORKERS setting
+    description (str): what the calls are, for logging
+  Returns:
+    an object: a map of name to the function's return value
+  Raises:
+    the exception of the only failed call, or MultipleErrors if several
+      calls failed
+  """
+  if max_workers is None:
+    max_workers = get_max_workers()
+
+  def call(name):
+    try:
+      return calls[name](), None
+    except Exception as error:
+      return None, error
+
+  start = time.time()
+  names = list(calls)
+  if max_workers <= 1 or len(names) <= 1:
+    outcomes = [call(name) for name in names]
+  else:
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(names)))
+    try:
+      outcomes = list(executor.map(call, names))
+    finally:
+      executor.shutdown(wait=True)
+
+  results = {}
+  errors = {}
+  for name, (result, error) in zip(names, outcomes):
+    if error is None:
+      results[name] = result
+    else:
+      errors[name] = error
+  logger.info(u'Ran {count} {description} in {seconds:.2f}s.'.format(
+    count=len(names), description=description, seconds=time.time() - start))
+
+  if len(errors) == 1:
+    raise list(errors.values())[0]
+  if errors:
+    raise MultipleErrors(errors)
+  return results
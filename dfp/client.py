@@ -1,8 +1,190 @@
+import threading
 
 from googleads import dfp
 
 import settings
+from dfp.oauth_cache import load_client
+from dfp.rate_limiter import (
+  RateLimitedService,
+  get_rate_limiter,
+  reset_rate_limiters,
+)
+from dfp.single_flight import get_single_flight, reset_single_flight
 
 
-def get_client():
-  return dfp.DfpClient.LoadFromStorage(settings.GOOGLEADS_YAML_FILE)
+# The DFP API version used by every service in this package.
+API_VERSION = 'v201802'
+
+# Loaded DFP clients, keyed by network code. `None` is the network code set
+# in the googleads YAML file.
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Services shared by every thread, keyed by (network code, service name, API
+# version).
+_services = {}
+_services_lock = threading.Lock()
+
+def _load_client(network_code=None):
+  """
+  Loads a new DFP client from the googleads YAML file.
+
+  Args:
+    network_code (str): an optional network code overriding the one in the
+      YAML file
+  Returns:
+    a DfpClient
+  """
+  # Imported here because dfp.wsdl_cache uses this module.
+  from dfp.wsdl_cache import get_wsdl_cache
+
+  token_cache_file = getattr(settings, 'DFP_OAUTH_TOKEN_CACHE_FILE', None)
+  if token_cache_file:
+    dfp_client = load_client(settings.GOOGLEADS_YAML_FILE, token_cache_file)
+  else:
+    dfp_client = dfp.DfpClient.LoadFromStorage(settings.GOOGLEADS_YAML_FILE)
+  if network_code is not None:
+    dfp_client.network_code = network_code
+
+  # Keep the fetched WSDL and schema documents on disk between runs, so new
+  # processes don't download them again; zeep still parses them for each
+  # service. Only the zeep SOAP library supports this.
+  if getattr(dfp_client, 'soap_impl', None) == 'zeep':
+    wsdl_cache = get_wsdl_cache()
+    if wsdl_cache is not None:
+      dfp_client.cache = wsdl_cache
+
+  return dfp_client
+
+class ServicePool(object):
+  """
+  A process-wide pool of SOAP proxies for one DFP service. A proxy keeps
+  per-request state, so each request checks one out and returns it when
+  done. Any thread reuses idle proxies, and a new proxy, which parses the
+  WSDL again, is only built when every proxy is busy.
+  """
+
+  def __init__(self, create_service):
+    """
+    Args:
+      create_service (function): builds a new proxy; it is called once right
+        away, so errors loading the service surface immediately
+    """
+    self._create_service = create_service
+    self._idle = [create_service()]
+    self._lock = threading.Lock()
+    self.num_created = 1
+
+  def checkout(self):
+    """
+    Takes an idle proxy, or builds one if every proxy is busy.
+
+    Returns:
+      a SOAP service proxy
+    """
+    with self._lock:
+      if self._idle:
+        return self._idle.pop()
+    service = self._create_service()
+    with self._lock:
+      self.num_created += 1
+    return service
+
+  def checkin(self, service):
+    """
+    Returns a proxy taken with `checkout` to the pool.
+
+    Args:
+      service: a SOAP service proxy
+    Returns:
+      None
+    """
+    with self._lock:
+      self._idle.append(service)
+
+  def __getattr__(self, name):
+    if name.startswith('__'):
+      raise AttributeError(name)
+
+    service = self.checkout()
+    try:
+      attribute = getattr(service, name)
+    finally:
+      self.checkin(service)
+    if not callable(attribute):
+      return attribute
+
+    def pooled(*args, **kwargs):
+      service = self.checkout()
+      try:
+        return getattr(service, name)(*args, **kwargs)
+      finally:
+        self.checkin(service)
+    return pooled
+
+def get_client(network_code=None):
+  """
+  Gets the process-wide DFP client for a network, loading it on first use.
+
+  Args:
+    network_code (str): an optional network code; defaults to the network
+      code in the googleads YAML file
+  Returns:
+    a DfpClient
+  """
+  dfp_client = _clients.get(network_code)
+  if dfp_client is not None:
+    return dfp_client
+
+  with _clients_lock:
+    # Another thread may have loaded the client while we waited.
+    if network_code not in _clients:
+      _clients[network_code] = _load_client(network_code)
+    return _clients[network_code]
+
+def get_service(service_name, version=API_VERSION, network_code=None):
+  """
+  Gets a DFP service, creating it on first use. The service is shared by
+  every thread: each request uses an idle SOAP proxy from the service's
+  pool, shares the network's rate limiter, and `get*ByStatement` reads share
+  identical reads in flight in other threads.
+
+  Args:
+    service_name (str): the name of the DFP service, e.g. 'LineItemService'
+    version (str): the DFP API version
+    network_code (str): an optional network code; defaults to the network
+      code in the googleads YAML file
+  Returns:
+    a DFP service
+  """
+  cache_key = (network_code, service_name, version)
+  service = _services.get(cache_key)
+  if service is not None:
+    return service
+
+  with _services_lock:
+    # Another thread may have created the service while we waited.
+    if cache_key not in _services:
+      dfp_client = get_client(network_code)
+      pool = ServicePool(
+        lambda: dfp_client.GetService(service_name, version=version))
+      _services[cache_key] = RateLimitedService(pool,
+        get_rate_limiter(network_code), single_flight=get_single_flight(),
+        service_name=service_name, network_code=network_code)
+    return _services[cache_key]
+
+def reset_client():
+  """
+  Forgets all loaded DFP clients, services, rate limiters and in-flight
+  read counters, so the next call to `get_client` or `get_service` reloads
+  them. Use this after rotating credentials or between tests.
+
+  Returns:
+    None
+  """
+  with _clients_lock:
+    _clients.clear()
+  with _services_lock:
+    _services.clear()
+  reset_rate_limiters()
+  reset_single_flight()
@@ -4,11 +4,14 @@ import logging
 
 from googleads import dfp
 
-from dfp.client import get_client
+from dfp.client import get_service
 
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of targeting values to create in one request.
+TARGETING_VALUES_BATCH_SIZE = 200
+
 def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
   """
   Creates a custom targeting key in DFP.
@@ -21,9 +24,7 @@ def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
     an integer: the ID of the created key
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v201802')
+  custom_targeting_service = get_service('CustomTargetingService')
 
   if display_name is None:
     display_name = name
@@ -47,6 +48,36 @@ def create_targeting_key(name, display_name=None, key_type='FREEFORM'):
 
   return key['id']
 
+def create_targeting_keys(names, key_type='FREEFORM'):
+  """
+  Creates many custom targeting keys in DFP with a single request. Each key's
+  display name is its name.
+
+  Args:
+    names (arr): an array of targeting key names
+    key_type (str): either 'FREEFORM' or 'PREDEFINED'
+  Returns:
+    an array: the IDs of the created keys, in the same order as `names`
+  """
+
+  custom_targeting_service = get_service('CustomTargetingService')
+
+  keys = [
+    {
+      'displayName': name,
+      'name': name,
+      'type': key_type
+    }
+    for name in names
+  ]
+  keys = custom_targeting_service.createCustomTargetingKeys(keys)
+
+  for key in keys:
+    logger.info(u'Created a custom targeting key with name "{name}".'.format(
+      name=key['name']))
+
+  return [key['id'] for key in keys]
+
 def create_targeting_value(name, key_id):
   """
   Creates a custom targeting value for a specific key in DFP.
@@ -58,9 +89,7 @@ def create_targeting_value(name, key_id):
     None
   """
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v201802')
+  custom_targeting_service = get_service('CustomTargetingService')
 
   values_config = [
     {
@@ -85,3 +114,40 @@ def create_targeting_value(name, key_id):
       display_name=created_value['displayName']))
 
   return created_value['id']
+
+def create_targeting_values(names, key_id,
+  batch_size=TARGETING_VALUES_BATCH_SIZE):
+  """
+  Creates custom targeting values for a specific key in DFP, sending at most
+  `batch_size` values per request.
+
+  Args:
+    names (arr): an array of value names
+    key_id (int): the ID of the associated DFP key
+    batch_size (int): the maximum number of values to create per request
+  Returns:
+    an array: the IDs of the created values, in the same order as `names`
+  """
+
+  custom_targeting_service = get_service('CustomTargetingService')
+
+  values_config = [
+    {
+      'customTargetingKeyId': key_id,
+      'displayName': str(name),
+      'name': str(name),
+      'matchType': 'EXACT'
+    }
+    for name in names
+  ]
+
+  created_value_ids = []
+  for start in range(0, len(values_config), batch_size):
+    values = custom_targeting_service.createCustomTargetingValues(
+      values_config[start:start + batch_size])
+    created_value_ids.extend([value['id'] for value in values])
+
+  logger.info(u'Created {num} custom targeting values for key ID '
+    '{key_id}.'.format(num=len(created_value_ids), key_id=key_id))
+
+  return created_value_ids
@@ -1,31 +1,115 @@
 
 from googleads import dfp
 
-from dfp.client import get_client
+import settings
+from dfp.batch import DEFAULT_BATCH_SIZE, map_batches
+from dfp.client import get_service
+from dfp.exceptions import BatchItemErrors
+from dfp.retry import call_with_bisection
 
 
-def create_line_items(line_items):
+def _create_line_items_batch(line_items):
+  line_item_service = get_service('LineItemService')
+
+  def create(line_items):
+    line_items = line_item_service.createLineItems(line_items)
+
+    # Return IDs of created line items.
+    created_line_item_ids = []
+    for line_item in line_items:
+      created_line_item_ids.append(line_item['id'])
+    return created_line_item_ids
+
+  # If some line items are rejected, still create the others.
+  return call_with_bisection(create, line_items)
+
+def iter_create_line_items(line_items, batch_size=None, max_workers=None,
+  return_exceptions=False):
+  """
+  Creates line items in DFP, sending batches of line items concurrently, and
+  yields the IDs of each batch as soon as it is created. Batches are yielded
+  in input order, and no more batches are started while the caller is busy
+  with earlier ones.
+
+  Args:
+    line_items (iterable): objects, each a line item configuration
+    batch_size (int): the maximum number of line items per request; defaults
+      to the DFP_LINE_ITEM_BATCH_SIZE setting
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
+    return_exceptions (bool): if True, a batch that fails yields its
+      exception instead of raising it, after which only the batches already
+      sent are yielded
+  Returns:
+    a generator of arrays: the created line item IDs of each batch
+  Raises:
+    BatchItemErrors if DFP rejects some line items of a batch; the others
+      in the batch are created
+  """
+  if batch_size is None:
+    batch_size = getattr(settings, 'DFP_LINE_ITEM_BATCH_SIZE',
+      DEFAULT_BATCH_SIZE)
+
+  return map_batches(_create_line_items_batch, line_items,
+    batch_size=batch_size, max_workers=max_workers, description='line items',
+    return_exceptions=return_exceptions)
+
+def create_line_items(line_items, batch_size=None, max_workers=None):
   """
-  Creates line items in DFP.
+  Creates line items in DFP, sending batches of line items concurrently. If
+  a batch fails, no more batches are sent, but the batches already sent are
+  finished, so that every created line item is reported.
 
   Args:
     line_items (arr): an array of objects, each a line item configuration
+    batch_size (int): the maximum number of line items per request; defaults
+      to the DFP_LINE_ITEM_BATCH_SIZE setting
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
   Returns:
-    an array: an array of created line item IDs
+    an array: an array of created line item IDs, in the same order as
+      `line_items`
+  Raises:
+    BatchItemErrors if some line items failed but others were created; its
+      `results` has the ID of each line item that was sent, or None for a
+      failed one. If no line item was created, the first batch's error is
+      raised as it is.
   """
-  dfp_client = get_client()
-  line_item_service = dfp_client.GetService('LineItemService', version='v201802')
-  line_items = line_item_service.createLineItems(line_items)
+  if batch_size is None:
+    batch_size = getattr(settings, 'DFP_LINE_ITEM_BATCH_SIZE',
+      DEFAULT_BATCH_SIZE)
 
-  # Return IDs of created line items.
   created_line_item_ids = []
-  for line_item in line_items:
-    created_line_item_ids.append(line_item['id'])
-  return created_line_item_ids
+  failures = []
+  first_error = None
+  for outcome in iter_create_line_items(line_items, batch_size=batch_size,
+    max_workers=max_workers, return_exceptions=True):
+    offset = len(created_line_item_ids)
+    if isinstance(outcome, BatchItemErrors):
+      created_line_item_ids.extend(outcome.results)
+      failures.extend((offset + position, item, error)
+        for position, item, error in outcome.failures)
+    elif isinstance(outcome, Exception):
+      # The whole batch failed.
+      batch = line_items[offset:offset + batch_size]
+      created_line_item_ids.extend([None] * len(batch))
+      failures.extend((offset + position, item, outcome)
+        for position, item in enumerate(batch))
+    else:
+      created_line_item_ids.extend(outcome)
+      continue
+    if first_error is None:
+      first_error = outcome
+
+  if first_error is None:
+    return created_line_item_ids
+  if all(line_item_id is None for line_item_id in created_line_item_ids):
+    raise first_error
+  raise BatchItemErrors(created_line_item_ids, failures)
 
 def create_line_item_config(name, order_id, use_placements, placement_ids, ad_unit_ids,
   cpm_micro_amount, sizes, hb_bidder_key_id, hb_pb_key_id, hb_size_key_id, hb_bidder_value_id, hb_pb_value_id, hb_size_value_ids,
-  currency_code='USD'):
+  currency_code='USD', hb_pb_value_ids=None):
   """
   Creates a line item config object.
 
@@ -43,6 +127,8 @@ def create_line_item_config(name, order_id, use_placements, placement_ids, ad_un
     hb_pb_key_id (int): the DFP ID of the `hb_pb` targeting key
     hb_size_key_id (int): the DFP ID of the `hb_size` targeting key
     currency_code (str): the currency code (e.g. 'USD' or 'EUR')
+    hb_pb_value_ids (arr): if given, the line item targets all of these
+      `hb_pb` values instead of only `hb_pb_value_id`
   Returns:
     an object: the line item config
   """
@@ -69,7 +155,8 @@ def create_line_item_config(name, order_id, use_placements, placement_ids, ad_un
   hb_pb_criteria = {
     'xsi_type': 'CustomCriteria',
     'keyId': hb_pb_key_id,
-    'valueIds': [hb_pb_value_id],
+    'valueIds': (list(hb_pb_value_ids) if hb_pb_value_ids is not None
+      else [hb_pb_value_id]),
     'operator': 'IS'
   }
 
@@ -17,3 +17,32 @@ class BadSettingException(Exception):
   """
   pass
 
+
+class MultipleErrors(Exception):
+  """
+  When several independent DFP calls fail. `errors` maps the name of each
+  failed call to its exception.
+  """
+
+  def __init__(self, errors):
+    self.errors = errors
+    message = '{0} DFP calls failed:\n{1}'.format(len(errors), '\n'.join(
+      '  {0}: {1}: {2}'.format(name, type(error).__name__, error)
+      for name, error in sorted(errors.items())))
+    super(MultipleErrors, self).__init__(message)
+
+class BatchItemErrors(Exception):
+  """
+  When DFP rejects some items of a batch request; the other items were
+  created. `results` has the result of each item of the batch, or None for
+  a failed item, and `failures` has a (position, item, error) tuple for each
+  failed item.
+  """
+
+  def __init__(self, results, failures):
+    self.results = results
+    self.failures = failures
+    message = '{0} of {1} items failed:\n{2}'.format(len(failures),
+      len(results), '\n'.join('  item {0}: {1}'.format(position, error)
+        for position, _, error in failures))
+    super(BatchItemErrors, self).__init__(message)
@@ -1,11 +1,13 @@
 #!/usr/bin/env python
 
 import logging
+import threading
 
 from googleads import dfp
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.metadata_cache import read_through_many
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
@@ -25,9 +27,7 @@ def get_ad_unit_by_name(ad_unit_name):
     a DFP ad unit object
   """
 
-  dfp_client = get_client()
-  inventoryService = dfp_client.GetService('InventoryService',
-    version='v201802')
+  inventoryService = get_service('InventoryService')
 
   query = 'WHERE name = :name'
   values = [
@@ -55,18 +55,228 @@ def get_ad_unit_by_name(ad_unit_name):
     logger.info(u'Found ad unit with name "{name}".'.format(name=ad_unit['name']))
   return ad_unit
 
+def _get_date_time_key(date_time):
+  """
+  Returns a DFP DateTime as a tuple that sorts chronologically.
+  """
+  date = date_time['date']
+  return (date['year'], date['month'], date['day'], date_time['hour'],
+    date_time['minute'], date_time['second'])
+
+class AdUnitIndex(object):
+  """
+  An in-memory copy of the DFP ad unit hierarchy, indexed by ID, by name,
+  by path and by parent.
+
+  A path is the names of an ad unit and its ancestors below the network's
+  root ad unit, separated by slashes, e.g. 'Site/Section/Leaderboard'.
+  Archived ad units are kept but can't be resolved by name or path.
+  """
+
+  PATH_SEPARATOR = '/'
+
+  def __init__(self):
+    self.ad_units_by_id = {}
+    # The IDs of unarchived ad units, by name and by path.
+    self.ad_unit_ids_by_name = {}
+    self.ad_unit_id_by_path = {}
+    # The IDs of every ad unit's children, by parent ID.
+    self.child_ids_by_parent_id = {}
+    # The latest modification time seen, as a DFP DateTime.
+    self.last_modified_date_time = None
+
+  def load(self, ad_units):
+    """
+    Adds or replaces ad units, then rebuilds the name, path and parent
+    indexes, since a moved or renamed ad unit changes the paths of its
+    whole subtree.
+
+    Args:
+      ad_units (arr): an array of DFP ad units
+    Returns:
+      None
+    """
+    for ad_unit in ad_units:
+      self.ad_units_by_id[ad_unit['id']] = ad_unit
+      last_modified = ad_unit['lastModifiedDateTime']
+      if last_modified and (self.last_modified_date_time is None or
+        _get_date_time_key(last_modified) >
+          _get_date_time_key(self.last_modified_date_time)):
+        self.last_modified_date_time = last_modified
+
+    self.ad_unit_ids_by_name = {}
+    self.ad_unit_id_by_path = {}
+    self.child_ids_by_parent_id = {}
+    for ad_unit_id, ad_unit in self.ad_units_by_id.items():
+      if ad_unit['parentId'] is not None:
+        self.child_ids_by_parent_id.setdefault(
+          ad_unit['parentId'], []).append(ad_unit_id)
+    for ad_unit_id, ad_unit in self.ad_units_by_id.items():
+      if ad_unit['status'] == 'ARCHIVED' or ad_unit['parentId'] is None:
+        continue
+      self.ad_unit_ids_by_name.setdefault(ad_unit['name'], []).append(
+        ad_unit_id)
+      self.ad_unit_id_by_path[self.get_path(ad_unit_id)] = ad_unit_id
+
+  def get_path(self, ad_unit_id):
+    """
+    Gets the path of an ad unit.
+
+    Args:
+      ad_unit_id (str): the ID of the ad unit
+    Returns:
+      a string
+    """
+    names = []
+    ad_unit = self.ad_units_by_id[ad_unit_id]
+    # The network's root ad unit has no parent, and isn't part of paths.
+    while ad_unit is not None and ad_unit['parentId'] is not None:
+      names.append(ad_unit['name'])
+      ad_unit = self.ad_units_by_id.get(ad_unit['parentId'])
+    return self.PATH_SEPARATOR.join(reversed(names))
+
+  def get_children(self, ad_unit_id):
+    """
+    Gets the direct children of an ad unit.
+
+    Args:
+      ad_unit_id (str): the ID of the ad unit
+    Returns:
+      an array of DFP ad units
+    """
+    return [self.ad_units_by_id[child_id]
+      for child_id in self.child_ids_by_parent_id.get(ad_unit_id, [])]
+
+  def get_ad_unit_id(self, name_or_path):
+    """
+    Gets the ID of an ad unit by path, or by name if the name is unique.
+
+    Args:
+      name_or_path (str): an ad unit path, e.g. 'Site/Section/Leaderboard',
+        or name
+    Returns:
+      a string, or None if no ad unit has the path or name
+    """
+    if name_or_path in self.ad_unit_id_by_path:
+      return self.ad_unit_id_by_path[name_or_path]
+
+    ad_unit_ids = self.ad_unit_ids_by_name.get(name_or_path, [])
+    if len(ad_unit_ids) > 1:
+      paths = sorted(self.get_path(ad_unit_id) for ad_unit_id in ad_unit_ids)
+      raise BadSettingException(('There are {0} ad units named "{1}". Use one '
+        'of their paths instead: {2}').format(len(ad_unit_ids), name_or_path,
+          ', '.join(paths)))
+    return ad_unit_ids[0] if ad_unit_ids else None
+
+def get_all_ad_units(last_modified_date_time=None):
+  """
+  Gets all ad units from DFP, paging through the results.
+
+  Args:
+    last_modified_date_time (object): if given, a DFP DateTime; only ad units
+      modified after it are returned
+  Returns:
+    an array of DFP ad units
+  """
+
+  inventory_service = get_service('InventoryService')
+
+  query = ''
+  values = None
+  if last_modified_date_time is not None:
+    query = 'WHERE lastModifiedDateTime > :lastModifiedDateTime'
+    values = [{
+      'key': 'lastModifiedDateTime',
+      'value': {
+        'xsi_type': 'DateTimeValue',
+        'value': last_modified_date_time
+      }
+    }]
+  statement = dfp.FilterStatement(query, values)
+
+  ad_units = []
+  while True:
+    response = inventory_service.getAdUnitsByStatement(
+      statement.ToStatement())
+    if 'results' in response and len(response['results']) > 0:
+      ad_units.extend(response['results'])
+      statement.offset += dfp.SUGGESTED_PAGE_LIMIT
+    else:
+      break
+  return ad_units
+
+_ad_unit_index = None
+_ad_unit_index_lock = threading.Lock()
+
+def get_ad_unit_index(refresh=False):
+  """
+  Gets the index of all DFP ad units, downloading the inventory the first
+  time it's needed.
+
+  Args:
+    refresh (bool): whether to fetch the ad units modified since the index
+      was last loaded
+  Returns:
+    an AdUnitIndex
+  """
+  global _ad_unit_index
+
+  with _ad_unit_index_lock:
+    if _ad_unit_index is None:
+      _ad_unit_index = AdUnitIndex()
+      _ad_unit_index.load(get_all_ad_units())
+      logger.info(u'Loaded {0} ad units.'.format(
+        len(_ad_unit_index.ad_units_by_id)))
+    elif refresh:
+      ad_units = get_all_ad_units(_ad_unit_index.last_modified_date_time)
+      _ad_unit_index.load(ad_units)
+      logger.info(u'Refreshed {0} modified ad units.'.format(len(ad_units)))
+    return _ad_unit_index
+
+def reset_ad_unit_index():
+  """
+  Discards the ad unit index, so the next lookup downloads it again.
+
+  Returns:
+    None
+  """
+  global _ad_unit_index
+
+  with _ad_unit_index_lock:
+    _ad_unit_index = None
+
 def get_ad_unit_ids_by_name(ad_unit_names):
   """
-  Gets ad unit IDs from DFP based on their names.
+  Gets ad unit IDs from DFP based on their names or paths, using the metadata
+  cache if it is configured, and the ad unit index otherwise.
 
   Args:
-    ad_unit_names (arr): an array of ad unit name strings
+    ad_unit_names (arr): an array of ad unit names or paths, e.g.
+      'Site/Section/Leaderboard'; a name must be unique to be used
   Returns:
-    an array: an array of ad unit IDs
-  """  
-  ad_unit_ids = []
-  for ad_unit_name in ad_unit_names:
-    ad_unit_ids.append(get_ad_unit_by_name(ad_unit_name)['id'])
+    an array: an array of ad unit IDs, in the same order as `ad_unit_names`
+  """
+  def fetch_ad_unit_ids(names):
+    index = get_ad_unit_index()
+    ad_unit_ids_by_name = {}
+    for name in names:
+      ad_unit_id = index.get_ad_unit_id(name)
+      if ad_unit_id is not None:
+        ad_unit_ids_by_name[name] = ad_unit_id
+    return ad_unit_ids_by_name
+
+  ad_unit_ids_by_name = read_through_many('ad_units', list(set(ad_unit_names)),
+    fetch_ad_unit_ids)
+  ad_unit_ids = [ad_unit_ids_by_name.get(name) for name in ad_unit_names]
+
+  # Report every missing ad unit at once.
+  missing_names = [name for name, ad_unit_id
+    in zip(ad_unit_names, ad_unit_ids) if ad_unit_id is None]
+  if missing_names:
+    raise DFPObjectNotFound('No DFP ad unit found with name {0}'.format(
+      ', '.join(missing_names)))
+
+  logger.info(u'Found {0} ad units.'.format(len(ad_unit_ids)))
   return ad_unit_ids
 
 def main():
@@ -5,7 +5,8 @@ import logging
 from googleads import dfp
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.metadata_cache import read_through
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
@@ -24,8 +25,7 @@ def create_advertiser(name):
   Returns:
     an integer: the advertiser's DFP ID
   """
-  dfp_client = get_client()
-  company_service = dfp_client.GetService('CompanyService', version='v201802')
+  company_service = get_service('CompanyService')
 
   advertisers_config = [
     {
@@ -45,15 +45,19 @@ def create_advertiser(name):
 
 def get_advertiser_id_by_name(name):
   """
-  Returns a DFP company ID from company name.
+  Returns a DFP company ID from company name, using the metadata cache if it
+  is configured.
 
   Args:
     name (str): the name of the DFP advertiser
   Returns:
     an integer: the advertiser's DFP ID
   """
-  dfp_client = get_client()
-  company_service = dfp_client.GetService('CompanyService', version='v201802')
+  return read_through('advertisers', name,
+    lambda: _fetch_advertiser_id_by_name(name))
+
+def _fetch_advertiser_id_by_name(name):
+  company_service = get_service('CompanyService')
 
   # Filter by name.
   query = 'WHERE name = :name'
@@ -4,24 +4,29 @@ import logging
 
 from googleads import dfp
 
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.metadata_cache import read_through, read_through_many
+from dfp.pagination import iter_results
+from dfp.value_catalog import ValueCatalog
 
 
 logger = logging.getLogger(__name__)
 
 def get_key_id_by_name(name):
   """
-  Gets a targeting key by key name.
+  Gets a targeting key by key name, using the metadata cache if it is
+  configured.
 
   Args:
     name (str): the name of the targeting key
   Returns:
     an integer, or None
   """
+  return read_through('targeting_keys', name,
+    lambda: _fetch_key_id_by_name(name))
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v201802')
+def _fetch_key_id_by_name(name):
+  custom_targeting_service = get_service('CustomTargetingService')
 
   # Get a key by name.
   query = ('WHERE name = :name')
@@ -44,57 +49,85 @@ def get_key_id_by_name(name):
   return key_id
 
 
-def get_targeting_by_key_name(name):
+def get_key_ids_by_name(names):
   """
-  Gets a set of custom targeting values by key name
+  Gets many targeting keys by key name with a single request, using the
+  metadata cache if it is configured.
 
   Args:
-    name (str): the name of the targeting key
+    names (arr): an array of targeting key names
   Returns:
-    an array, or None: if the key exists, return an array of objects, where
-      each object is info about a custom targeting value
+    an object: a map of key name to key ID for each key that exists
   """
+  return read_through_many('targeting_keys', names, _fetch_key_ids_by_name)
 
-  dfp_client = get_client()
-  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
-    version='v201802')
+def _fetch_key_ids_by_name(names):
+  if not names:
+    return {}
 
-  # Get a key by name.
-  query = ('WHERE name = :name')
+  custom_targeting_service = get_service('CustomTargetingService')
+
+  # Get all keys with one `IN` statement, with a bind variable for each name.
+  bind_names = [':name{0}'.format(index) for index in range(len(names))]
+  query = 'WHERE name IN ({0})'.format(', '.join(bind_names))
   values = [{
-    'key': 'name',
+    'key': 'name{0}'.format(index),
     'value': {
       'xsi_type': 'TextValue',
       'value': name
     }
-  }]
+  } for index, name in enumerate(names)]
   targeting_key_statement = dfp.FilterStatement(query, values)
 
   response = custom_targeting_service.getCustomTargetingKeysByStatement(
       targeting_key_statement.ToStatement())
 
+  key_ids = {}
+  if 'results' in response:
+    for key in response['results']:
+      key_ids.setdefault(key['name'], key['id'])
+
+  return key_ids
+
+
+def _project_value(custom_val):
+  return {
+    'id': custom_val['id'],
+    'name': custom_val['name'],
+    'displayName': custom_val['displayName'],
+    'customTargetingKeyId': custom_val['customTargetingKeyId']
+  }
+
+def get_targeting_by_key_name(name, key_id=None, max_workers=None):
+  """
+  Gets a set of custom targeting values by key name. After the first page,
+  the remaining pages are fetched concurrently.
+
+  Args:
+    name (str): the name of the targeting key
+    key_id (int): the ID of the targeting key, if already known, which saves
+      looking up the key
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
+  Returns:
+    an array, or None: if the key exists, return an array of objects, where
+      each object is info about a custom targeting value
+  """
+
+  if key_id is None:
+    key_id = get_key_id_by_name(name)
+
   # If the key exists, get predefined values.
   key_values = None
-  if 'results' in response and len(response['results']) > 0:
-    key = response['results'][0]
-    key_values = []
-
-    query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(key['id'])
-    statement = dfp.FilterStatement(query)
-
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    while 'results' in response and len(response['results']) > 0:
-      for custom_val in response['results']:
-        key_values.append({
-          'id': custom_val['id'],
-          'name': custom_val['name'],
-          'displayName': custom_val['displayName'],
-          'customTargetingKeyId': custom_val['customTargetingKeyId']
-        })
-      statement.offset += dfp.SUGGESTED_PAGE_LIMIT
-      response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
+  if key_id is not None:
+    query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(key_id)
+
+    # Keep only the fields we need from each value, so the full DFP objects
+    # of large keys aren't held in memory.
+    key_values = list(iter_results('CustomTargetingService',
+      'getCustomTargetingValuesByStatement', query=query,
+      max_workers=max_workers, description='targeting values',
+      project=_project_value))
 
   if key_values is None:
     logger.info(u'Key "{key_name}"" does not exist in DFP.'. format(
@@ -108,6 +141,41 @@ def get_targeting_by_key_name(name):
 
   return key_values
 
+def _project_value_name_and_id(custom_val):
+  return custom_val['name'], custom_val['id']
+
+def get_value_catalog(name, key_id=None, max_workers=None):
+  """
+  Gets the active custom targeting values of a key as a compact catalog of
+  value IDs by name.
+
+  Args:
+    name (str): the name of the targeting key
+    key_id (int): the ID of the targeting key, if already known, which saves
+      looking up the key
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
+  Returns:
+    a ValueCatalog, or None if the key does not exist
+  """
+
+  if key_id is None:
+    key_id = get_key_id_by_name(name)
+  if key_id is None:
+    logger.info(u'Key "{key_name}" does not exist in DFP.'.format(
+      key_name=name))
+    return None
+
+  query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(key_id)
+  catalog = ValueCatalog(key_id, iter_results('CustomTargetingService',
+    'getCustomTargetingValuesByStatement', query=query,
+    max_workers=max_workers, description='targeting values',
+    project=_project_value_name_and_id))
+
+  logger.info(u'Key "{key_name}" has {num} existing values.'.format(
+    key_name=name, num=len(catalog)))
+  return catalog
+
 def main():
   get_targeting_by_key_name('hb_bidder')
   get_targeting_by_key_name('hb_pb')
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import logging
+
+from googleads import dfp
+
+from dfp.client import get_service
+
+
+logger = logging.getLogger(__name__)
+
+def get_line_items_by_order_id(order_id, include_archived=False):
+  """
+  Gets all line items in an order from DFP, paging through the results.
+
+  Args:
+    order_id (int): the ID of the DFP order
+    include_archived (bool): whether to include archived line items
+  Returns:
+    an array: the DFP line items
+  """
+
+  line_item_service = get_service('LineItemService')
+
+  query = 'WHERE orderId = :orderId'
+  if not include_archived:
+    query += ' AND isArchived = false'
+  values = [{
+    'key': 'orderId',
+    'value': {
+      'xsi_type': 'NumberValue',
+      'value': order_id
+    }
+  }]
+  statement = dfp.FilterStatement(query, values)
+
+  line_items = []
+  while True:
+    response = line_item_service.getLineItemsByStatement(
+      statement.ToStatement())
+    if 'results' in response and len(response['results']) > 0:
+      line_items.extend(response['results'])
+      statement.offset += dfp.SUGGESTED_PAGE_LIMIT
+    else:
+      break
+
+  logger.info(u'Found {0} line items in the order.'.format(len(line_items)))
+  return line_items
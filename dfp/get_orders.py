@@ -5,7 +5,8 @@ import logging
 
 from googleads import dfp
 
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.pagination import iter_results
 
 
 logger = logging.getLogger(__name__)
@@ -21,8 +22,7 @@ def get_order_by_name(order_name):
     a DFP order, or None
   """
 
-  dfp_client = get_client()
-  order_service = dfp_client.GetService('OrderService', version='v201802')
+  order_service = get_service('OrderService')
 
   # Filter by name.
   query = 'WHERE name = :name'
@@ -49,36 +49,41 @@ def get_order_by_name(order_name):
     logger.info(u'Found an order with name "{name}".'.format(name=order['name']))
     return order
 
-def get_all_orders(print_orders=False):
+def iter_orders(page_size=dfp.SUGGESTED_PAGE_LIMIT, max_workers=None):
   """
-  Logs all orders in DFP.
+  Streams all orders in DFP, fetching pages concurrently.
 
+  Args:
+    page_size (int): the number of orders per request
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
   Returns:
-      None
+    a generator of DFP orders
   """
+  return iter_results('OrderService', 'getOrdersByStatement',
+    page_size=page_size, max_workers=max_workers, description='orders')
 
-  dfp_client = get_client()
-
-  # Initialize appropriate service.
-  order_service = dfp_client.GetService('OrderService', version='v201802')
+def get_all_orders(print_orders=False, page_size=dfp.SUGGESTED_PAGE_LIMIT,
+  max_workers=None):
+  """
+  Logs all orders in DFP.
 
-  # Create a statement to select orders.
-  statement = dfp.FilterStatement()
+  Args:
+    print_orders (bool): whether to print each order's name
+    page_size (int): the number of orders per request
+    max_workers (int): the maximum number of concurrent requests
+  Returns:
+      None
+  """
   print('Getting all orders...')
 
-  # Retrieve a small amount of orders at a time, paging
-  # through until all orders have been retrieved.
-  while True:
-    response = order_service.getOrdersByStatement(statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      for order in response['results']:
-        msg = u'Found an order with name "{name}".'.format(name=order['name'])
-        if print_orders:
-          print(msg)
-      statement.offset += dfp.SUGGESTED_PAGE_LIMIT
-    else:
-      print('No additional orders found.')
-      break
+  num_orders = 0
+  for order in iter_orders(page_size=page_size, max_workers=max_workers):
+    num_orders += 1
+    msg = u'Found an order with name "{name}".'.format(name=order['name'])
+    if print_orders:
+      print(msg)
+  print('Found {0} orders.'.format(num_orders))
 
 def main():
   get_all_orders(print_orders=True)
@@ -5,7 +5,9 @@ import logging
 from googleads import dfp
 
 import settings
-from dfp.client import get_client
+from dfp.batch import chunk
+from dfp.client import get_service
+from dfp.metadata_cache import read_through_many
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
@@ -15,6 +17,9 @@ from dfp.exceptions import (
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of placement names to look up in one request.
+PLACEMENT_NAMES_PER_REQUEST = 100
+
 def get_placement_by_name(placement_name):
   """
   Gets a placement by name from DFP.
@@ -25,9 +30,7 @@ def get_placement_by_name(placement_name):
     a DFP placement object
   """
 
-  dfp_client = get_client()
-  placement_service = dfp_client.GetService('PlacementService',
-    version='v201802')
+  placement_service = get_service('PlacementService')
 
   query = 'WHERE name = :name'
   values = [
@@ -55,19 +58,67 @@ def get_placement_by_name(placement_name):
     logger.info(u'Found placement with name "{name}".'.format(name=placement['name']))
   return placement
 
-def get_placement_ids_by_name(placement_names):
+def _fetch_placement_ids_by_name(placement_names, batch_size):
+  placement_service = get_service('PlacementService')
+
+  # Look up names in batches of `IN` statements with a bind variable for
+  # each name.
+  placement_ids_by_name = {}
+  for batch_names in chunk(placement_names, batch_size):
+    bind_names = [':name{0}'.format(index) for index in range(len(batch_names))]
+    query = 'WHERE name IN ({0})'.format(', '.join(bind_names))
+    values = [{
+      'key': 'name{0}'.format(index),
+      'value': {
+        'xsi_type': 'TextValue',
+        'value': placement_name
+      }
+    } for index, placement_name in enumerate(batch_names)]
+    statement = dfp.FilterStatement(query, values)
+    response = placement_service.getPlacementsByStatement(
+      statement.ToStatement())
+
+    if 'results' in response:
+      for placement in response['results']:
+        # If DFP has placements with duplicate names, use the first.
+        placement_ids_by_name.setdefault(placement['name'], placement['id'])
+  return placement_ids_by_name
+
+def get_placement_ids_by_name(placement_names,
+  batch_size=PLACEMENT_NAMES_PER_REQUEST):
   """
-  Gets placement IDs from DFP based on their names.
+  Gets placement IDs from DFP based on their names, looking up many names
+  with each request, and using the metadata cache if it is configured.
 
   Args:
     placement_names (arr): an array of placement name strings
+    batch_size (int): the maximum number of names to look up per request
   Returns:
-    an array: an array of placement IDs
-  """  
-  placement_ids = []
+    an array: an array of placement IDs, in the same order as
+      `placement_names`
+  """
+
+  # Look up each name once.
+  unique_names = []
+  seen_names = set()
   for placement_name in placement_names:
-    placement_ids.append(get_placement_by_name(placement_name)['id'])
-  return placement_ids
+    if placement_name not in seen_names:
+      seen_names.add(placement_name)
+      unique_names.append(placement_name)
+
+  placement_ids_by_name = read_through_many('placements', unique_names,
+    lambda names: _fetch_placement_ids_by_name(names, batch_size))
+
+  # Report every missing placement at once.
+  missing_names = [placement_name for placement_name in unique_names
+    if placement_name not in placement_ids_by_name]
+  if missing_names:
+    raise DFPObjectNotFound('No DFP placement found with name {0}'.format(
+      ', '.join(missing_names)))
+
+  logger.info(u'Found {0} placements.'.format(len(unique_names)))
+  return [placement_ids_by_name[placement_name]
+    for placement_name in placement_names]
 
 def main():
   """
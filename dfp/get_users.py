@@ -5,7 +5,8 @@ import logging
 from googleads import dfp
 
 import settings
-from dfp.client import get_client
+from dfp.client import get_service
+from dfp.metadata_cache import read_through
 from dfp.exceptions import DFPObjectNotFound, MissingSettingException
 
 
@@ -13,15 +14,19 @@ logger = logging.getLogger(__name__)
 
 def get_user_id_by_email(email_address):
   """
-  Returns a DFP user ID from email address.
+  Returns a DFP user ID from email address, using the metadata cache if it
+  is configured.
 
   Args:
     email (str): the email of the DFP user
   Returns:
     an integer: the user's DFP ID
   """
-  dfp_client = get_client()
-  user_service = dfp_client.GetService('UserService', version='v201802')
+  return read_through('users', email_address,
+    lambda: _fetch_user_id_by_email(email_address))
+
+def _fetch_user_id_by_email(email_address):
+  user_service = get_service('UserService')
 
   # Filter by email address.
   query = 'WHERE email = :email'
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import settings
+from dfp.client import get_client
+
+
+logger = logging.getLogger(__name__)
+
+# How long cached IDs stay fresh, in seconds, by kind of DFP object.
+DEFAULT_TTL_SECONDS = {
+  'users': 7 * 24 * 60 * 60,
+  'advertisers': 24 * 60 * 60,
+  'placements': 24 * 60 * 60,
+  'ad_units': 24 * 60 * 60,
+  'targeting_keys': 7 * 24 * 60 * 60,
+}
+
+
+class MetadataCache(object):
+  """
+  A persistent cache of DFP object IDs by name (or email), stored in a
+  SQLite file. Entries expire after a TTL that depends on the kind of
+  object, and are kept separately for each DFP network.
+  """
+
+  def __init__(self, path, namespace='', ttls=None):
+    """
+    Args:
+      path (str): the path of the SQLite file
+      namespace (str): keeps entries separate, e.g. for each DFP network
+      ttls (dict): a map of entity to TTL in seconds, overriding
+        DEFAULT_TTL_SECONDS
+    """
+    self.path = path
+    self.namespace = namespace
+    self.ttls = dict(DEFAULT_TTL_SECONDS, **(ttls or {}))
+    self._lock = threading.Lock()
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory)
+    connection = self._connect()
+    try:
+      with connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+          'namespace TEXT, entity TEXT, key TEXT, value TEXT, created REAL, '
+          'PRIMARY KEY (namespace, entity, key))')
+    finally:
+      connection.close()
+
+  def _connect(self):
+    # A connection per operation lets worker threads share the cache.
+    return sqlite3.connect(self.path, timeout=30)
+
+  def get_many(self, entity, keys, now=None):
+    """
+    Gets the fresh cached values of many keys.
+
+    Args:
+      entity (str): the kind of DFP object, e.g. 'placements'
+      keys (arr): an array of strings
+      now (float): the current time, in seconds since the epoch
+    Returns:
+      an object: a map of key to value for each key with a fresh entry
+    """
+    if now is None:
+      now = time.time()
+    min_created = now - self.ttls.get(entity, 0)
+
+    values = {}
+    with self._lock:
+      connection = self._connect()
+      try:
+        for key in keys:
+          row = connection.execute('SELECT value FROM entries WHERE '
+            'namespace = ? AND entity = ? AND key = ? AND created >= ?',
+            (self.namespace, entity, key, min_created)).fetchone()
+          if row is not None:
+            values[key] = json.loads(row[0])
+      finally:
+        connection.close()
+    return values
+
+  def set_many(self, entity, values, now=None):
+    """
+    Caches many values.
+
+    Args:
+      entity (str): the kind of DFP object, e.g. 'placements'
+      values (dict): a map of key to a JSON serializable value
+      now (float): the current time, in seconds since the epoch
+    Returns:
+      None
+    """
+    if now is None:
+      now = time.time()
+    with self._lock:
+      connection = self._connect()
+      try:
+        with connection:
+          connection.executemany('INSERT OR REPLACE INTO entries '
+            '(namespace, entity, key, value, created) VALUES (?, ?, ?, ?, ?)',
+            [(self.namespace, entity, key, json.dumps(value), now)
+              for key, value in values.items()])
+      finally:
+        connection.close()
+
+  def invalidate(self, entity=None, keys=None):
+    """
+    Deletes cached entries.
+
+    Args:
+      entity (str): the kind of DFP object to delete; all kinds if None
+      keys (arr): the keys to delete; all keys if None
+    Returns:
+      None
+    """
+    query = 'DELETE FROM entries WHERE namespace = ?'
+    params = [self.namespace]
+    if entity is not None:
+      query += ' AND entity = ?'
+      params.append(entity)
+
+    with self._lock:
+      connection = self._connect()
+      try:
+        with connection:
+          if keys is None:
+            connection.execute(query, params)
+          else:
+            connection.executemany(query + ' AND key = ?',
+              [params + [key] for key in keys])
+      finally:
+        connection.close()
+
+_metadata_cache = None
+_metadata_cache_lock = threading.Lock()
+
+def get_metadata_cache():
+  """
+  Gets the metadata cache configured in settings, for the current network.
+
+  Returns:
+    a MetadataCache, or None if `DFP_METADATA_CACHE_FILE` is not set
+  """
+  global _metadata_cache
+
+  cache_file = getattr(settings, 'DFP_METADATA_CACHE_FILE', None)
+  if not cache_file:
+    return None
+
+  with _metadata_cache_lock:
+    if _metadata_cache is None or _metadata_cache.path != cache_file:
+      _metadata_cache = MetadataCache(cache_file,
+        namespace=str(get_client().network_code),
+        ttls=getattr(settings, 'DFP_METADATA_CACHE_TTL_SECONDS', None))
+    return _metadata_cache
+
+def reset_metadata_cache():
+  """
+  Forgets the metadata cache object, e.g. after settings change. Cached
+  entries are kept; use MetadataCache.invalidate to delete them.
+
+  Returns:
+    None
+  """
+  global _metadata_cache
+
+  with _metadata_cache_lock:
+    _metadata_cache = None
+
+def read_through_many(entity, keys, fetch):
+  """
+  Gets values from the metadata cache, fetching and caching the missing
+  ones. Without a configured cache, fetches every key.
+
+  Args:
+    entity (str): the kind of DFP object, e.g. 'placements'
+    keys (arr): an array of strings
+    fetch (function): called with an array of the keys missing from the
+      cache; returns a map of key to value for the keys that exist
+  Returns:
+    an object: a map of key to value for each key that exists
+  """
+  cache = get_metadata_cache()
+  if cache is None:
+    return fetch(keys)
+
+  values = cache.get_many(entity, keys)
+  missing_keys = [key for key in keys if key not in values]
+  if values:
+    logger.info(u'Using {0} cached {1}.'.format(len(values), entity))
+  if missing_keys:
+    fetched_values = fetch(missing_keys)
+    cache.set_many(entity, fetched_values)
+    values.update(fetched_values)
+  return values
+
+def read_through(entity, key, fetch):
+  """
+  Gets a value from the metadata cache, fetching and caching it if it's
+  missing. Values of None are not cached.
+
+  Args:
+    entity (str): the kind of DFP object, e.g. 'users'
+    key (str)
+    fetch (function): called with no arguments; returns the value, or None
+  Returns:
+    the value, or None
+  """
+  def fetch_one(keys):
+    value = fetch()
+    return {} if value is None else {key: value}
+
+  return read_through_many(entity, [key], fetch_one).get(key)
+
+def main():
+  """
+  Deletes the cached entries of the given kinds of DFP objects, or all
+  entries if none are given.
+
+  Returns:
+    None
+  """
+  cache = get_metadata_cache()
+  if cache is None:
+    print(u'The setting "DFP_METADATA_CACHE_FILE" is not set.')
+    return
+
+  entities = sys.argv[1:] or [None]
+  for entity in entities:
+    cache.invalidate(entity)
+  print(u'Cleared the metadata cache.')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,187 @@
+import calendar
+import contextlib
+import datetime
+import json
+import logging
+import os
+import threading
+
+import googleads.oauth2
+import yaml
+from googleads import dfp
+
+try:
+  import fcntl
+except ImportError:
+  # File locking is only available on Unix. Elsewhere, processes fall back to
+  # locking within the process only.
+  fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+# Cached tokens this close to expiring are refreshed rather than reused, so a
+# token does not expire partway through a run.
+TOKEN_EXPIRY_MARGIN_SECONDS = 300
+
+# The googleads YAML keys this module knows how to load. Any other DFP
+# configuration, such as proxies, is loaded by googleads itself.
+_SUPPORTED_YAML_KEYS = (
+  'application_name',
+  'network_code',
+  'path_to_private_key_file',
+  'delegated_account',
+)
+
+
+class TokenCache(object):
+  """
+  An OAuth2 access token cache stored in a JSON file and shared by every
+  process on the machine. Reads and writes hold an exclusive file lock.
+  """
+
+  def __init__(self, path):
+    """
+    Args:
+      path (str): the path of the cache file
+    """
+    self.path = path
+    self._thread_lock = threading.RLock()
+
+  @contextlib.contextmanager
+  def lock(self):
+    """
+    Holds an exclusive lock on the cache across threads and processes.
+    """
+    with self._thread_lock:
+      if fcntl is None:
+        yield
+        return
+      with open(self.path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+          yield
+        finally:
+          fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+  def _read(self):
+    try:
+      with open(self.path, 'r') as cache_file:
+        return json.load(cache_file)
+    except (IOError, ValueError):
+      return {}
+
+  def get(self, cache_key, now=None):
+    """
+    Gets an unexpired access token. Call this while holding `lock()`.
+
+    Args:
+      cache_key (str): identifies the credentials the token belongs to
+      now (float): the current UNIX time, for testing
+    Returns:
+      a tuple, or None: (token, expiry as UNIX time) if a token is cached and
+        does not expire within TOKEN_EXPIRY_MARGIN_SECONDS
+    """
+    entry = self._read().get(cache_key)
+    if entry is None:
+      return None
+
+    if now is None:
+      now = calendar.timegm(datetime.datetime.utcnow().utctimetuple())
+    if entry['expiry'] - TOKEN_EXPIRY_MARGIN_SECONDS <= now:
+      return None
+    return entry['token'], entry['expiry']
+
+  def set(self, cache_key, token, expiry):
+    """
+    Stores an access token. Call this while holding `lock()`.
+
+    Args:
+      cache_key (str): identifies the credentials the token belongs to
+      token (str): the access token
+      expiry (float): when the token expires, as UNIX time
+    Returns:
+      None
+    """
+    entries = self._read()
+    entries[cache_key] = {'token': token, 'expiry': expiry}
+
+    # Write to a temporary file and rename it, so a crash can't leave a
+    # truncated cache behind. The token is a secret, so only we can read it.
+    temp_path = self.path + '.tmp'
+    file_descriptor = os.open(temp_path,
+      os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(file_descriptor, 'w') as cache_file:
+      json.dump(entries, cache_file)
+    getattr(os, 'replace', os.rename)(temp_path, self.path)
+
+
+class CachedServiceAccountClient(googleads.oauth2.GoogleServiceAccountClient):
+  """
+  A service account OAuth2 client that reuses access tokens from a TokenCache
+  instead of requesting a new token for every client.
+  """
+
+  def __init__(self, key_file, scope, token_cache, sub=None,
+    proxy_config=None):
+    """
+    Args:
+      key_file (str): the path to the service account JSON key file
+      scope (str): the OAuth2 scope
+      token_cache (TokenCache): the cache to share tokens through
+      sub (str): an optional user account email to impersonate
+      proxy_config (googleads.common.ProxyConfig)
+    """
+    self.token_cache = token_cache
+    self.cache_key = u'{key_file}|{scope}|{sub}'.format(
+      key_file=os.path.abspath(key_file), scope=scope, sub=sub or '')
+    super(CachedServiceAccountClient, self).__init__(key_file, scope, sub=sub,
+      proxy_config=proxy_config)
+
+  def Refresh(self):
+    """
+    Loads a cached access token, or retrieves and caches a new one.
+    """
+    with self.token_cache.lock():
+      cached_token = self.token_cache.get(self.cache_key)
+      if cached_token is not None:
+        token, expiry = cached_token
+        self.creds.token = token
+        self.creds.expiry = datetime.datetime.utcfromtimestamp(expiry)
+        return
+
+      super(CachedServiceAccountClient, self).Refresh()
+      logger.debug(u'Retrieved a new OAuth2 access token.')
+      self.token_cache.set(self.cache_key, self.creds.token,
+        calendar.timegm(self.creds.expiry.utctimetuple()))
+
+def load_client(yaml_file, token_cache_file):
+  """
+  Loads a DFP client whose service account access tokens are cached on disk.
+  Configurations this module can't load, such as the refresh token flow or
+  proxies, are loaded by googleads without token caching.
+
+  Args:
+    yaml_file (str): the path to the googleads YAML file
+    token_cache_file (str): the path to the token cache file
+  Returns:
+    a DfpClient
+  """
+  with open(yaml_file, 'r') as yaml_doc:
+    config = yaml.safe_load(yaml_doc) or {}
+
+  dfp_config = config.get('dfp') or {}
+  unsupported_keys = set(config) - set(['dfp'])
+  unsupported_keys |= set(dfp_config) - set(_SUPPORTED_YAML_KEYS)
+  if unsupported_keys or 'path_to_private_key_file' not in dfp_config:
+    logger.debug(u'Not caching OAuth2 tokens for this googleads configuration.')
+    return dfp.DfpClient.LoadFromStorage(yaml_file)
+
+  oauth2_client = CachedServiceAccountClient(
+    dfp_config['path_to_private_key_file'],
+    googleads.oauth2.GetAPIScope('dfp'),
+    TokenCache(token_cache_file),
+    sub=dfp_config.get('delegated_account'),
+  )
+  return dfp.DfpClient(oauth2_client, dfp_config.get('application_name'),
+    network_code=dfp_config.get('network_code'))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+import logging
+
+from googleads import dfp
+
+from dfp.batch import map_batches
+from dfp.client import get_service
+
+
+logger = logging.getLogger(__name__)
+
+# Pages are fetched concurrently with OFFSET, which only splits the results
+# consistently if they are in a stable order.
+DEFAULT_ORDER = 'ORDER BY id ASC'
+
+def _fetch_page(service_name, method_name, query, values, page_size, offset,
+  project=None):
+  """
+  Fetches one page of results, projecting each result if `project` is given.
+
+  Returns:
+    a tuple: an array of results, and the total number of results, or None
+      if DFP didn't say
+  """
+  statement = dfp.FilterStatement(query, values, limit=page_size,
+    offset=offset)
+  response = getattr(get_service(service_name), method_name)(
+    statement.ToStatement())
+
+  results = []
+  total = None
+  if 'results' in response:
+    results = list(response['results'])
+    if project is not None:
+      results = [project(result) for result in results]
+  if 'totalResultSetSize' in response:
+    total = response['totalResultSetSize']
+  return results, total
+
+def iter_results(service_name, method_name, query='', values=None,
+  page_size=dfp.SUGGESTED_PAGE_LIMIT, max_workers=None,
+  description='results', project=None):
+  """
+  Streams every result of a `get*ByStatement` query. The first page tells
+  how many results there are; the remaining pages are then fetched
+  concurrently, a few pages ahead of the caller. Results are yielded in
+  page order, so the order is the same as paging serially.
+
+  Args:
+    service_name (str): the DFP service, e.g. 'OrderService'
+    method_name (str): the service method, e.g. 'getOrdersByStatement'
+    query (str): the PQL query, without LIMIT or OFFSET; it is ordered by ID
+      unless it has an ORDER BY clause
+    values (arr): the bind variables of the query
+    page_size (int): the number of results per request
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
+    description (str): what the results are, for logging
+    project (function): if given, called with each DFP object as soon as its
+      page arrives, and its return value is yielded instead; use it to keep
+      only the fields that are needed
+  Returns:
+    a generator of DFP objects, or of projected results
+  """
+  if 'ORDER BY' not in query.upper():
+    query = ' '.join(part for part in [query, DEFAULT_ORDER] if part)
+
+  def fetch_page(offset):
+    return _fetch_page(service_name, method_name, query, values, page_size,
+      offset, project=project)
+
+  results, total = fetch_page(0)
+  for result in results:
+    yield result
+
+  offset = page_size
+  last_page_full = len(results) == page_size
+  if last_page_full and total is not None and total > page_size:
+    offsets = range(page_size, total, page_size)
+    for page_results in map_batches(lambda batch: fetch_page(batch[0])[0],
+      offsets, batch_size=1, max_workers=max_workers,
+      description='pages of {0}'.format(description)):
+      for result in page_results:
+        yield result
+      last_page_full = len(page_results) == page_size
+    offset = offsets[-1] + page_size
+
+  # Keep paging serially if DFP didn't give a total, or if more results were
+  # added while paging.
+  while last_page_full:
+    results, _ = fetch_page(offset)
+    for result in results:
+      yield result
+    last_page_full = len(results) == page_size
+    offset += page_size
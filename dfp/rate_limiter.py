@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+import logging
+import threading
+import time
+
+import settings
+from dfp.batch import get_max_workers
+from dfp.retry import call_with_retries, is_idempotent_method
+from dfp.single_flight import get_statement_key
+
+
+logger = logging.getLogger(__name__)
+
+def is_quota_error(error):
+  """
+  Returns whether an exception from a DFP call is a quota error, e.g.
+  QuotaError.EXCEEDED_QUOTA.
+
+  Args:
+    error (Exception)
+  Returns:
+    a boolean
+  """
+  for api_error in getattr(error, 'errors', None) or []:
+    try:
+      error_string = api_error['errorString']
+    except (KeyError, TypeError):
+      error_string = getattr(api_error, 'errorString', None)
+    if error_string and error_string.startswith('QuotaError'):
+      return True
+  return 'QuotaError' in str(error)
+
+class RateLimiter(object):
+  """
+  Limits the DFP requests of a network with a token bucket, and adapts how
+  many requests may run at once: each quota error halves the limit, and each
+  successful request raises it a little, back up to the maximum.
+  """
+
+  def __init__(self, requests_per_second=None, max_concurrency=4,
+    min_concurrency=1):
+    """
+    Args:
+      requests_per_second (float): the rate tokens are added at; None for no
+        rate limit. Up to one second of tokens can be saved for bursts.
+      max_concurrency (int): the most requests that may run at once
+      min_concurrency (int): the fewest requests allowed to run at once after
+        quota errors
+    """
+    self.requests_per_second = requests_per_second
+    self.max_concurrency = max_concurrency
+    self.min_concurrency = min_concurrency
+    self.concurrency_limit = float(max_concurrency)
+
+    self._capacity = max(1.0, requests_per_second or 0)
+    self._tokens = self._capacity
+    self._last_refill = time.time()
+    self._in_flight = 0
+    self._condition = threading.Condition()
+
+    self.num_requests = 0
+    self.num_throttled = 0
+    self.num_quota_errors = 0
+    self.wait_seconds = 0.0
+
+  def _refill(self, now):
+    if self.requests_per_second is not None:
+      self._tokens = min(self._capacity, self._tokens +
+        (now - self._last_refill) * self.requests_per_second)
+    self._last_refill = now
+
+  def _wait_time(self):
+    """
+    Returns how long to wait before a request may start; 0 if it may start
+    now, and None if it must wait for a running request to finish.
+    """
+    if self._in_flight >= int(self.concurrency_limit):
+      return None
+    if self.requests_per_second is None or self._tokens >= 1:
+      return 0
+    return (1 - self._tokens) / self.requests_per_second
+
+  def acquire(self):
+    """
+    Waits until a request may start.
+
+    Returns:
+      None
+    """
+    start = time.time()
+    with self._condition:
+      while True:
+        self._refill(time.time())
+        wait_time = self._wait_time()
+        if wait_time == 0:
+          break
+        self._condition.wait(wait_time)
+
+      if self.requests_per_second is not None:
+        self._tokens -= 1
+      self._in_flight += 1
+      self.num_requests += 1
+      waited = time.time() - start
+      if waited > 0.001:
+        self.num_throttled += 1
+        self.wait_seconds += waited
+
+  def release(self, quota_error=False):
+    """
+    Records that a request finished, adapting the concurrency limit.
+
+    Args:
+      quota_error (bool): whether the request failed with a quota error
+    Returns:
+      None
+    """
+    with self._condition:
+      self._in_flight -= 1
+      if quota_error:
+        self.num_quota_errors += 1
+        self.concurrency_limit = max(float(self.min_concurrency),
+          self.concurrency_limit / 2)
+        # Everyone pauses until the bucket refills.
+        self._tokens = min(self._tokens, 0)
+        logger.warning(u'DFP quota exceeded; allowing {0} concurrent '
+          'requests.'.format(int(self.concurrency_limit)))
+      else:
+        self.concurrency_limit = min(float(self.max_concurrency),
+          self.concurrency_limit + 1.0 / self.concurrency_limit)
+      self._condition.notify_all()
+
+  def call(self, func, *args, **kwargs):
+    """
+    Calls a function once the limits allow it.
+
+    Args:
+      func (function): makes one DFP request
+      args: the function's positional arguments
+      kwargs: the function's keyword arguments
+    Returns:
+      the function's return value
+    """
+    self.acquire()
+    try:
+      result = func(*args, **kwargs)
+    except Exception as error:
+      self.release(quota_error=is_quota_error(error))
+      raise
+    self.release()
+    return result
+
+  def summary(self):
+    return (u'{requests} DFP requests, {throttled} throttled for '
+      '{seconds:.2f}s in total, {quota_errors} quota errors.'.format(
+        requests=self.num_requests, throttled=self.num_throttled,
+        seconds=self.wait_seconds, quota_errors=self.num_quota_errors))
+
+class RateLimitedService(object):
+  """
+  A DFP service whose method calls go through a RateLimiter, and are retried
+  after transient errors; network errors are only retried for `get*` and
+  `perform*` methods. If given a SingleFlight, identical
+  `get*ByStatement` reads in flight at the same time share one request.
+  """
+
+  def __init__(self, service, rate_limiter, single_flight=None,
+    service_name=None, network_code=None):
+    self._service = service
+    self._rate_limiter = rate_limiter
+    self._single_flight = single_flight
+    self._service_name = service_name
+    self._network_code = network_code
+
+  def __getattr__(self, name):
+    attribute = getattr(self._service, name)
+    if not callable(attribute):
+      return attribute
+
+    # Network errors are only retried for requests that may be sent twice.
+    idempotent = is_idempotent_method(name)
+
+    def rate_limited(*args, **kwargs):
+      return call_with_retries(self._rate_limiter.call, attribute, *args,
+        idempotent=idempotent, **kwargs)
+
+    if (self._single_flight is None or not name.startswith('get') or
+      not name.endswith('ByStatement')):
+      return rate_limited
+
+    def coalesced(*args, **kwargs):
+      try:
+        key = get_statement_key(self._network_code, self._service_name, name,
+          args, kwargs)
+      except (TypeError, ValueError):
+        return rate_limited(*args, **kwargs)
+      return self._single_flight.call(key, rate_limited, *args, **kwargs)
+    return coalesced
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(network_code=None):
+  """
+  Gets the rate limiter shared by every DFP request to a network, creating it
+  from settings on first use.
+
+  Args:
+    network_code (str): an optional network code; None is the network code
+      in the googleads YAML file
+  Returns:
+    a RateLimiter
+  """
+  # Pipelined setups run line item and association requests side by side,
+  # each with up to DFP_MAX_WORKERS at once.
+  max_concurrency = (getattr(settings, 'DFP_MAX_CONCURRENT_REQUESTS', None)
+    or 2 * get_max_workers())
+
+  with _rate_limiters_lock:
+    if network_code not in _rate_limiters:
+      _rate_limiters[network_code] = RateLimiter(
+        requests_per_second=getattr(settings, 'DFP_REQUESTS_PER_SECOND',
+          None),
+        max_concurrency=max_concurrency)
+    return _rate_limiters[network_code]
+
+def reset_rate_limiters():
+  """
+  Forgets all rate limiters, e.g. after settings change.
+
+  Returns:
+    None
+  """
+  with _rate_limiters_lock:
+    _rate_limiters.clear()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+import logging
+import random
+import re
+import socket
+import time
+
+from googleads.errors import GoogleAdsSoapTransportError
+
+import settings
+from dfp.exceptions import BatchItemErrors
+
+
+logger = logging.getLogger(__name__)
+
+# The default number of times to retry a request that failed with a transient
+# error.
+DEFAULT_MAX_RETRIES = 4
+
+# The delay before the first retry, doubling with each retry, in seconds.
+BASE_RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 32.0
+
+# DFP errors that may succeed if the request is sent again.
+RETRYABLE_ERROR_PREFIXES = (
+  'QuotaError',
+  'ServerError',
+  'InternalApiError',
+  'ConcurrentModificationError',
+)
+
+# DFP service methods that may be sent again after a network error, because
+# they only read, or make changes that are the same when made twice. After a
+# network error, DFP may have done the work of any other request, e.g.
+# created objects.
+IDEMPOTENT_METHOD_PREFIXES = (
+  'get',
+  'perform',
+)
+
+# Matches the index of the item an error is about, e.g. 'lineItem[3].name'.
+ITEM_FIELD_PATH_PATTERN = re.compile(r'^\w+\[\d+\]')
+
+def _get_field(api_error, name):
+  try:
+    return api_error[name]
+  except (KeyError, TypeError):
+    return getattr(api_error, name, None)
+
+def get_api_errors(error):
+  """
+  Gets the DFP ApiErrors of an exception from a DFP request.
+
+  Args:
+    error (Exception)
+  Returns:
+    an array of (errorString, fieldPath) tuples
+  """
+  return [(_get_field(api_error, 'errorString'),
+      _get_field(api_error, 'fieldPath'))
+    for api_error in getattr(error, 'errors', None) or []]
+
+def is_idempotent_method(name):
+  """
+  Returns whether a DFP service method may be sent again after a network
+  error.
+
+  Args:
+    name (str): the method name, e.g. 'getLineItemsByStatement'
+  Returns:
+    a boolean
+  """
+  return name.startswith(IDEMPOTENT_METHOD_PREFIXES)
+
+def is_retryable_error(error, idempotent=True):
+  """
+  Returns whether a failed DFP request may succeed if it is sent again:
+  network errors, and DFP quota, server and concurrent modification errors.
+
+  Args:
+    error (Exception)
+    idempotent (bool): whether the request may be sent twice; if False,
+      network errors are not retryable, because DFP may have done the work
+  Returns:
+    a boolean
+  """
+  if isinstance(error, (GoogleAdsSoapTransportError, socket.error)):
+    return idempotent
+  api_errors = get_api_errors(error)
+  if api_errors:
+    return all((error_string or '').startswith(RETRYABLE_ERROR_PREFIXES)
+      for error_string, _ in api_errors)
+  return str(error).lstrip('[').startswith(RETRYABLE_ERROR_PREFIXES)
+
+def is_item_error(error):
+  """
+  Returns whether a failed DFP batch request was rejected because of some of
+  its items, rather than as a whole.
+
+  Args:
+    error (Exception)
+  Returns:
+    a boolean
+  """
+  api_errors = get_api_errors(error)
+  return bool(api_errors) and all(
+    ITEM_FIELD_PATH_PATTERN.match(field_path or '')
+    for _, field_path in api_errors)
+
+def get_retry_delay(retry_num):
+  """
+  Gets a random delay before a retry, up to an exponentially growing limit,
+  so that concurrent requests don't retry in lockstep.
+
+  Args:
+    retry_num (int): 1 for the first retry
+  Returns:
+    a float: the delay in seconds
+  """
+  return random.uniform(0,
+    min(MAX_RETRY_DELAY, BASE_RETRY_DELAY * 2 ** (retry_num - 1)))
+
+def call_with_retries(func, *args, **kwargs):
+  """
+  Calls a function, retrying it after a delay if it fails with a transient
+  error, up to the DFP_MAX_RETRIES setting.
+
+  Args:
+    func (function): makes one DFP request
+    args: the function's positional arguments
+    kwargs: the function's keyword arguments, and optionally `idempotent`:
+      False if the request must not be sent twice, e.g. because it creates
+      objects; it is then not retried after network errors
+  Returns:
+    the function's return value
+  """
+  idempotent = kwargs.pop('idempotent', True)
+  max_retries = getattr(settings, 'DFP_MAX_RETRIES', None)
+  if max_retries is None:
+    max_retries = DEFAULT_MAX_RETRIES
+
+  retry_num = 0
+  while True:
+    try:
+      return func(*args, **kwargs)
+    except Exception as error:
+      if (retry_num >= max_retries or
+        not is_retryable_error(error, idempotent=idempotent)):
+        raise
+      retry_num += 1
+      delay = get_retry_delay(retry_num)
+      logger.warning(u'Retrying a DFP request in {delay:.1f}s ({num}/{max}) '
+        'after: {error}'.format(delay=delay, num=retry_num, max=max_retries,
+          error=error))
+      time.sleep(delay)
+
+def _bisect(func, items, results, failures, offset):
+  try:
+    batch_results = func(items)
+  except Exception as error:
+    if not is_item_error(error):
+      raise
+    if len(items) == 1:
+      failures.append((offset, items[0], error))
+      return
+    middle = len(items) // 2
+    _bisect(func, items[:middle], results, failures, offset)
+    _bisect(func, items[middle:], results, failures, offset + middle)
+    return
+  results[offset:offset + len(items)] = list(batch_results)
+
+def call_with_bisection(func, items):
+  """
+  Sends a batch of items to DFP. If DFP rejects the batch because of some of
+  its items, the batch is split in half and each half sent again, until the
+  good items are created and each bad item is isolated.
+
+  Args:
+    func (function): sends an array of items in one request, and returns an
+      array of results in the same order
+    items (arr)
+  Returns:
+    an array: the result of each item
+  Raises:
+    BatchItemErrors if some items failed; the others were created
+  """
+  results = [None] * len(items)
+  failures = []
+  _bisect(func, list(items), results, failures, 0)
+  if failures:
+    raise BatchItemErrors(results, failures)
+  return results
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import copy
+import json
+import threading
+
+
+class _Call(object):
+
+  def __init__(self):
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+    self.num_waiters = 0
+
+
+class SingleFlight(object):
+  """
+  Coalesces identical calls made at the same time: the first caller makes
+  the call, and the others wait for it and share its result (or its error).
+  Calls made after it finishes are made again.
+  """
+
+  def __init__(self):
+    self._calls = {}
+    self._lock = threading.Lock()
+
+    # Calls requested, including coalesced ones.
+    self.num_requests = 0
+    # Calls that waited for an identical call instead of making their own.
+    self.num_hits = 0
+    # Calls that at least one other call waited for.
+    self.num_merges = 0
+
+  def call(self, key, func, *args, **kwargs):
+    """
+    Calls a function, unless a call with the same key is already in flight,
+    in which case it waits for that call. Waiting callers get a copy of the
+    result, so callers can modify their results.
+
+    Args:
+      key (hashable): identifies identical calls
+      func (function)
+      args: the function's positional arguments
+      kwargs: the function's keyword arguments
+    Returns:
+      the function's return value
+    """
+    with self._lock:
+      self.num_requests += 1
+      in_flight = self._calls.get(key)
+      if in_flight is None:
+        in_flight = self._calls[key] = _Call()
+        is_leader = True
+      else:
+        in_flight.num_waiters += 1
+        if in_flight.num_waiters == 1:
+          self.num_merges += 1
+        self.num_hits += 1
+        is_leader = False
+
+    if not is_leader:
+      in_flight.done.wait()
+      if in_flight.error is not None:
+        raise in_flight.error
+      return copy.deepcopy(in_flight.result)
+
+    try:
+      in_flight.result = func(*args, **kwargs)
+      return in_flight.result
+    except Exception as error:
+      in_flight.error = error
+      raise
+    finally:
+      with self._lock:
+        del self._calls[key]
+      in_flight.done.set()
+
+  def summary(self):
+    return (u'{requests} DFP reads, {hits} served by {merges} identical reads '
+      'in flight.'.format(requests=self.num_requests, hits=self.num_hits,
+        merges=self.num_merges))
+
+def get_statement_key(*parts):
+  """
+  Gets a key identifying a read, from the service, the method and the
+  statement.
+
+  Args:
+    parts: the parts of the read; must be JSON serializable, apart from
+      objects with a stable repr
+  Returns:
+    a string
+  """
+  return json.dumps(parts, sort_keys=True, default=repr)
+
+_single_flight = SingleFlight()
+_single_flight_lock = threading.Lock()
+
+def get_single_flight():
+  """
+  Gets the single-flight group shared by every DFP read in the process.
+
+  Returns:
+    a SingleFlight
+  """
+  return _single_flight
+
+def reset_single_flight():
+  """
+  Replaces the single-flight group, resetting its counters.
+
+  Returns:
+    None
+  """
+  global _single_flight
+
+  with _single_flight_lock:
+    _single_flight = SingleFlight()
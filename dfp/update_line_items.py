@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import logging
+
+from googleads import dfp
+
+import settings
+from dfp.batch import DEFAULT_BATCH_SIZE, chunk, run_in_batches
+from dfp.client import get_service
+
+
+logger = logging.getLogger(__name__)
+
+def _update_line_items_batch(line_items):
+  line_item_service = get_service('LineItemService')
+  line_items = line_item_service.updateLineItems(line_items) or []
+  return [line_item['id'] for line_item in line_items]
+
+def update_line_items(line_items, batch_size=None, max_workers=None):
+  """
+  Updates line items in DFP, sending batches of line items concurrently.
+
+  Args:
+    line_items (arr): an array of DFP line items, each with its changes
+      applied
+    batch_size (int): the maximum number of line items per request; defaults
+      to the DFP_LINE_ITEM_BATCH_SIZE setting
+    max_workers (int): the maximum number of concurrent requests; defaults
+      to the DFP_MAX_WORKERS setting
+  Returns:
+    an array: the IDs of the updated line items
+  """
+  if batch_size is None:
+    batch_size = getattr(settings, 'DFP_LINE_ITEM_BATCH_SIZE',
+      DEFAULT_BATCH_SIZE)
+
+  updated_line_item_ids = run_in_batches(_update_line_items_batch, line_items,
+    batch_size=batch_size, max_workers=max_workers,
+    description='updated line items')
+  logger.info(u'Updated {0} line items.'.format(len(updated_line_item_ids)))
+  return updated_line_item_ids
+
+def archive_line_items(line_item_ids, batch_size=DEFAULT_BATCH_SIZE):
+  """
+  Archives line items in DFP.
+
+  Args:
+    line_item_ids (arr): an array of line item IDs
+    batch_size (int): the maximum number of line items per request
+  Returns:
+    an integer: the number of archived line items
+  """
+  line_item_service = get_service('LineItemService')
+
+  num_archived = 0
+  for batch_ids in chunk(line_item_ids, batch_size):
+    # IDs are integers, so they can be part of the query itself.
+    query = 'WHERE id IN ({0})'.format(
+      ', '.join(str(int(line_item_id)) for line_item_id in batch_ids))
+    statement = dfp.FilterStatement(query)
+    result = line_item_service.performLineItemAction(
+      {'xsi_type': 'ArchiveLineItems'}, statement.ToStatement())
+    if result and result['numChanges']:
+      num_archived += result['numChanges']
+
+  logger.info(u'Archived {0} line items.'.format(num_archived))
+  return num_archived
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+import sys
+from array import array
+
+try:
+  from sys import intern
+except ImportError:
+  # Python 2 has `intern` as a builtin.
+  pass
+
+
+# A signed 64-bit integer array type, if the platform has one.
+try:
+  array('q')
+  ID_TYPECODE = 'q'
+except ValueError:
+  ID_TYPECODE = 'l'
+
+_MAGIC = b'DFPVALUES'
+_FORMAT_VERSION = 1
+
+
+class ValueCatalog(object):
+  """
+  The custom targeting values of one key, stored compactly: value IDs in an
+  integer array, and interned names in a list at the same positions, with a
+  map from name to position for constant time lookup. It can be used like a
+  dict from value name to value ID.
+
+  If several values have the same name, the first one added is kept.
+  """
+
+  def __init__(self, key_id=None, values=None):
+    """
+    Args:
+      key_id (int): the ID of the targeting key
+      values (iterable): (name, id) pairs to add
+    """
+    self.key_id = key_id
+    self._ids = array(ID_TYPECODE)
+    self._names = []
+    self._positions = {}
+    if values is not None:
+      self.update(values)
+
+  def add(self, name, value_id):
+    """
+    Adds a value, unless a value with the same name was already added.
+
+    Args:
+      name (str): the value name
+      value_id (int): the value ID
+    Returns:
+      an integer: the ID stored for the name
+    """
+    position = self._positions.get(name)
+    if position is not None:
+      return self._ids[position]
+    name = intern(name) if isinstance(name, str) else name
+    self._positions[name] = len(self._ids)
+    self._ids.append(value_id)
+    self._names.append(name)
+    return value_id
+
+  def update(self, values):
+    """
+    Adds many values.
+
+    Args:
+      values (dict or iterable): a map of name to ID, or (name, id) pairs
+    Returns:
+      None
+    """
+    if hasattr(values, 'items'):
+      values = values.items()
+    for name, value_id in values:
+      self.add(name, value_id)
+
+  def get(self, name, default=None):
+    position = self._positions.get(name)
+    return default if position is None else self._ids[position]
+
+  def __getitem__(self, name):
+    return self._ids[self._positions[name]]
+
+  def __setitem__(self, name, value_id):
+    position = self._positions.get(name)
+    if position is None:
+      self.add(name, value_id)
+    else:
+      self._ids[position] = value_id
+
+  def __contains__(self, name):
+    return name in self._positions
+
+  def __len__(self):
+    return len(self._ids)
+
+  def __iter__(self):
+    return iter(self._names)
+
+  def items(self):
+    """
+    Returns:
+      an iterator of (name, id) pairs, in the order they were added
+    """
+    return zip(self._names, self._ids)
+
+  def dump(self, catalog_file):
+    """
+    Writes the catalog to a binary file: a header line, the IDs as raw
+    integers, then the names as UTF-8 separated by newlines.
+
+    Args:
+      catalog_file (file): a file opened for binary writing
+    Returns:
+      None
+    """
+    names = [name if isinstance(name, type(u'')) else name.decode('utf-8')
+      for name in self._names]
+    if any(u'\n' in name for name in names):
+      raise ValueError('Value names must not contain newlines.')
+
+    header = u'{magic} {version} {typecode} {byteorder} {key_id} {count}\n'.format(
+      magic=_MAGIC.decode('ascii'), version=_FORMAT_VERSION,
+      typecode=ID_TYPECODE, byteorder=sys.byteorder,
+      key_id='-' if self.key_id is None else self.key_id,
+      count=len(self._ids))
+    catalog_file.write(header.encode('ascii'))
+    catalog_file.write(self._ids.tostring() if sys.version_info[0] < 3
+      else self._ids.tobytes())
+    catalog_file.write(u'\n'.join(names).encode('utf-8'))
+
+  @classmethod
+  def load(cls, catalog_file):
+    """
+    Reads a catalog written by `dump`.
+
+    Args:
+      catalog_file (file): a file opened for binary reading
+    Returns:
+      a ValueCatalog
+    """
+    header = catalog_file.readline().decode('ascii').split()
+    if len(header) != 6 or header[0] != _MAGIC.decode('ascii'):
+      raise ValueError('Not a value catalog file.')
+    _, version, typecode, byteorder, key_id, count = header
+    if int(version) != _FORMAT_VERSION:
+      raise ValueError('Unsupported value catalog version {0}.'.format(
+        version))
+
+    ids = array(typecode)
+    ids.fromfile(catalog_file, int(count))
+    if byteorder != sys.byteorder:
+      ids.byteswap()
+    names = catalog_file.read().decode('utf-8')
+    names = names.split(u'\n') if ids else []
+
+    catalog = cls(key_id=None if key_id == '-' else int(key_id))
+    catalog.update(zip(names, ids))
+    return catalog
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+import logging
+import os
+import re
+import threading
+import time
+
+import zeep.cache
+
+import settings
+from dfp.client import API_VERSION, get_client
+
+
+logger = logging.getLogger(__name__)
+
+# The DFP services used by this tool.
+SERVICE_NAMES = [
+  'CompanyService',
+  'CreativeService',
+  'CustomTargetingService',
+  'InventoryService',
+  'LineItemCreativeAssociationService',
+  'LineItemService',
+  'OrderService',
+  'PlacementService',
+  'UserService',
+]
+
+# Documents that are not part of a versioned DFP API, such as shared XML
+# schemas, are stored under this name.
+COMMON_CACHE_NAME = 'common'
+
+_VERSION_PATTERN = re.compile(r'/(v\d{6})/')
+
+
+class WsdlCache(zeep.cache.Base):
+  """
+  A persistent cache of WSDL and schema documents, with one SQLite file per
+  DFP API version. The documents of a released API version do not change,
+  so entries never expire.
+  """
+
+  def __init__(self, cache_dir):
+    """
+    Args:
+      cache_dir (str): the directory holding the cache files
+    """
+    self.cache_dir = cache_dir
+    self._caches = {}
+    self._lock = threading.Lock()
+
+  def get_path(self, cache_name):
+    """
+    Returns the path of the SQLite file for an API version.
+
+    Args:
+      cache_name (str): an API version, e.g. 'v201802', or COMMON_CACHE_NAME
+    Returns:
+      a string
+    """
+    return os.path.join(self.cache_dir, 'wsdl-{0}.db'.format(cache_name))
+
+  def _get_cache(self, url):
+    match = _VERSION_PATTERN.search(url)
+    cache_name = match.group(1) if match else COMMON_CACHE_NAME
+    with self._lock:
+      if cache_name not in self._caches:
+        if not os.path.isdir(self.cache_dir):
+          os.makedirs(self.cache_dir)
+        self._caches[cache_name] = zeep.cache.SqliteCache(
+          path=self.get_path(cache_name), timeout=None)
+      return self._caches[cache_name]
+
+  def add(self, url, content):
+    self._get_cache(url).add(url, content)
+
+  def get(self, url):
+    return self._get_cache(url).get(url)
+
+  def clear(self, version=API_VERSION):
+    """
+    Deletes the cached documents for an API version.
+
+    Args:
+      version (str): the DFP API version
+    Returns:
+      None
+    """
+    with self._lock:
+      for cache_name in (version, COMMON_CACHE_NAME):
+        self._caches.pop(cache_name, None)
+        path = self.get_path(cache_name)
+        if os.path.exists(path):
+          os.remove(path)
+
+def get_wsdl_cache():
+  """
+  Creates the WSDL cache configured in settings.
+
+  Returns:
+    a WsdlCache, or None if `DFP_WSDL_CACHE_DIR` is not set
+  """
+  cache_dir = getattr(settings, 'DFP_WSDL_CACHE_DIR', None)
+  if not cache_dir:
+    return None
+  return WsdlCache(cache_dir)
+
+def _time_service_creation(service_name, version):
+  start = time.time()
+  get_client().GetService(service_name, version=version)
+  return time.time() - start
+
+def warm_up(service_names=SERVICE_NAMES, version=API_VERSION, cold=True):
+  """
+  Fills the WSDL cache for the given services, timing how long each service
+  takes to create without and with a warm cache.
+
+  Args:
+    service_names (arr): an array of DFP service names
+    version (str): the DFP API version
+    cold (bool): whether to clear the cache first to measure cold startup
+  Returns:
+    an array of tuples: (service name, cold seconds, warm seconds) for each
+      service; cold seconds is None when `cold` is False
+  """
+  wsdl_cache = get_client().cache
+  if not isinstance(wsdl_cache, WsdlCache):
+    raise ValueError('The WSDL cache is disabled. Set DFP_WSDL_CACHE_DIR in '
+      'settings.py to enable it.')
+
+  if cold:
+    wsdl_cache.clear(version)
+
+  timings = []
+  for service_name in service_names:
+    cold_seconds = None
+    if cold:
+      cold_seconds = _time_service_creation(service_name, version)
+    warm_seconds = _time_service_creation(service_name, version)
+    timings.append((service_name, cold_seconds, warm_seconds))
+  return timings
+
+def main():
+  print('Warming up the WSDL cache for API version {0}...'.format(API_VERSION))
+  timings = warm_up()
+
+  print(u'{0:<40}{1:>10}{2:>10}'.format('Service', 'Cold (s)', 'Warm (s)'))
+  for service_name, cold_seconds, warm_seconds in timings:
+    print(u'{0:<40}{1:>10.2f}{2:>10.2f}'.format(
+      service_name, cold_seconds, warm_seconds))
+  print(u'{0:<40}{1:>10.2f}{2:>10.2f}'.format('Total',
+    sum(timing[1] for timing in timings),
+    sum(timing[2] for timing in timings)))
+
+if __name__ == '__main__':
+  main()
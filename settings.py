@@ -24,7 +24,8 @@ DFP_USE_PLACEMENT_NAMES = False
 # Names of placements the line items should target.
 DFP_TARGETED_PLACEMENT_NAMES = ['OnlineNowLeaderboard']
 
-# Names of ad units the line items should target
+# Names of ad units the line items should target. If several ad units share a
+# name, use the ad unit's path instead, e.g. 'Site/Section/Leaderboard'.
 DFP_TARGETED_AD_UNIT_NAMES = ['TouchSearchAds']
 
 # Sizes of placements. These are used to set line item and creative sizes.
@@ -64,6 +65,95 @@ DFP_LINE_ITEM_PREFIX = 'Rubicon_DateMix_728x90_ATF_$'
 # The currency to use in DFP when setting line item CPMs. Defaults to 'USD'.
 # DFP_CURRENCY_CODE = 'USD'
 
+# Optional
+# The maximum number of line items to create in one DFP request. Larger
+# batches may hit DFP request size limits and timeouts. Defaults to 200.
+# DFP_LINE_ITEM_BATCH_SIZE = 200
+
+# Optional
+# The maximum number of line item <> creative associations to create in one
+# DFP request. Defaults to 200.
+# DFP_LICA_BATCH_SIZE = 200
+
+# Optional
+# The maximum number of DFP requests to send at the same time, e.g. when
+# looking up the user, advertiser, placements and targeting keys, or creating
+# line items and creative associations. Defaults to 4.
+# DFP_MAX_WORKERS = 4
+
+# Optional
+# If True, attach creatives to each batch of line items as soon as the batch
+# is created, overlapping line item and association requests. Defaults to
+# False, which attaches creatives after all line items are created, unless
+# DFP_JOURNAL_DIR is set.
+# DFP_PIPELINE_LICAS = False
+
+# Optional
+# The most DFP requests per second to send to the network, shared by every
+# thread. Defaults to None: no fixed rate. Either way, each quota error halves
+# how many requests may run at once, which then recovers gradually.
+# DFP_REQUESTS_PER_SECOND = 8
+
+# Optional
+# How many times to retry a DFP request that failed with a transient error,
+# e.g. a ServerError or QuotaError, waiting a random, exponentially growing
+# delay before each retry. Network errors are only retried for requests that
+# read or perform actions, because DFP may already have made the objects of a
+# failed create or update request. Defaults to 4.
+# DFP_MAX_RETRIES = 4
+
+# Optional
+# The most DFP requests that may run at once, across every thread. Defaults to
+# twice DFP_MAX_WORKERS.
+# DFP_MAX_CONCURRENT_REQUESTS = 8
+
+# Optional
+# A directory in which to keep downloaded DFP WSDL and schema documents between
+# runs, one file per API version. Fill it with `python -m dfp.wsdl_cache`.
+# Set to None to disable the cache.
+DFP_WSDL_CACHE_DIR = os.path.join(ROOT_DIR, '.wsdl_cache')
+
+# Optional
+# A file in which to share service account access tokens between runs and
+# processes, so each run doesn't request a new token. The file holds secrets,
+# so keep it out of version control. Disabled by default.
+# DFP_OAUTH_TOKEN_CACHE_FILE = os.path.join(ROOT_DIR, '.oauth_token_cache.json')
+
+# Optional
+# A directory in which to record the DFP objects each setup run creates, so a
+# run that fails partway can be continued with
+# `python -m tasks.add_new_prebid_partner --resume`. A journaled run attaches
+# creatives to each batch of line items as soon as it is created, as if
+# DFP_PIPELINE_LICAS were True. Disabled by default.
+# DFP_JOURNAL_DIR = os.path.join(ROOT_DIR, '.journal')
+
+# Optional
+# The maximum number of line items to put in one order. If a setup needs more,
+# they are split over several orders named "<DFP_ORDER_NAME> (1/n)" to
+# "<DFP_ORDER_NAME> (n/n)", which are set up concurrently. Defaults to 450.
+# DFP_MAX_LINE_ITEMS_PER_ORDER = 450
+
+# Optional
+# Lets each line item target several consecutive `hb_pb` prices, with its CPM
+# set to the lowest one, so fewer line items are needed. This is the largest
+# difference allowed between a line item's CPM and the prices it targets, in
+# the currency of DFP_CURRENCY_CODE (e.g. 0.10). The setup prints how many line
+# items different values would need. Defaults to None: one line item per price.
+# DFP_LINE_ITEM_MAX_ROUNDING_ERROR = 0.10
+
+# Optional
+# A SQLite file in which to cache the IDs of users, advertisers, placements,
+# ad units and targeting keys between runs, so repeated runs skip most DFP
+# reads. Clear it with `python -m dfp.metadata_cache [entity ...]`.
+# DFP_METADATA_CACHE_FILE = os.path.join(ROOT_DIR, '.metadata_cache.db')
+
+# Optional
+# How long cached IDs stay fresh, in seconds, by kind of object. Defaults to
+# one week for users and targeting keys and one day for everything else.
+# DFP_METADATA_CACHE_TTL_SECONDS = {
+#   'placements': 60 * 60,
+# }
+
 #########################################################################
 # PREBID SETTINGS
 #########################################################################
@@ -72,6 +162,8 @@ PREBID_BIDDER_CODE = 'rubicon'
 
 # Price buckets. This should match your Prebid settings for the partner. See:
 # http://prebid.org/dev-docs/publisher-api-reference.html#module_pbjs.setPriceGranularity
+# Either an array of custom buckets like below, or the name of one of Prebid's
+# built-in granularities: 'low', 'medium', 'high', 'auto' or 'dense'.
 PREBID_PRICE_BUCKETS = [
 {
   'min': 0,
@@ -5,12 +5,15 @@ import logging
 import os
 import sys
 from builtins import input
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 
 from colorama import init
 
 import settings
 import dfp.associate_line_items_and_creatives
+import dfp.batch
 import dfp.create_custom_targeting
 import dfp.create_creatives
 import dfp.create_line_items
@@ -20,15 +23,26 @@ import dfp.get_ad_units
 import dfp.get_custom_targeting
 import dfp.get_placements
 import dfp.get_users
+import dfp.rate_limiter
+import dfp.single_flight
 from dfp.exceptions import (
   BadSettingException,
+  BatchItemErrors,
   MissingSettingException
 )
+from dfp.value_catalog import ValueCatalog
+import tasks.line_item_grouping
+import tasks.order_shards
+import tasks.reconcile_line_items
+from tasks.journal import JournalState, SetupJournal, get_journal_path
 from tasks.price_utils import (
-  get_prices_array,
+  PRICE_GRANULARITIES,
+  PriceTable,
+  get_custom_price_table,
+  get_price_table,
   get_prices_summary_string,
-  micro_amount_to_num,
-  num_to_str,
+  is_price_granularity,
+  num_to_micro_amount,
 )
 
 # Colorama for cross-platform support for colored logging.
@@ -48,58 +62,194 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# The Prebid targeting keys every line item targets.
+PREBID_TARGETING_KEYS = ['hb_bidder', 'hb_pb', 'hb_size']
+
 
 def setup_partner(user_email, advertiser_name, order_name, use_placements, placements,
-    ad_units, sizes, bidder_code, prices, num_creatives, currency_code):
+    ad_units, sizes, bidder_code, prices, num_creatives, currency_code,
+    pipeline=False, journal=None, max_rounding_error=None):
   """
   Call all necessary DFP tasks for a new Prebid partner setup.
-  """
 
-  # Get the user.
-  user_id = dfp.get_users.get_user_id_by_email(user_email)
+  If `pipeline` is True, creatives are associated with each batch of line
+  items as soon as the batch is created, instead of after all line items
+  are created.
 
-  placement_ids = []
-  ad_unit_ids = []
+  If there are more line items than the DFP_MAX_LINE_ITEMS_PER_ORDER
+  setting allows in one order, they are split over several orders named
+  '<order_name> (1/n)' to '<order_name> (n/n)', which are set up
+  concurrently.
 
-  if use_placements:
-    # Get the placement IDs.
-    placement_ids = dfp.get_placements.get_placement_ids_by_name(placements)
-  else:
-    # Get the ad unit IDs.
-    ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units)
+  If the DFP_USE_EXISTING_ORDER_IF_EXISTS setting is on, the line items
+  already in each order for this bidder and these sizes are updated or
+  archived to match, and only missing line items are created.
 
-  # Get (or potentially create) the advertiser.
-  advertiser_id = dfp.get_advertisers.get_advertiser_id_by_name(
-    advertiser_name)
+  If `journal` (a SetupJournal) is given, every created DFP object is
+  recorded in it, and any work already recorded in it is skipped. Journaled
+  runs associate creatives batch by batch, like pipelined runs, so that
+  progress can be recorded.
 
-  # Create the order.
-  order_id = dfp.create_orders.create_order(order_name, advertiser_id, user_id)
+  If `max_rounding_error` (in micro-amounts) is given, each line item
+  targets several consecutive prices; see create_line_item_configs.
+  """
 
-  # Create creatives.
-  creative_configs = dfp.create_creatives.create_duplicate_creative_configs(
-      bidder_code, order_name, advertiser_id, num_creatives)
-  creative_ids = dfp.create_creatives.create_creatives(creative_configs)
+  # When resuming, this holds the work done by the previous run.
+  journal_state = journal.replay() if journal is not None else JournalState()
 
-  # Get DFP key IDs for line item targeting.
-  hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder')
-  hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb')
-  hb_size_key_id = get_or_create_dfp_targeting_key('hb_size')
+  # Look up the user and the placement or ad unit IDs at the same time.
+  # These only read, so a bad email or name stops setup before anything is
+  # created in DFP.
+  lookups = {
+    'user': lambda: dfp.get_users.get_user_id_by_email(user_email),
+  }
+  if use_placements:
+    lookups['placements'] = (
+      lambda: dfp.get_placements.get_placement_ids_by_name(placements))
+  else:
+    lookups['ad units'] = (
+      lambda: dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units))
+  lookup_results = dfp.batch.run_concurrently(lookups)
+
+  # Then get the advertiser and the DFP key IDs for line item targeting at
+  # the same time, creating any that are missing.
+  lookup_results.update(dfp.batch.run_concurrently({
+    'advertiser': lambda: dfp.get_advertisers.get_advertiser_id_by_name(
+      advertiser_name),
+    'targeting keys': lambda: get_or_create_dfp_targeting_keys(
+      PREBID_TARGETING_KEYS),
+  }))
+
+  user_id = lookup_results['user']
+  placement_ids = lookup_results.get('placements', [])
+  ad_unit_ids = lookup_results.get('ad units', [])
+  advertiser_id = lookup_results['advertiser']
+  key_ids = lookup_results['targeting keys']
+  hb_bidder_key_id = key_ids['hb_bidder']
+  hb_pb_key_id = key_ids['hb_pb']
+  hb_size_key_id = key_ids['hb_size']
 
   # Instantiate DFP targeting value ID getters for the targeting keys.
-  HBBidderValueGetter = DFPValueIdGetter('hb_bidder')
-  HBPBValueGetter = DFPValueIdGetter('hb_pb')
-  HBSizeValueGetter = DFPValueIdGetter('hb_size')
-
-  # Create line items.
-  line_items_config = create_line_item_configs(prices, order_id,
+  HBBidderValueGetter = DFPValueIdGetter('hb_bidder', key_id=hb_bidder_key_id)
+  HBPBValueGetter = DFPValueIdGetter('hb_pb', key_id=hb_pb_key_id)
+  HBSizeValueGetter = DFPValueIdGetter('hb_size', key_id=hb_size_key_id)
+  value_getters = [HBBidderValueGetter, HBPBValueGetter, HBSizeValueGetter]
+  for value_getter in value_getters:
+    value_getter.value_ids_by_name.update(
+      journal_state.value_ids.get(value_getter.key_name, {}))
+
+  # Configure line items. Each one's order is set once the orders exist.
+  line_items_config = create_line_item_configs(prices, None,
     use_placements, placement_ids, ad_unit_ids, bidder_code, sizes, hb_bidder_key_id, 
-    hb_pb_key_id, hb_size_key_id, currency_code, HBBidderValueGetter, HBPBValueGetter, HBSizeValueGetter)
-  logger.info("Creating line items...")
-  line_item_ids = dfp.create_line_items.create_line_items(line_items_config)
+    hb_pb_key_id, hb_size_key_id, currency_code, HBBidderValueGetter, HBPBValueGetter, HBSizeValueGetter,
+    max_rounding_error=max_rounding_error)
+  if journal is not None:
+    for value_getter in value_getters:
+      if value_getter.created_value_ids:
+        journal.record('targeting_values', key_name=value_getter.key_name,
+          values=value_getter.created_value_ids)
+
+  # Split the line items over as many orders as DFP needs.
+  num_shards = tasks.order_shards.get_num_shards(len(line_items_config))
+  order_names = tasks.order_shards.get_shard_order_names(order_name,
+    num_shards)
+  shards_config = tasks.order_shards.split_line_items(line_items_config,
+    num_shards)
+
+  # Create the orders.
+  order_ids = []
+  for shard_order_name in order_names:
+    if shard_order_name in journal_state.order_ids:
+      order_id = journal_state.order_ids[shard_order_name]
+      logger.info(u'Using the order "{0}" created by the previous run.'.format(
+        shard_order_name))
+    else:
+      order_id = dfp.create_orders.create_order(shard_order_name,
+        advertiser_id, user_id)
+      if journal is not None:
+        journal.record('order', order_id=order_id, order_name=shard_order_name)
+    order_ids.append(order_id)
+
+  # Create creatives.
+  if journal_state.creative_ids is not None:
+    creative_ids = journal_state.creative_ids
+    logger.info(u'Using the creatives created by the previous run.')
+  else:
+    creative_configs = dfp.create_creatives.create_duplicate_creative_configs(
+        bidder_code, order_name, advertiser_id, num_creatives)
+    creative_ids = dfp.create_creatives.create_creatives(creative_configs)
+    if journal is not None:
+      journal.record('creatives', creative_ids=creative_ids)
+
+  # Share the request workers between the orders set up at the same time.
+  max_workers = dfp.batch.get_max_workers()
+  num_concurrent_shards = min(num_shards, max_workers)
+  shard_max_workers = max(1, max_workers // num_concurrent_shards)
+
+  def set_up_shard(shard_order_name, order_id, shard_config):
+    for config in shard_config:
+      config['orderId'] = order_id
+    num_line_items = len(shard_config)
+
+    # In an existing order, only create the line items it doesn't have yet.
+    if getattr(settings, 'DFP_USE_EXISTING_ORDER_IF_EXISTS', False):
+      create_names = set(config['name'] for config in
+        tasks.reconcile_line_items.reconcile_line_items(order_id,
+          shard_config, key_ids))
+
+      # Keep line items a previous run created, so their creatives are still
+      # associated.
+      shard_config = [config for config in shard_config
+        if config['name'] in create_names or
+          config['name'] in journal_state.line_item_ids]
+
+    if journal is not None:
+      create_line_items_and_licas_pipelined(shard_config, creative_ids,
+        sizes, max_workers=shard_max_workers, journal=journal,
+        journal_state=journal_state)
+    elif pipeline:
+      create_line_items_and_licas_pipelined(shard_config, creative_ids,
+        sizes, max_workers=shard_max_workers)
+    else:
+      try:
+        line_item_ids = dfp.create_line_items.create_line_items(shard_config,
+          max_workers=shard_max_workers)
+      except BatchItemErrors as error:
+        # Attach creatives to the line items DFP created before raising, so
+        # none is left without creatives.
+        created_ids = [line_item_id for line_item_id in error.results
+          if line_item_id is not None]
+        logger.error(u'Created {0} line items before the error: {1}'.format(
+          len(created_ids), ', '.join(str(line_item_id)
+            for line_item_id in created_ids)))
+        dfp.associate_line_items_and_creatives.make_licas(created_ids,
+          creative_ids, size_overrides=sizes, max_workers=shard_max_workers)
+        raise
+
+      # Associate creatives with line items.
+      dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
+        creative_ids, size_overrides=sizes, max_workers=shard_max_workers)
+
+    return shard_order_name, num_line_items, len(shard_config)
 
-  # Associate creatives with line items.
-  dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
-    creative_ids, size_overrides=sizes)
+  logger.info("Creating line items...")
+  shard_results = list(dfp.batch.map_batches(
+    lambda batch: set_up_shard(*batch[0]),
+    zip(order_names, order_ids, shards_config), batch_size=1,
+    max_workers=num_concurrent_shards, description='orders'))
+  if journal is not None:
+    journal.record('done')
+
+  for shard_order_name, num_line_items, num_created in shard_results:
+    logger.info(u'Order "{name}": {num_line_items} line items, {num_created} '
+      'created.'.format(name=shard_order_name, num_line_items=num_line_items,
+        num_created=num_created))
+  if num_shards > 1:
+    logger.info(u'Set up {num_line_items} line items in {num_orders} '
+      'orders.'.format(num_line_items=len(line_items_config),
+        num_orders=num_shards))
+  logger.info(dfp.rate_limiter.get_rate_limiter().summary())
+  logger.info(dfp.single_flight.get_single_flight().summary())
 
   logger.info("""
 
@@ -110,33 +260,157 @@ def setup_partner(user_email, advertiser_name, order_name, use_placements, place
 
   """)
 
+def create_line_items_and_licas_pipelined(line_items_config, creative_ids,
+  sizes, max_workers=None, journal=None, journal_state=None):
+  """
+  Create line items in batches and associate creatives with each batch as
+  soon as it is created, so line item and association requests overlap.
+  When association falls behind, line item creation waits for it.
+
+  Args:
+    line_items_config (arr): an array of line item configurations
+    creative_ids (arr): an array of creative IDs
+    sizes (arr): the creative size overrides
+    max_workers (int): the maximum number of concurrent requests in each
+      stage; defaults to the DFP_MAX_WORKERS setting
+    journal (SetupJournal): if given, each created line item batch and
+      association batch is recorded in it
+    journal_state (JournalState): the work done by a previous run; line
+      items it created are not created again, and only their missing
+      associations are made
+  Returns:
+    an array: the IDs of the line items, in the same order as
+      `line_items_config`
+  Raises:
+    the error of the first failed line item batch, e.g. BatchItemErrors if
+      DFP rejects some line items; the line items created by it and by every
+      batch already sent are still recorded and associated first
+  """
+  if max_workers is None:
+    max_workers = dfp.batch.get_max_workers()
+  if journal_state is None:
+    journal_state = JournalState()
+
+  # Skip line items a previous run created.
+  line_item_ids = []
+  remaining_configs = []
+  for config in line_items_config:
+    if config['name'] in journal_state.line_item_ids:
+      line_item_ids.append(journal_state.line_item_ids[config['name']])
+    else:
+      remaining_configs.append(config)
+  unassociated_ids = [line_item_id for line_item_id in line_item_ids
+    if line_item_id not in journal_state.associated_line_item_ids]
+  if line_item_ids:
+    logger.info(u'Skipping {0} line items created by the previous '
+      'run.'.format(len(line_item_ids)))
+
+  def associate(batch_ids):
+    dfp.associate_line_items_and_creatives.make_licas(batch_ids,
+      creative_ids, size_overrides=sizes, max_workers=1)
+    if journal is not None:
+      journal.record('licas', line_item_ids=batch_ids)
+
+  batch_size = getattr(settings, 'DFP_LINE_ITEM_BATCH_SIZE',
+    dfp.batch.DEFAULT_BATCH_SIZE)
+  lica_futures = deque()
+  executor = ThreadPoolExecutor(max_workers=max_workers)
+
+  def submit(batch_ids):
+    lica_futures.append(executor.submit(associate, batch_ids))
+
+    # Backpressure: don't fetch more line item batches while every
+    # association worker is busy.
+    if len(lica_futures) >= max_workers:
+      lica_futures.popleft().result()
+
+  def record_created(batch_configs, batch_ids):
+    if journal is not None:
+      journal.record('line_items',
+        names=[config['name'] for config in batch_configs], ids=batch_ids)
+    line_item_ids.extend(batch_ids)
+    submit(batch_ids)
+
+  errors = []
+  try:
+    # Finish associating creatives with line items from a previous run.
+    for batch_ids in dfp.batch.chunk(unassociated_ids, batch_size):
+      submit(batch_ids)
+
+    # A failed batch doesn't stop the batches already sent, so record and
+    # associate every batch that was created before raising. Association
+    # errors are raised by `submit` as they are.
+    offset = 0
+    for outcome in dfp.create_line_items.iter_create_line_items(
+      remaining_configs, batch_size=batch_size, max_workers=max_workers,
+      return_exceptions=True):
+      if isinstance(outcome, BatchItemErrors):
+        # Keep the line items DFP accepted from the failed batch.
+        batch_configs = remaining_configs[offset:offset + len(outcome.results)]
+        created = [(config, line_item_id) for config, line_item_id
+          in zip(batch_configs, outcome.results) if line_item_id is not None]
+        errors.append(outcome)
+        offset += len(outcome.results)
+      elif isinstance(outcome, Exception):
+        created = []
+        errors.append(outcome)
+        offset += batch_size
+      else:
+        created = list(zip(remaining_configs[offset:offset + len(outcome)],
+          outcome))
+        offset += len(outcome)
+
+      if created:
+        record_created([config for config, _ in created],
+          [line_item_id for _, line_item_id in created])
+
+    while lica_futures:
+      lica_futures.popleft().result()
+  finally:
+    for future in lica_futures:
+      future.cancel()
+    executor.shutdown(wait=True)
+
+  if errors:
+    raise errors[0]
+  return line_item_ids
+
 class DFPValueIdGetter(object):
   """
   A class to bulk fetch DFP values by key and then create new values as needed.
   """
 
-  def __init__(self, key_name, *args, **kwargs):
+  def __init__(self, key_name, key_id=None, *args, **kwargs):
     """
     Args:
       key_name (str): the name of the DFP key
+      key_id (int): the ID of the DFP key, if already known
     """
     self.key_name = key_name
-    self.key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
-    self.existing_values = dfp.get_custom_targeting.get_targeting_by_key_name(
-      key_name)
+    if key_id is None:
+      self.key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
+      catalog = dfp.get_custom_targeting.get_value_catalog(key_name)
+    else:
+      self.key_id = key_id
+      catalog = dfp.get_custom_targeting.get_value_catalog(key_name,
+        key_id=key_id)
+
+    # Value IDs by name. If DFP has duplicate names, the first is used.
+    self.value_ids_by_name = catalog or ValueCatalog(self.key_id)
+    # The values this getter created, by name.
+    self.created_value_ids = {}
+
     super(DFPValueIdGetter, self).__init__(*args, **kwargs)
 
   def _get_value_id_from_cache(self, value_name):
-    val_id = None
-    for value_obj in self.existing_values:
-      if value_obj['name'] == value_name:
-        val_id = value_obj['id']
-        break
-    return val_id
+    return self.value_ids_by_name.get(value_name)
 
   def _create_value_and_return_id(self, value_name):
-    return dfp.create_custom_targeting.create_targeting_value(value_name,
+    val_id = dfp.create_custom_targeting.create_targeting_value(value_name,
       self.key_id)
+    self.value_ids_by_name[value_name] = val_id
+    self.created_value_ids[value_name] = val_id
+    return val_id
 
   def get_value_id(self, value_name):
     """
@@ -152,6 +426,36 @@ class DFPValueIdGetter(object):
       val_id = self._create_value_and_return_id(value_name)
     return val_id
 
+  def get_value_ids(self, value_names):
+    """
+    Get the DFP custom value IDs for many values, creating all values that
+    don't exist in as few requests as possible.
+
+    Args:
+      value_names (arr): an array of DFP value names
+    Returns:
+      an array of integers: the IDs of the DFP values, in the same order as
+        `value_names`
+    """
+    missing_value_names = []
+    seen_value_names = set()
+    for value_name in value_names:
+      if value_name in seen_value_names:
+        continue
+      seen_value_names.add(value_name)
+      if not self._get_value_id_from_cache(value_name):
+        missing_value_names.append(value_name)
+
+    if missing_value_names:
+      created_value_ids = dfp.create_custom_targeting.create_targeting_values(
+        missing_value_names, self.key_id)
+      self.value_ids_by_name.update(
+        zip(missing_value_names, created_value_ids))
+      self.created_value_ids.update(
+        zip(missing_value_names, created_value_ids))
+
+    return [self.value_ids_by_name[value_name] for value_name in value_names]
+
 
 def get_or_create_dfp_targeting_key(name):
   """
@@ -167,14 +471,39 @@ def get_or_create_dfp_targeting_key(name):
     key_id = dfp.create_custom_targeting.create_targeting_key(name)
   return key_id
 
+def get_or_create_dfp_targeting_keys(names):
+  """
+  Get many custom targeting keys by name with one request, creating any
+  missing keys with one more request.
+
+  Args:
+    names (arr): an array of targeting key names
+  Returns:
+    an object: a map of key name to key ID
+  """
+  key_ids = dfp.get_custom_targeting.get_key_ids_by_name(names)
+
+  missing_names = [name for name in names if name not in key_ids]
+  if missing_names:
+    created_key_ids = dfp.create_custom_targeting.create_targeting_keys(
+      missing_names)
+    key_ids.update(zip(missing_names, created_key_ids))
+
+  return key_ids
+
 def create_line_item_configs(prices, order_id, use_placements, placement_ids, ad_unit_ids,
   bidder_code, sizes, hb_bidder_key_id, hb_pb_key_id, hb_size_key_id, currency_code, HBBidderValueGetter,
-  HBPBValueGetter, HBSizeValueGetter):
+  HBPBValueGetter, HBSizeValueGetter, max_rounding_error=None):
   """
   Create a line item config for each price bucket.
 
+  If `max_rounding_error` is given, consecutive price buckets share a line
+  item instead, which targets all of their `hb_pb` values and has the CPM of
+  the lowest one. See tasks.line_item_grouping.
+
   Args:
-    prices (array)
+    prices (array or PriceTable): prices in micro-amounts; a PriceTable
+      saves formatting the prices and line item names again
     order_id (int)
     use_placements (bool)
     placement_ids (arr)
@@ -187,6 +516,8 @@ def create_line_item_configs(prices, order_id, use_placements, placement_ids, ad
     HBBidderValueGetter (DFPValueIdGetter)
     HBPBValueGetter (DFPValueIdGetter)
     HBSizeValueGetter (DFPValueIdGetter)
+    max_rounding_error (int): the maximum difference, in micro-amounts,
+      between a line item's CPM and the prices it targets
   Returns:
     an array of objects: the array of DFP line item configurations
   """
@@ -194,30 +525,36 @@ def create_line_item_configs(prices, order_id, use_placements, placement_ids, ad
   # The DFP targeting value ID for this `hb_bidder` code.
   hb_bidder_value_id = HBBidderValueGetter.get_value_id(bidder_code)
 
-  line_items_config = []
-  for price in prices:
-
-    price_str = num_to_str(micro_amount_to_num(price))
-
-    # Autogenerate the line item name.
-    line_item_name = ''
-    
-    if getattr(settings, 'DFP_LINE_ITEM_PREFIX', None) is not None and settings.DFP_LINE_ITEM_PREFIX != '':
-      line_item_name=u'{prefix}{price}'.format(
-        prefix=settings.DFP_LINE_ITEM_PREFIX,
-        price=price_str
-      )
-    else:
-      line_item_name=u'{bidder_code}: HB ${price}'.format(
-        bidder_code=bidder_code,
-        price=price_str
-      )
+  # The DFP targeting value IDs for every `hb_pb` price value and every
+  # `hb_size` value, creating any missing values in bulk.
+  price_table = prices if isinstance(prices, PriceTable) else (
+    PriceTable(prices))
+  hb_pb_value_ids = HBPBValueGetter.get_value_ids(price_table.price_strs)
+  hb_size_value_ids = HBSizeValueGetter.get_value_ids(
+    [str(size['width'])+'x'+str(size['height']) for size in sizes])
+
+  # Autogenerate the line item names.
+  if getattr(settings, 'DFP_LINE_ITEM_PREFIX', None) is not None and settings.DFP_LINE_ITEM_PREFIX != '':
+    line_item_name_prefix = u'{prefix}'.format(
+      prefix=settings.DFP_LINE_ITEM_PREFIX)
+  else:
+    line_item_name_prefix = u'{bidder_code}: HB $'.format(
+      bidder_code=bidder_code)
+  line_item_names = price_table.get_line_item_names(line_item_name_prefix)
 
-    # The DFP targeting value ID for this `hb_pb` price value.
-    hb_pb_value_id = HBPBValueGetter.get_value_id(price_str)
+  if max_rounding_error is None:
+    groups = [[position] for position in range(len(price_table))]
+  else:
+    groups = tasks.line_item_grouping.group_prices(price_table.prices,
+      max_rounding_error)
 
-    # The DFP targeting value ID for this `hb_size` price value.
-    hb_size_value_ids = [HBSizeValueGetter.get_value_id(str(size['width'])+'x'+str(size['height'])) for size in sizes]
+  line_items_config = []
+  for group in groups:
+    floor = group[0]
+    line_item_name = line_item_names[floor]
+    if len(group) > 1:
+      line_item_name = u'{name} - {price_str}'.format(name=line_item_name,
+        price_str=price_table.price_strs[group[-1]])
 
     config = dfp.create_line_items.create_line_item_config(
       name=line_item_name,
@@ -225,15 +562,16 @@ def create_line_item_configs(prices, order_id, use_placements, placement_ids, ad
       use_placements=use_placements,
       placement_ids=placement_ids,
       ad_unit_ids=ad_unit_ids,
-      cpm_micro_amount=price,
+      cpm_micro_amount=price_table.prices[floor],
       sizes=sizes,
       hb_bidder_key_id=hb_bidder_key_id,
       hb_pb_key_id=hb_pb_key_id,
       hb_bidder_value_id=hb_bidder_value_id,
-      hb_pb_value_id=hb_pb_value_id,
+      hb_pb_value_id=hb_pb_value_ids[floor],
       hb_size_key_id=hb_size_key_id,
       hb_size_value_ids=hb_size_value_ids,
       currency_code=currency_code,
+      hb_pb_value_ids=[hb_pb_value_ids[position] for position in group],
     )
 
     line_items_config.append(config)
@@ -251,10 +589,15 @@ def check_price_buckets_validity(price_buckets):
     None
   """
 
+  if is_price_granularity(price_buckets):
+    return
+
   if not isinstance(price_buckets, list):
     raise BadSettingException('The setting "PREBID_PRICE_BUCKETS" '
-      'must be a list of price buckets containing "min", "max", and "increment", '
-      'and optionally "precision"')
+      'must be the name of a Prebid price granularity ({0}) or a list of '
+      'price buckets containing "min", "max", and "increment", '
+      'and optionally "precision"'.format(
+        ', '.join(sorted(PRICE_GRANULARITIES))))
 
   for price_bucket in price_buckets:
     try:
@@ -289,10 +632,14 @@ class color:
    UNDERLINE = '\033[4m'
    END = '\033[0m'
 
-def main():
+def main(resume=False):
   """
   Validate the settings and ask for confirmation from the user. Then,
   start all necessary DFP tasks.
+
+  Args:
+    resume (bool): if True, continue the run recorded in the journal
+      instead of starting a new one
   """
 
   user_email = getattr(settings, 'DFP_USER_EMAIL_ADDRESS', None)
@@ -336,6 +683,8 @@ def main():
 
   currency_code = getattr(settings, 'DFP_CURRENCY_CODE', 'USD')
 
+  pipeline = getattr(settings, 'DFP_PIPELINE_LICAS', False)
+
   # How many creatives to attach to each line item. We need at least one
   # creative per ad unit on a page. See:
   # https://github.com/kmjennison/dfp-prebid-setup/issues/13
@@ -356,13 +705,54 @@ def main():
 
   check_price_buckets_validity(price_buckets)
 
-  prices = get_prices_array(price_buckets)
+  if is_price_granularity(price_buckets):
+    prices = get_price_table(price_buckets)
+  else:
+    prices = get_custom_price_table(price_buckets)
   prices_summary = get_prices_summary_string(prices, precison)
 
+  # Optionally let each line item target several prices.
+  max_rounding_error = getattr(settings, 'DFP_LINE_ITEM_MAX_ROUNDING_ERROR',
+    None)
+  num_line_items = len(prices)
+  grouping_summary = None
+  if max_rounding_error is not None:
+    if max_rounding_error < 0:
+      raise BadSettingException('The setting '
+        '"DFP_LINE_ITEM_MAX_ROUNDING_ERROR" must not be negative.')
+    max_rounding_error = num_to_micro_amount(max_rounding_error, precison)
+    reports = tasks.line_item_grouping.get_grouping_tradeoff(prices,
+      [num_to_micro_amount(error, precison) for error in
+        tasks.line_item_grouping.TRADEOFF_MAX_ROUNDING_ERRORS] +
+      [max_rounding_error])
+    num_line_items = [report.num_line_items for report in reports
+      if report.max_rounding_error == max_rounding_error][0]
+    grouping_summary = tasks.line_item_grouping.get_tradeoff_summary_string(
+      reports, precison)
+
+  # Orders hold a limited number of line items.
+  order_names = tasks.order_shards.get_shard_order_names(order_name,
+    tasks.order_shards.get_num_shards(num_line_items))
+
+  journal = None
+  journal_path = get_journal_path(order_name, bidder_code)
+  if journal_path is not None:
+    journal = SetupJournal(journal_path)
+
+  if resume:
+    if journal is None or not journal.exists():
+      raise BadSettingException('There is no journal to resume for the order '
+        '"{0}". Set "DFP_JOURNAL_DIR" and run without --resume.'.format(
+          order_name))
+    if journal.replay().done:
+      logger.info(u'The run recorded in {0} already finished.'.format(
+        journal_path))
+      return
+
   targetLogging = u"""
 
     Going to create {name_start_format}{num_line_items}{format_end} new line items.
-      {name_start_format}Order{format_end}: {value_start_format}{order_name}{format_end}
+      {name_start_format}Order{format_end}: {value_start_format}{order_name}{format_end}{order_shards}
       {name_start_format}Advertiser{format_end}: {value_start_format}{advertiser}{format_end}
 
     Line items will have targeting:
@@ -376,12 +766,30 @@ def main():
     targetLogging += u"""
       {name_start_format}ad_units{format_end} = {value_start_format}{ad_units}{format_end}"""
 
+  if grouping_summary is not None:
+    targetLogging += u"""
+
+    Each line item targets several prices, with its CPM at the lowest one.
+    Line items needed for {num_prices} prices, by max rounding error:
+{grouping_summary}"""
+
+  if resume:
+    targetLogging += u"""
+
+    Resuming the previous run recorded in {journal_path}."""
+
   targetLogging += "\n"
 
   logger.info(
     targetLogging.format(
-      num_line_items = len(prices),
+      num_line_items = num_line_items,
+      num_prices=len(prices),
+      grouping_summary=u'\n'.join(u'      ' + line
+        for line in (grouping_summary or u'').split(u'\n')),
       order_name=order_name,
+      order_shards=u'' if len(order_names) == 1 else (
+        u', split into {0} orders: "{1}" to "{2}"'.format(len(order_names),
+          order_names[0], order_names[-1])),
       advertiser=advertiser_name,
       user_email=user_email,
       prices_summary=prices_summary,
@@ -392,6 +800,7 @@ def main():
       name_start_format=color.BOLD,
       format_end=color.END,
       value_start_format=color.BLUE,
+      journal_path=journal_path,
     ))
 
   ok = input('Is this correct? (y/n)\n')
@@ -400,6 +809,10 @@ def main():
     logger.info('Exiting.')
     return
 
+  if journal is not None and not resume:
+    journal.start(order_name=order_name, bidder_code=bidder_code,
+      num_line_items=num_line_items)
+
   setup_partner(
     user_email,
     advertiser_name,
@@ -412,7 +825,10 @@ def main():
     prices,
     num_creatives,
     currency_code,
+    pipeline=pipeline,
+    journal=journal,
+    max_rounding_error=max_rounding_error,
   )
 
 if __name__ == '__main__':
-  main()
+  main(resume='--resume' in sys.argv[1:])
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import re
+import threading
+
+import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class JournalState(object):
+  """
+  The DFP objects a setup run created, rebuilt from its journal.
+  """
+
+  def __init__(self):
+    # The ID of the last order created.
+    self.order_id = None
+    # A map of order name to order ID.
+    self.order_ids = {}
+    self.creative_ids = None
+    # A map of targeting key name to a map of value name to value ID.
+    self.value_ids = {}
+    # A map of line item name to line item ID.
+    self.line_item_ids = {}
+    # The IDs of line items whose creatives are associated.
+    self.associated_line_item_ids = set()
+    self.done = False
+
+  def apply(self, entry):
+    """
+    Updates the state with one journal entry.
+
+    Args:
+      entry (object): a journal entry
+    Returns:
+      None
+    """
+    event = entry['event']
+    if event == 'order':
+      self.order_id = entry['order_id']
+      if 'order_name' in entry:
+        self.order_ids[entry['order_name']] = entry['order_id']
+    elif event == 'creatives':
+      self.creative_ids = entry['creative_ids']
+    elif event == 'targeting_values':
+      self.value_ids.setdefault(entry['key_name'], {}).update(entry['values'])
+    elif event == 'line_items':
+      self.line_item_ids.update(zip(entry['names'], entry['ids']))
+    elif event == 'licas':
+      self.associated_line_item_ids.update(entry['line_item_ids'])
+    elif event == 'done':
+      self.done = True
+
+
+class SetupJournal(object):
+  """
+  An append-only log of the DFP objects created by a setup run, one JSON
+  object per line. Each entry is flushed to disk before the run continues,
+  so a run that dies can be resumed from its journal.
+  """
+
+  def __init__(self, path):
+    """
+    Args:
+      path (str): the path of the journal file
+    """
+    self.path = path
+    self._lock = threading.Lock()
+
+  def exists(self):
+    return os.path.exists(self.path)
+
+  def start(self, **data):
+    """
+    Starts a new journal, discarding any previous one.
+
+    Args:
+      data: information about the run, stored in the first entry
+    Returns:
+      None
+    """
+    directory = os.path.dirname(self.path)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory)
+    with self._lock:
+      open(self.path, 'w').close()
+    self.record('start', **data)
+
+  def record(self, event, **data):
+    """
+    Appends an entry to the journal.
+
+    Args:
+      event (str): the kind of entry, e.g. 'order' or 'line_items'
+      data: the entry's data; must be JSON serializable
+    Returns:
+      None
+    """
+    entry = dict(data, event=event)
+    line = json.dumps(entry, sort_keys=True)
+    with self._lock:
+      with open(self.path, 'a') as journal_file:
+        journal_file.write(line + '\n')
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+  def replay(self):
+    """
+    Rebuilds the state of the run from the journal. A partially written
+    last line, left by a crash, is ignored.
+
+    Returns:
+      a JournalState
+    """
+    state = JournalState()
+    if not self.exists():
+      return state
+
+    with open(self.path, 'r') as journal_file:
+      for line in journal_file:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          logger.warning(u'Ignoring an incomplete journal entry.')
+          continue
+        state.apply(entry)
+    return state
+
+def get_journal_path(order_name, bidder_code):
+  """
+  Returns the journal file path for a setup run.
+
+  Args:
+    order_name (str): the name of the DFP order
+    bidder_code (str): the Prebid bidder code
+  Returns:
+    a string, or None if `DFP_JOURNAL_DIR` is not set
+  """
+  journal_dir = getattr(settings, 'DFP_JOURNAL_DIR', None)
+  if not journal_dir:
+    return None
+  file_name = re.sub(r'[^A-Za-z0-9_.-]+', '_',
+    u'{0}-{1}'.format(bidder_code, order_name))
+  return os.path.join(journal_dir, file_name + '.jsonl')
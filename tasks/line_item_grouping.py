@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+from tasks.price_utils import micro_amount_to_num, num_to_str
+
+
+# The maximum rounding errors, in currency units, compared in the tradeoff
+# report.
+TRADEOFF_MAX_ROUNDING_ERRORS = [0, 0.05, 0.10, 0.25, 0.50, 1.00]
+
+def group_prices(prices, max_rounding_error):
+  """
+  Groups consecutive prices so that each group can share one line item whose
+  CPM is the group's lowest price (its floor). A bid in the group is valued
+  at the floor, so the revenue rounding error of a group is its highest
+  price minus its floor, and is at most `max_rounding_error`.
+
+  Each group is filled greedily from its floor, which gives the fewest
+  groups for the error bound.
+
+  Args:
+    prices (arr): prices in micro-amounts, in increasing order
+    max_rounding_error (int): the maximum rounding error in micro-amounts
+  Returns:
+    an array of arrays: the positions in `prices` of each group's prices
+  """
+  groups = []
+  floor = None
+  for position, price in enumerate(prices):
+    if floor is None or price - floor > max_rounding_error:
+      groups.append([])
+      floor = price
+    groups[-1].append(position)
+  return groups
+
+class GroupingReport(object):
+  """
+  How accurate a grouping of prices is, and how many line items it needs.
+  Mean errors assume bids are spread evenly over the prices.
+  """
+
+  def __init__(self, prices, groups, max_rounding_error):
+    self.max_rounding_error = max_rounding_error
+    self.num_prices = len(prices)
+    self.num_line_items = len(groups)
+
+    errors = [prices[position] - prices[group[0]]
+      for group in groups for position in group]
+    self.max_error = max(errors) if errors else 0
+    self.mean_error = float(sum(errors)) / len(errors) if errors else 0.0
+
+  def summary(self, precision=2):
+    return (u'max error {max_error}: {num_line_items} line items '
+      '(actual max error {actual_max_error}, mean error {mean_error})'.format(
+        max_error=num_to_str(micro_amount_to_num(self.max_rounding_error),
+          precision),
+        num_line_items=self.num_line_items,
+        actual_max_error=num_to_str(micro_amount_to_num(self.max_error),
+          precision),
+        mean_error=num_to_str(micro_amount_to_num(self.mean_error),
+          precision + 2)))
+
+def get_grouping_tradeoff(prices, max_rounding_errors):
+  """
+  Groups the prices for each of several maximum rounding errors.
+
+  Args:
+    prices (arr): prices in micro-amounts, in increasing order
+    max_rounding_errors (arr): maximum rounding errors in micro-amounts
+  Returns:
+    an array of GroupingReports, one per maximum rounding error
+  """
+  return [GroupingReport(prices, group_prices(prices, max_rounding_error),
+      max_rounding_error)
+    for max_rounding_error in sorted(set(max_rounding_errors))]
+
+def get_tradeoff_summary_string(reports, precision=2):
+  """
+  Returns a string with one line per grouping report.
+
+  Args:
+    reports (arr): an array of GroupingReports
+    precision (int): the number of decimals of prices
+  Returns:
+    a string
+  """
+  return u'\n'.join(report.summary(precision) for report in reports)
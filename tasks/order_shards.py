@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import settings
+from dfp.exceptions import BadSettingException
+
+
+# DFP allows at most 450 line items per order; use all of them by default.
+DEFAULT_MAX_LINE_ITEMS_PER_ORDER = 450
+
+def get_max_line_items_per_order():
+  """
+  Returns the number of line items allowed in one order by settings.
+
+  Returns:
+    an integer
+  """
+  max_line_items = getattr(settings, 'DFP_MAX_LINE_ITEMS_PER_ORDER',
+    None) or DEFAULT_MAX_LINE_ITEMS_PER_ORDER
+  if max_line_items < 1:
+    raise BadSettingException('The setting "DFP_MAX_LINE_ITEMS_PER_ORDER" '
+      'must be at least 1.')
+  return max_line_items
+
+def get_num_shards(num_line_items, max_line_items=None):
+  """
+  Gets the number of orders needed for the line items.
+
+  Args:
+    num_line_items (int)
+    max_line_items (int): the maximum number of line items per order;
+      defaults to the DFP_MAX_LINE_ITEMS_PER_ORDER setting
+  Returns:
+    an integer, at least 1
+  """
+  if max_line_items is None:
+    max_line_items = get_max_line_items_per_order()
+  return max(1, -(-num_line_items // max_line_items))
+
+def get_shard_order_names(order_name, num_shards):
+  """
+  Names the orders of a setup. A single order keeps the configured name;
+  otherwise each name gets its position, e.g. 'Prebid (2/5)'.
+
+  Args:
+    order_name (str): the DFP_ORDER_NAME setting
+    num_shards (int)
+  Returns:
+    an array of strings
+  """
+  if num_shards == 1:
+    return [order_name]
+  return [u'{name} ({num}/{total})'.format(name=order_name, num=num,
+    total=num_shards) for num in range(1, num_shards + 1)]
+
+def split_line_items(line_items_config, num_shards):
+  """
+  Splits line items into consecutive runs of nearly equal size, so each
+  order gets a contiguous range of prices.
+
+  Args:
+    line_items_config (arr): an array of line item configs
+    num_shards (int)
+  Returns:
+    an array of arrays, one per order
+  """
+  shard_size, num_larger_shards = divmod(len(line_items_config), num_shards)
+  shards = []
+  start = 0
+  for num in range(num_shards):
+    end = start + shard_size + (1 if num < num_larger_shards else 0)
+    shards.append(line_items_config[start:end])
+    start = end
+  return shards
@@ -1,4 +1,35 @@
+import threading
+
 import settings
+from dfp.exceptions import BadSettingException
+
+# Arbitrary max CPM to prevent large user errors.
+MAX_CPM = 500.00
+
+# Prebid's built-in price granularities. Bids above the last bucket's max
+# are rounded down to it, so it gets a price too. See:
+# http://prebid.org/dev-docs/publisher-api-reference.html#module_pbjs.setPriceGranularity
+PRICE_GRANULARITIES = {
+  'low': [
+    {'min': 0, 'max': 5, 'increment': 0.50},
+  ],
+  'medium': [
+    {'min': 0, 'max': 20, 'increment': 0.10},
+  ],
+  'high': [
+    {'min': 0, 'max': 20, 'increment': 0.01},
+  ],
+  'auto': [
+    {'min': 0, 'max': 5, 'increment': 0.05},
+    {'min': 5, 'max': 10, 'increment': 0.10},
+    {'min': 10, 'max': 20, 'increment': 0.50},
+  ],
+  'dense': [
+    {'min': 0, 'max': 3, 'increment': 0.01},
+    {'min': 3, 'max': 8, 'increment': 0.05},
+    {'min': 8, 'max': 20, 'increment': 0.50},
+  ],
+}
 
 def num_to_micro_amount(num, precision=2):
   """
@@ -40,73 +71,227 @@ def num_to_str(num, precision=2):
   """
   return '%.{0}f'.format(str(precision)) % num 
 
-def get_prices_array(price_buckets):
+def get_price_ranges(price_buckets, default_precision=2):
   """
-  Creates an array of price bucket cutoffs in micro-amounts
-  from a price_bucket configuration.
+  Converts price buckets into integer micro-amount ranges, each rounded to
+  its bucket's precision, and checks that the buckets are in increasing
+  order and don't overlap.
 
   Args:
-    price_bucket (list): the price bucket configuration as a list of bucket objects
+    price_buckets (list): the price bucket configuration as a list of
+      bucket objects
+    default_precision (int): the precision of buckets without a 'precision'
   Returns:
-    an array of integers: every price bucket cutoff from:
-      int(round(price_bucket['min'] * 10**6, precision)) to 
-      int(round(price_bucket['max'] * 10**6, precision))
+    an array of tuples: (start, end, increment) micro-amounts for each bucket,
+      where `end` is the bucket's max
   """
+  ranges = []
+  for price_bucket in price_buckets:
+    precision = price_bucket.get('precision', default_precision)
+    start_cpm = price_bucket['min'] if price_bucket['min'] >= 0 else 0.00
+    end_cpm = min(price_bucket['max'], MAX_CPM)
 
-  # Arbitrary max CPM to prevent large user errors.
-  cpm_max_allowed = 500.00
-  prices = []
+    start = num_to_micro_amount(start_cpm, precision)
+    end = num_to_micro_amount(end_cpm, precision)
+    increment = num_to_micro_amount(price_bucket['increment'], precision)
+    if increment <= 0:
+      raise BadSettingException('The price bucket increment {0} is zero at a '
+        'precision of {1} decimals.'.format(price_bucket['increment'],
+          precision))
+    if start > end:
+      raise BadSettingException('The price bucket min {0} is greater than its '
+        'max {1}.'.format(price_bucket['min'], price_bucket['max']))
+    ranges.append((start, end, increment))
 
-  for price_bucket in price_buckets:
-    end_cpm = (
-      price_bucket['max'] if 
-      price_bucket['max'] < cpm_max_allowed else 
-      cpm_max_allowed)
-
-    start_cpm = price_bucket['min'] if price_bucket['min'] >=0 else 0.00
-    increment = price_bucket['increment']
-
-    precision = getattr(settings, 'PREBID_PRICE_PRECISION', 2)
-
-    start_cpm_micro_amount = num_to_micro_amount(start_cpm, precision)
-    end_cpm_micro_amount = num_to_micro_amount(end_cpm, precision)
-    increment_micro_amount = num_to_micro_amount(increment, precision)
-
-    current_cpm_micro_amount = start_cpm_micro_amount
-    
-    while current_cpm_micro_amount < end_cpm_micro_amount:
-      prices.append(current_cpm_micro_amount)
-      current_cpm_micro_amount += increment_micro_amount
-    
-    # Quit early if we've already exceeded the max CPM
-    if price_bucket['max'] == cpm_max_allowed:
+    # Stop early if we've already reached the max CPM.
+    if price_bucket['max'] == MAX_CPM:
       break
 
+  # Sorting finds unordered and overlapping buckets in O(n log n).
+  nonempty_ranges = [price_range for price_range in ranges
+    if price_range[0] < price_range[1]]
+  sorted_ranges = sorted(nonempty_ranges)
+  if sorted_ranges != nonempty_ranges:
+    raise BadSettingException('The setting "PREBID_PRICE_BUCKETS" must list '
+      'buckets in increasing order.')
+  for previous_range, price_range in zip(sorted_ranges, sorted_ranges[1:]):
+    if price_range[0] < previous_range[1]:
+      raise BadSettingException(('The price buckets from {0} to {1} and from '
+        '{2} to {3} overlap.').format(
+          micro_amount_to_num(previous_range[0]),
+          micro_amount_to_num(previous_range[1]),
+          micro_amount_to_num(price_range[0]),
+          micro_amount_to_num(price_range[1])))
+
+  return ranges
+
+def _get_prices_and_precisions(price_buckets):
+  include_max = isinstance(price_buckets, dict)
+  if include_max:
+    price_buckets = [price_buckets]
+
+  default_precision = getattr(settings, 'PREBID_PRICE_PRECISION', 2)
+
+  prices = []
+  precisions = []
+  for price_bucket, (start, end, increment) in zip(price_buckets,
+    get_price_ranges(price_buckets, default_precision)):
+    bucket_prices = range(start, end + 1 if include_max else end, increment)
+    prices.extend(bucket_prices)
+    precisions.extend([price_bucket.get('precision', default_precision)] *
+      len(bucket_prices))
+  return prices, precisions
+
+def get_prices_array(price_buckets):
+  """
+  Creates an array of price bucket cutoffs in micro-amounts
+  from a price_bucket configuration, using only integer arithmetic once each
+  bucket's bounds are converted.
+
+  Args:
+    price_buckets (list): the price bucket configuration as a list of bucket
+      objects, each with an optional 'precision' that overrides the
+      PREBID_PRICE_PRECISION setting; or a single bucket object, whose max is
+      included
+  Returns:
+    an array of integers: every price bucket cutoff from each bucket's min
+      up to, but not including, its max
+  """
+  prices, _ = _get_prices_and_precisions(price_buckets)
   return prices
 
+def get_custom_price_table(price_buckets):
+  """
+  Creates the price table of a price bucket configuration, formatting each
+  price with its bucket's precision.
+
+  Args:
+    price_buckets (list or object): the price bucket configuration, as for
+      `get_prices_array`
+  Returns:
+    a PriceTable
+  """
+  prices, precisions = _get_prices_and_precisions(price_buckets)
+  return PriceTable(prices, precisions)
+
 def get_prices_summary_string(prices_array, precision=2):
   """
   Returns a string preview of the prices array.
 
   Args:
-    prices_array (array): the list of prices in micro-amounts
+    prices_array (array or PriceTable): the list of prices in micro-amounts;
+      a PriceTable's prices are shown with their own precision
   Returns:
     a string: a preview of the first few and last few
       items in the array in regular amounts (converted from
       micro-amounts).
   """
-  if (len(prices_array) < 6):
-    summary = ', '.join(
-      [num_to_str(micro_amount_to_num(price), precision)
-        for price in prices_array])
+  if isinstance(prices_array, PriceTable):
+    price_strs = prices_array.price_strs
+  else:
+    price_strs = [num_to_str(micro_amount_to_num(price), precision)
+      for price in prices_array]
+
+  if (len(price_strs) < 6):
+    summary = ', '.join(price_strs)
   else:
     summary = '{0}, {1}, {2}, ... {3}, {4}, {5}'.format(
-        num_to_str(micro_amount_to_num(prices_array[0]), precision),
-        num_to_str(micro_amount_to_num(prices_array[1]), precision),
-        num_to_str(micro_amount_to_num(prices_array[2]), precision),
-        num_to_str(micro_amount_to_num(prices_array[-3]), precision),
-        num_to_str(micro_amount_to_num(prices_array[-2]), precision),
-        num_to_str(micro_amount_to_num(prices_array[-1]), precision),
+        price_strs[0],
+        price_strs[1],
+        price_strs[2],
+        price_strs[-3],
+        price_strs[-2],
+        price_strs[-1],
       )
 
   return summary
+
+class PriceTable(object):
+  """
+  A price grid with its `hb_pb` strings computed once, and line item names
+  computed once per name prefix. It can be used like the array of prices.
+  """
+
+  def __init__(self, prices, precision=2):
+    """
+    Args:
+      prices (iterable): prices in micro-amounts
+      precision (int or arr): the number of decimals in `hb_pb` strings, or
+        an array with the number of decimals of each price
+    """
+    self.prices = tuple(prices)
+    if isinstance(precision, int):
+      precisions = [precision] * len(self.prices)
+    else:
+      precisions = precision
+    self.price_strs = tuple(
+      num_to_str(micro_amount_to_num(price), price_precision)
+      for price, price_precision in zip(self.prices, precisions))
+    self._line_item_names = {}
+    self._lock = threading.Lock()
+
+  def get_line_item_names(self, prefix):
+    """
+    Gets the line item name of each price: the prefix followed by the price.
+
+    Args:
+      prefix (str): e.g. 'mybidder: HB $'
+    Returns:
+      a tuple of strings
+    """
+    with self._lock:
+      if prefix not in self._line_item_names:
+        self._line_item_names[prefix] = tuple(prefix + price_str
+          for price_str in self.price_strs)
+      return self._line_item_names[prefix]
+
+  def __len__(self):
+    return len(self.prices)
+
+  def __iter__(self):
+    return iter(self.prices)
+
+  def __getitem__(self, index):
+    return self.prices[index]
+
+def is_price_granularity(price_buckets):
+  """
+  Returns whether the price bucket setting names a built-in granularity.
+
+  Args:
+    price_buckets (str, list or object)
+  Returns:
+    a boolean
+  """
+  try:
+    return price_buckets in PRICE_GRANULARITIES
+  except TypeError:
+    # Lists and objects can't be granularity names.
+    return False
+
+_price_tables = {}
+_price_tables_lock = threading.Lock()
+
+def get_price_table(granularity):
+  """
+  Gets the precomputed price table of one of Prebid's built-in price
+  granularities.
+
+  Args:
+    granularity (str): 'low', 'medium', 'high', 'auto' or 'dense'
+  Returns:
+    a PriceTable
+  """
+  if not is_price_granularity(granularity):
+    raise BadSettingException(('Unknown price granularity "{0}". Use one of: '
+      '{1}.').format(granularity, ', '.join(sorted(PRICE_GRANULARITIES))))
+
+  with _price_tables_lock:
+    if granularity not in _price_tables:
+      prices = []
+      for start, end, increment in get_price_ranges(
+        PRICE_GRANULARITIES[granularity]):
+        prices.extend(range(start, end, increment))
+      prices.append(end)
+      _price_tables[granularity] = PriceTable(prices)
+    return _price_tables[granularity]
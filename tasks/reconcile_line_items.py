@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+import logging
+
+import dfp.get_line_items
+import dfp.update_line_items
+
+
+logger = logging.getLogger(__name__)
+
+def _get(obj, name, default=None):
+  """
+  Gets a field from a line item config (a dict) or a DFP object, either of
+  which may leave the field out.
+  """
+  try:
+    value = obj[name]
+  except (AttributeError, KeyError, TypeError):
+    return default
+  return default if value is None else value
+
+def get_custom_criteria_value_ids(line_item, key_id):
+  """
+  Gets the targeted value IDs of a custom targeting key.
+
+  Args:
+    line_item (object): a line item config or DFP line item
+    key_id (int): the ID of the targeting key
+  Returns:
+    a tuple: the sorted value IDs
+  """
+  value_ids = []
+  criteria_sets = [_get(_get(line_item, 'targeting'), 'customTargeting')]
+  while criteria_sets:
+    criteria = criteria_sets.pop()
+    if criteria is None:
+      continue
+    criteria_sets.extend(_get(criteria, 'children', []))
+    if _get(criteria, 'keyId') == key_id:
+      value_ids.extend(_get(criteria, 'valueIds', []))
+  return tuple(sorted(value_ids))
+
+def get_line_item_sizes(line_item):
+  """
+  Gets the creative sizes of a line item.
+
+  Args:
+    line_item (object): a line item config or DFP line item
+  Returns:
+    a tuple: sorted (width, height) tuples
+  """
+  sizes = []
+  for placeholder in _get(line_item, 'creativePlaceholders', []):
+    size = _get(placeholder, 'size')
+    sizes.append((int(_get(size, 'width')), int(_get(size, 'height'))))
+  return tuple(sorted(sizes))
+
+def get_line_item_key(line_item, key_ids):
+  """
+  Gets what identifies a Prebid line item: its hb_bidder and hb_pb values,
+  its sizes and its CPM.
+
+  Args:
+    line_item (object): a line item config or DFP line item
+    key_ids (dict): a map of Prebid targeting key name to key ID
+  Returns:
+    a tuple
+  """
+  return (
+    get_custom_criteria_value_ids(line_item, key_ids['hb_bidder']),
+    get_custom_criteria_value_ids(line_item, key_ids['hb_pb']),
+    get_line_item_sizes(line_item),
+    _get(_get(line_item, 'costPerUnit'), 'microAmount'),
+  )
+
+def get_line_item_scope(line_item, key_ids):
+  """
+  Gets the hb_bidder values and sizes of a line item. Setup only changes
+  existing line items with the same scope as one of its own, so line items
+  for other bidders or sizes in the order are left alone.
+
+  Args:
+    line_item (object): a line item config or DFP line item
+    key_ids (dict): a map of Prebid targeting key name to key ID
+  Returns:
+    a tuple
+  """
+  return (
+    get_custom_criteria_value_ids(line_item, key_ids['hb_bidder']),
+    get_line_item_sizes(line_item),
+  )
+
+def get_line_item_settings(line_item, key_ids):
+  """
+  Gets the line item fields that setup can change without replacing the
+  line item.
+
+  Args:
+    line_item (object): a line item config or DFP line item
+    key_ids (dict): a map of Prebid targeting key name to key ID
+  Returns:
+    a tuple
+  """
+  inventory_targeting = _get(_get(line_item, 'targeting'),
+    'inventoryTargeting')
+  placement_ids = _get(inventory_targeting, 'targetedPlacementIds', [])
+  ad_unit_ids = [_get(ad_unit, 'adUnitId')
+    for ad_unit in _get(inventory_targeting, 'targetedAdUnits', [])]
+  return (
+    _get(line_item, 'name'),
+    _get(_get(line_item, 'costPerUnit'), 'currencyCode'),
+    tuple(sorted(placement_ids)),
+    tuple(sorted(ad_unit_ids)),
+    get_custom_criteria_value_ids(line_item, key_ids['hb_size']),
+  )
+
+def apply_line_item_config(line_item, config):
+  """
+  Copies the settings of a line item config onto an existing line item.
+
+  Args:
+    line_item (object): a DFP line item
+    config (object): a line item config
+  Returns:
+    None
+  """
+  line_item['name'] = config['name']
+  line_item['costPerUnit'] = config['costPerUnit']
+  line_item['targeting']['inventoryTargeting'] = (
+    config['targeting']['inventoryTargeting'])
+  line_item['targeting']['customTargeting'] = (
+    config['targeting']['customTargeting'])
+
+class ReconcilePlan(object):
+  """
+  The changes that turn an order's line items into the desired ones.
+  """
+
+  def __init__(self):
+    # Line item configs to create.
+    self.creates = []
+    # Existing line items with the desired settings applied.
+    self.updates = []
+    # The IDs of line items to archive.
+    self.archive_ids = []
+    self.num_unchanged = 0
+    # Existing line items for other bidders or sizes, which are left alone.
+    self.num_other = 0
+
+  def summary(self):
+    return (u'{creates} line items to create, {updates} to update, {archives} '
+      'to archive, {unchanged} unchanged, {other} for other bidders or sizes '
+      'left alone.'.format(creates=len(self.creates),
+        updates=len(self.updates), archives=len(self.archive_ids),
+        unchanged=self.num_unchanged, other=self.num_other))
+
+def plan_line_items(line_items_config, existing_line_items, key_ids):
+  """
+  Matches the desired line items to existing ones by hb_bidder, hb_pb,
+  sizes and CPM, and plans the fewest changes that make the order match.
+  Existing line items with the hb_bidder values and sizes of a desired line
+  item, but that no desired line item matches, are archived; line items for
+  other bidders or sizes are left alone.
+
+  Args:
+    line_items_config (arr): an array of line item configs
+    existing_line_items (arr): an array of DFP line items in the order
+    key_ids (dict): a map of Prebid targeting key name to key ID
+  Returns:
+    a ReconcilePlan
+  """
+  scopes = set(get_line_item_scope(config, key_ids)
+    for config in line_items_config)
+  existing_by_key = {}
+  plan = ReconcilePlan()
+  for line_item in existing_line_items:
+    if get_line_item_scope(line_item, key_ids) not in scopes:
+      plan.num_other += 1
+      continue
+    key = get_line_item_key(line_item, key_ids)
+    if key in existing_by_key:
+      # Only one line item per key is needed.
+      plan.archive_ids.append(line_item['id'])
+    else:
+      existing_by_key[key] = line_item
+
+  for config in line_items_config:
+    line_item = existing_by_key.pop(get_line_item_key(config, key_ids), None)
+    if line_item is None:
+      plan.creates.append(config)
+    elif (get_line_item_settings(line_item, key_ids) !=
+      get_line_item_settings(config, key_ids)):
+      apply_line_item_config(line_item, config)
+      plan.updates.append(line_item)
+    else:
+      plan.num_unchanged += 1
+
+  plan.archive_ids.extend(
+    line_item['id'] for line_item in existing_by_key.values())
+  plan.archive_ids.sort()
+  return plan
+
+def reconcile_line_items(order_id, line_items_config, key_ids):
+  """
+  Updates and archives the line items in an existing order so that they
+  match the desired ones. Line items for other bidders or sizes are left
+  alone.
+
+  Args:
+    order_id (int): the ID of the DFP order
+    line_items_config (arr): an array of line item configs
+    key_ids (dict): a map of Prebid targeting key name to key ID
+  Returns:
+    an array: the line item configs that still need to be created
+  """
+  existing_line_items = dfp.get_line_items.get_line_items_by_order_id(
+    order_id)
+  plan = plan_line_items(line_items_config, existing_line_items, key_ids)
+  logger.info(plan.summary())
+
+  if plan.updates:
+    dfp.update_line_items.update_line_items(plan.updates)
+  if plan.archive_ids:
+    dfp.update_line_items.archive_line_items(plan.archive_ids)
+  return plan.creates
@@ -4,10 +4,18 @@ from unittest import TestCase
 from mock import MagicMock, patch
 
 import settings
+import dfp.client
 import tasks.add_new_prebid_partner
-from dfp.exceptions import BadSettingException, MissingSettingException
+from dfp.exceptions import (
+  BadSettingException,
+  BatchItemErrors,
+  MissingSettingException,
+)
+from dfp.value_catalog import ValueCatalog
 from tasks.add_new_prebid_partner import DFPValueIdGetter
+from tasks.journal import JournalState
 from tasks.price_utils import (
+  get_custom_price_table,
   get_prices_array,
 )
 
@@ -46,6 +54,9 @@ prices = get_prices_array(price_buckets)
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class AddNewPrebidPartnerTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_missing_email_setting(self, mock_dfp_client):
     """
     It throws an exception with a missing setting.
@@ -200,7 +211,8 @@ class AddNewPrebidPartnerTests(TestCase):
 
   @patch('tasks.add_new_prebid_partner.create_line_item_configs')
   @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
-  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_key')
+  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_keys',
+    return_value={'hb_bidder': 111, 'hb_pb': 222, 'hb_size': 333})
   @patch('dfp.associate_line_items_and_creatives')
   @patch('dfp.create_creatives')
   @patch('dfp.create_line_items')
@@ -210,9 +222,8 @@ class AddNewPrebidPartnerTests(TestCase):
   @patch('dfp.get_users')
   def test_setup_partner(self, mock_get_users, mock_get_placements,
     mock_get_advertisers, mock_create_orders, mock_create_line_items,
-    mock_create_creatives, mock_licas, mock_dfp_client,
-    mock_get_or_create_dfp_targeting_key, mock_dfp_value_id_getter,
-    mock_create_line_item_configs):
+    mock_create_creatives, mock_licas, mock_get_or_create_dfp_targeting_keys,
+    mock_dfp_value_id_getter, mock_create_line_item_configs, mock_dfp_client):
     """
     It calls all expected DFP functions.
     """
@@ -250,6 +261,328 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_creatives.create_creatives.assert_called_once()
     mock_create_line_items.create_line_items.assert_called_once()
     mock_licas.make_licas.assert_called_once()
+    mock_get_or_create_dfp_targeting_keys.assert_called_once_with(
+      ['hb_bidder', 'hb_pb', 'hb_size'])
+    mock_dfp_value_id_getter.assert_any_call('hb_pb', key_id=222)
+
+  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_keys')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partner_lookup_error(self, mock_get_users,
+    mock_get_placements, mock_get_advertisers,
+    mock_get_or_create_dfp_targeting_keys, mock_dfp_client):
+    """
+    It creates nothing in DFP when a read-only lookup fails.
+    """
+
+    mock_get_users.get_user_id_by_email = MagicMock(
+      side_effect=ValueError('unknown user'))
+
+    with self.assertRaises(ValueError):
+      tasks.add_new_prebid_partner.setup_partner(
+        user_email=email,
+        advertiser_name=advertiser,
+        order_name=order,
+        use_placements=True,
+        placements=placements,
+        ad_units=[],
+        bidder_code=bidder_code,
+        sizes=sizes,
+        prices=prices,
+        num_creatives=2,
+        currency_code='USD',
+      )
+
+    mock_get_placements.get_placement_ids_by_name.assert_called_once_with(
+      placements)
+    mock_get_advertisers.get_advertiser_id_by_name.assert_not_called()
+    mock_get_or_create_dfp_targeting_keys.assert_not_called()
+
+  @patch.multiple('settings', DFP_USE_EXISTING_ORDER_IF_EXISTS=True)
+  @patch('tasks.reconcile_line_items.reconcile_line_items')
+  @patch('tasks.add_new_prebid_partner.create_line_item_configs')
+  @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
+  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_keys',
+    return_value={'hb_bidder': 111, 'hb_pb': 222, 'hb_size': 333})
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partner_existing_order(self, mock_get_users,
+    mock_get_placements, mock_get_advertisers, mock_create_orders,
+    mock_create_line_items, mock_create_creatives, mock_licas,
+    mock_get_or_create_dfp_targeting_keys, mock_dfp_value_id_getter,
+    mock_create_line_item_configs, mock_reconcile, mock_dfp_client):
+    """
+    It only creates the line items the existing order doesn't have.
+    """
+
+    mock_create_orders.create_order = MagicMock(return_value=1357913)
+    configs = [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]
+    mock_create_line_item_configs.return_value = configs
+    mock_reconcile.return_value = [configs[1]]
+
+    tasks.add_new_prebid_partner.setup_partner(
+      user_email=email,
+      advertiser_name=advertiser,
+      order_name=order,
+      use_placements=True,
+      placements=placements,
+      ad_units=[],
+      bidder_code=bidder_code,
+      sizes=sizes,
+      prices=prices,
+      num_creatives=2,
+      currency_code='USD',
+    )
+
+    mock_reconcile.assert_called_once_with(1357913, configs,
+      {'hb_bidder': 111, 'hb_pb': 222, 'hb_size': 333})
+    mock_create_line_items.create_line_items.assert_called_once_with(
+      [configs[1]], max_workers=4)
+
+  @patch('tasks.add_new_prebid_partner.create_line_item_configs')
+  @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
+  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_keys',
+    return_value={'hb_bidder': 111, 'hb_pb': 222, 'hb_size': 333})
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partner_partial_failure(self, mock_get_users,
+    mock_get_placements, mock_get_advertisers, mock_create_orders,
+    mock_create_line_items, mock_create_creatives, mock_licas,
+    mock_get_or_create_dfp_targeting_keys, mock_dfp_value_id_getter,
+    mock_create_line_item_configs, mock_dfp_client):
+    """
+    It attaches creatives to the line items DFP created before raising
+    their errors.
+    """
+
+    mock_create_orders.create_order = MagicMock(return_value=1357913)
+    mock_create_creatives.create_creatives = MagicMock(return_value=[55, 66])
+    configs = [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}]
+    mock_create_line_item_configs.return_value = configs
+    error = BatchItemErrors([10, None, 12],
+      [(1, configs[1], ValueError('bad'))])
+    mock_create_line_items.create_line_items = MagicMock(side_effect=error)
+
+    with self.assertRaises(BatchItemErrors):
+      tasks.add_new_prebid_partner.setup_partner(
+        user_email=email,
+        advertiser_name=advertiser,
+        order_name=order,
+        use_placements=True,
+        placements=placements,
+        ad_units=[],
+        bidder_code=bidder_code,
+        sizes=sizes,
+        prices=prices,
+        num_creatives=2,
+        currency_code='USD',
+      )
+
+    mock_licas.make_licas.assert_called_once_with([10, 12], [55, 66],
+      size_overrides=sizes, max_workers=4)
+
+  @patch.multiple('settings', DFP_MAX_LINE_ITEMS_PER_ORDER=2,
+    DFP_MAX_WORKERS=4, create=True)
+  @patch('tasks.add_new_prebid_partner.create_line_item_configs')
+  @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
+  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_keys',
+    return_value={'hb_bidder': 111, 'hb_pb': 222, 'hb_size': 333})
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partner_sharded(self, mock_get_users, mock_get_placements,
+    mock_get_advertisers, mock_create_orders, mock_create_line_items,
+    mock_create_creatives, mock_licas, mock_get_or_create_dfp_targeting_keys,
+    mock_dfp_value_id_getter, mock_create_line_item_configs, mock_dfp_client):
+    """
+    It splits line items over as many orders as needed, and shares the
+    creatives between them.
+    """
+
+    mock_get_advertisers.get_advertiser_id_by_name = MagicMock(
+      return_value=246810)
+    mock_get_users.get_user_id_by_email = MagicMock(return_value=14523)
+    mock_create_orders.create_order = MagicMock(side_effect=[1, 2, 3])
+    configs = [{'name': name} for name in ['a', 'b', 'c', 'd', 'e']]
+    mock_create_line_item_configs.return_value = configs
+    mock_create_line_items.create_line_items = MagicMock(
+      side_effect=lambda shard_config, max_workers: [
+        config['name'] for config in shard_config])
+
+    tasks.add_new_prebid_partner.setup_partner(
+      user_email=email,
+      advertiser_name=advertiser,
+      order_name=order,
+      use_placements=True,
+      placements=placements,
+      ad_units=[],
+      bidder_code=bidder_code,
+      sizes=sizes,
+      prices=prices,
+      num_creatives=2,
+      currency_code='USD',
+    )
+
+    self.assertEqual(
+      [call[0][0] for call in mock_create_orders.create_order.call_args_list],
+      [order + ' (1/3)', order + ' (2/3)', order + ' (3/3)'])
+    self.assertEqual([config['orderId'] for config in configs],
+      [1, 1, 2, 2, 3])
+    mock_create_creatives.create_creatives.assert_called_once()
+    self.assertEqual(
+      sorted(call[0][0] for call in mock_licas.make_licas.call_args_list),
+      [['a', 'b'], ['c', 'd'], ['e']])
+    mock_create_line_items.create_line_items.assert_any_call(configs[4:],
+      max_workers=1)
+
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_line_items')
+  def test_create_line_items_and_licas_pipelined(self,
+    mock_create_line_items, mock_licas, mock_dfp_client):
+    """
+    It associates creatives with each line item batch as it is created.
+    """
+
+    mock_create_line_items.iter_create_line_items = MagicMock(
+      return_value=iter([[1, 2], [3, 4], [5]]))
+
+    line_item_ids = (tasks.add_new_prebid_partner
+      .create_line_items_and_licas_pipelined(
+        [{'name': str(num)} for num in range(5)], [111, 222], sizes,
+        max_workers=2))
+
+    self.assertEqual(line_item_ids, [1, 2, 3, 4, 5])
+    self.assertEqual(mock_licas.make_licas.call_count, 3)
+    mock_licas.make_licas.assert_any_call([3, 4], [111, 222],
+      size_overrides=sizes, max_workers=1)
+
+  @patch('settings.DFP_LINE_ITEM_BATCH_SIZE', 2, create=True)
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_line_items')
+  def test_create_line_items_and_licas_pipelined_resume(self,
+    mock_create_line_items, mock_licas, mock_dfp_client):
+    """
+    It skips line items created by a previous run, finishes their
+    associations, and records new work in the journal.
+    """
+
+    mock_create_line_items.iter_create_line_items = MagicMock(
+      return_value=iter([[3, 4], [5]]))
+    configs = [{'name': name} for name in ['a', 'b', 'c', 'd', 'e']]
+    journal_state = JournalState()
+    journal_state.line_item_ids = {'a': 1, 'b': 2}
+    journal_state.associated_line_item_ids = set([1])
+    journal = MagicMock()
+
+    line_item_ids = (tasks.add_new_prebid_partner
+      .create_line_items_and_licas_pipelined(configs, [111], sizes,
+        max_workers=1, journal=journal, journal_state=journal_state))
+
+    self.assertEqual(line_item_ids, [1, 2, 3, 4, 5])
+    mock_create_line_items.iter_create_line_items.assert_called_once_with(
+      configs[2:], batch_size=2, max_workers=1, return_exceptions=True)
+    self.assertEqual(
+      [call[0][0] for call in mock_licas.make_licas.call_args_list],
+      [[2], [3, 4], [5]])
+    journal.record.assert_any_call('line_items', names=['c', 'd'], ids=[3, 4])
+    journal.record.assert_any_call('line_items', names=['e'], ids=[5])
+    journal.record.assert_any_call('licas', line_item_ids=[3, 4])
+
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_line_items')
+  def test_create_line_items_and_licas_pipelined_partial_failure(self,
+    mock_create_line_items, mock_licas, mock_dfp_client):
+    """
+    It records and associates the line items DFP accepted from a batch with
+    rejected line items, then raises.
+    """
+
+    def iter_create_line_items(configs, batch_size, max_workers,
+      return_exceptions):
+      yield [1, 2]
+      yield BatchItemErrors([3, None], [(1, configs[3], ValueError('bad'))])
+
+    mock_create_line_items.iter_create_line_items = iter_create_line_items
+    configs = [{'name': name} for name in ['a', 'b', 'c', 'd']]
+    journal = MagicMock()
+
+    with self.assertRaises(BatchItemErrors):
+      (tasks.add_new_prebid_partner.create_line_items_and_licas_pipelined(
+        configs, [111], sizes, max_workers=1, journal=journal))
+
+    journal.record.assert_any_call('line_items', names=['c'], ids=[3])
+    self.assertEqual(
+      [call[0][0] for call in mock_licas.make_licas.call_args_list],
+      [[1, 2], [3]])
+
+  @patch('settings.DFP_LINE_ITEM_BATCH_SIZE', 2, create=True)
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_line_items')
+  def test_create_line_items_and_licas_pipelined_later_batches(self,
+    mock_create_line_items, mock_licas, mock_dfp_client):
+    """
+    It records and associates the batches that were created after a failed
+    batch, then raises the failed batch's error.
+    """
+
+    error = ValueError('bad')
+    mock_create_line_items.iter_create_line_items = MagicMock(
+      return_value=iter([[1, 2], error, [5, 6]]))
+    configs = [{'name': name} for name in ['a', 'b', 'c', 'd', 'e', 'f']]
+    journal = MagicMock()
+
+    with self.assertRaises(ValueError) as context:
+      (tasks.add_new_prebid_partner.create_line_items_and_licas_pipelined(
+        configs, [111], sizes, max_workers=2, journal=journal))
+
+    self.assertIs(context.exception, error)
+    journal.record.assert_any_call('line_items', names=['a', 'b'], ids=[1, 2])
+    journal.record.assert_any_call('line_items', names=['e', 'f'], ids=[5, 6])
+    self.assertEqual(
+      sorted(call[0][0] for call in mock_licas.make_licas.call_args_list),
+      [[1, 2], [5, 6]])
+
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_line_items')
+  def test_create_line_items_and_licas_pipelined_lica_failure(self,
+    mock_create_line_items, mock_licas, mock_dfp_client):
+    """
+    It raises association errors as they are, without mistaking them for
+    line item errors.
+    """
+
+    mock_create_line_items.iter_create_line_items = MagicMock(
+      return_value=iter([[10], [11]]))
+    lica_error = BatchItemErrors([None], [(0, {'lineItemId': 10},
+      ValueError('bad'))])
+    mock_licas.make_licas = MagicMock(side_effect=[lica_error, None])
+    configs = [{'name': 'n0'}, {'name': 'n1'}]
+    journal = MagicMock()
+
+    with self.assertRaises(BatchItemErrors) as context:
+      (tasks.add_new_prebid_partner.create_line_items_and_licas_pipelined(
+        configs, [1], sizes, max_workers=1, journal=journal))
+
+    self.assertIs(context.exception, lica_error)
+    line_item_entries = [call for call in journal.record.call_args_list
+      if call[0][0] == 'line_items']
+    self.assertEqual([call[1] for call in line_item_entries],
+      [{'names': ['n0'], 'ids': [10]}])
 
   def test_create_line_item_configs(self, mock_dfp_client):
     """
@@ -291,6 +624,96 @@ class AddNewPrebidPartnerTests(TestCase):
     self.assertEqual(configs[2]['costPerUnit']['microAmount'], 300000)
     self.assertEqual(configs[2]['costPerUnit']['currencyCode'], 'HUF')
 
+  @patch('settings.DFP_LINE_ITEM_PREFIX', None, create=True)
+  def test_create_line_item_configs_grouped(self, mock_dfp_client):
+    """
+    It lets each line item target several prices when given a maximum
+    rounding error, with the CPM of the lowest one.
+    """
+
+    HBPBValueGetter = MagicMock()
+    HBPBValueGetter.get_value_ids = MagicMock(
+      return_value=[11, 12, 13, 14, 15])
+    HBSizeValueGetter = MagicMock()
+    HBSizeValueGetter.get_value_ids = MagicMock(return_value=[77])
+
+    configs = tasks.add_new_prebid_partner.create_line_item_configs(
+      prices=[100000, 150000, 200000, 250000, 300000],
+      order_id=1234567,
+      use_placements=True,
+      placement_ids=[9876543],
+      ad_unit_ids=[],
+      bidder_code='iamabiddr',
+      sizes=[{
+        'width': '728',
+        'height': '90'
+      }],
+      hb_bidder_key_id=999999,
+      hb_pb_key_id=888888,
+      hb_size_key_id=777777,
+      currency_code='USD',
+      HBBidderValueGetter=MagicMock(),
+      HBPBValueGetter=HBPBValueGetter,
+      HBSizeValueGetter=HBSizeValueGetter,
+      max_rounding_error=100000,
+    )
+
+    self.assertEqual([config['name'] for config in configs],
+      ['iamabiddr: HB $0.10 - 0.20', 'iamabiddr: HB $0.25 - 0.30'])
+    self.assertEqual(
+      [config['costPerUnit']['microAmount'] for config in configs],
+      [100000, 250000])
+    self.assertEqual(
+      configs[0]['targeting']['customTargeting']['children'][1]['valueIds'],
+      [11, 12, 13])
+    self.assertEqual(
+      configs[1]['targeting']['customTargeting']['children'][1]['valueIds'],
+      [14, 15])
+
+  @patch('settings.DFP_LINE_ITEM_PREFIX', None, create=True)
+  def test_create_line_item_configs_bucket_precision(self, mock_dfp_client):
+    """
+    It formats each price with its bucket's precision, so prices that only
+    differ in the third decimal get their own `hb_pb` value and name.
+    """
+
+    HBPBValueGetter = MagicMock()
+    HBPBValueGetter.get_value_ids = MagicMock(
+      side_effect=lambda names: list(range(len(names))))
+    HBSizeValueGetter = MagicMock()
+    HBSizeValueGetter.get_value_ids = MagicMock(return_value=[77])
+
+    configs = tasks.add_new_prebid_partner.create_line_item_configs(
+      prices=get_custom_price_table([{'min': .5, 'max': .53,
+        'increment': .005, 'precision': 3}]),
+      order_id=1234567,
+      use_placements=True,
+      placement_ids=[9876543],
+      ad_unit_ids=[],
+      bidder_code='iamabiddr',
+      sizes=[{
+        'width': '728',
+        'height': '90'
+      }],
+      hb_bidder_key_id=999999,
+      hb_pb_key_id=888888,
+      hb_size_key_id=777777,
+      currency_code='USD',
+      HBBidderValueGetter=MagicMock(),
+      HBPBValueGetter=HBPBValueGetter,
+      HBSizeValueGetter=HBSizeValueGetter,
+    )
+
+    HBPBValueGetter.get_value_ids.assert_called_once_with(
+      ('0.500', '0.505', '0.510', '0.515', '0.520', '0.525'))
+    self.assertEqual([config['name'] for config in configs],
+      ['iamabiddr: HB $0.500', 'iamabiddr: HB $0.505', 'iamabiddr: HB $0.510',
+        'iamabiddr: HB $0.515', 'iamabiddr: HB $0.520',
+        'iamabiddr: HB $0.525'])
+    self.assertEqual(
+      [config['costPerUnit']['microAmount'] for config in configs],
+      [500000, 505000, 510000, 515000, 520000, 525000])
+
   @patch('dfp.create_custom_targeting')
   @patch('dfp.get_custom_targeting')
   def test_value_id_getter(self, mock_get_targeting, mock_create_targeting,
@@ -299,21 +722,11 @@ class AddNewPrebidPartnerTests(TestCase):
     It returns the expected values from DFP.
     """
 
-    mock_get_targeting.get_targeting_by_key_name = MagicMock(
-      return_value=[
-        {
-          'customTargetingKeyId': 987654,
-          'displayName': '12.50',
-          'id': 1324354657,
-          'name': '12.50'
-        },
-        {
-          'customTargetingKeyId': 987654,
-          'displayName': '20.00',
-          'id': 3546576879,
-          'name': '20.00'
-        }
-      ]
+    mock_get_targeting.get_value_catalog = MagicMock(
+      return_value=ValueCatalog(987654, [
+        ('12.50', 1324354657),
+        ('20.00', 3546576879),
+      ])
     )
     mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
     mock_create_targeting.create_targeting_value = MagicMock(
@@ -321,7 +734,7 @@ class AddNewPrebidPartnerTests(TestCase):
 
     getter = DFPValueIdGetter('some-key-name')
 
-    mock_get_targeting.get_targeting_by_key_name.assert_called_once_with(
+    mock_get_targeting.get_value_catalog.assert_called_once_with(
       'some-key-name')
     mock_create_targeting.create_targeting_value.assert_not_called()
 
@@ -333,6 +746,34 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_targeting.create_targeting_value.assert_called_once_with(
       '15.00', 987654)
 
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_bulk(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It creates all missing values in one bulk call.
+    """
+
+    mock_get_targeting.get_value_catalog = MagicMock(
+      return_value=ValueCatalog(987654, [('12.50', 1324354657)])
+    )
+    mock_get_targeting.get_key_id_by_name = MagicMock(return_value=987654)
+    mock_create_targeting.create_targeting_values = MagicMock(
+      return_value=[44445555, 66667777])
+
+    getter = DFPValueIdGetter('some-key-name')
+
+    self.assertEqual(
+      getter.get_value_ids(['15.00', '12.50', '17.00', '15.00']),
+      [44445555, 1324354657, 66667777, 44445555]
+    )
+    mock_create_targeting.create_targeting_values.assert_called_once_with(
+      ['15.00', '17.00'], 987654)
+
+    # Created values are indexed, so they are not created again.
+    self.assertEqual(getter.get_value_id('17.00'), 66667777)
+    mock_create_targeting.create_targeting_value.assert_not_called()
+
   @patch('dfp.create_custom_targeting')
   @patch('dfp.get_custom_targeting')
   def test_get_or_create_dfp_targeting_key_does_not_exist(self,
@@ -379,6 +820,29 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_get_targeting.get_key_id_by_name.assert_called_once_with('some-key')
     mock_create_targeting.create_targeting_key.assert_not_called()
 
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_get_or_create_dfp_targeting_keys(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    Make sure get_or_create_dfp_targeting_keys fetches all keys at once and
+    creates only the missing ones.
+    """
+
+    mock_get_targeting.get_key_ids_by_name = MagicMock(
+      return_value={'hb_pb': 222})
+    mock_create_targeting.create_targeting_keys = MagicMock(
+      return_value=[111, 333])
+
+    key_ids = tasks.add_new_prebid_partner.get_or_create_dfp_targeting_keys(
+      ['hb_bidder', 'hb_pb', 'hb_size'])
+
+    mock_get_targeting.get_key_ids_by_name.assert_called_once_with(
+      ['hb_bidder', 'hb_pb', 'hb_size'])
+    mock_create_targeting.create_targeting_keys.assert_called_once_with(
+      ['hb_bidder', 'hb_size'])
+    self.assertEqual(key_ids, {'hb_bidder': 111, 'hb_pb': 222, 'hb_size': 333})
+
   def test_logging_unicode(self, mock_dfp_client):
     """
     We can log unicode.
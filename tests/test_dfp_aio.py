@@ -0,0 +1,103 @@
+import threading
+import time
+from unittest import TestCase, skipIf
+
+from mock import patch
+
+import dfp.client
+
+try:
+  import asyncio
+except ImportError:
+  # dfp.aio needs Python 3.
+  asyncio = None
+else:
+  import dfp.aio
+
+
+@skipIf(asyncio is None, 'asyncio is not available')
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPAsyncTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+    self.loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(self.loop)
+
+  def tearDown(self):
+    asyncio.set_event_loop(None)
+    self.loop.close()
+    dfp.aio.shutdown()
+
+  @patch('settings.DFP_MAX_WORKERS', 4, create=True)
+  @patch('dfp.get_advertisers.get_advertiser_id_by_name')
+  @patch('dfp.get_users.get_user_id_by_email')
+  def test_gather(self, mock_get_user_id, mock_get_advertiser_id,
+    mock_dfp_client):
+    """
+    Ensure blocking calls overlap when gathered, and return their results.
+    """
+    user_started = threading.Event()
+    advertiser_started = threading.Event()
+
+    def get_user_id(email):
+      user_started.set()
+      advertiser_started.wait(5)
+      return 123
+
+    def get_advertiser_id(name):
+      advertiser_started.set()
+      user_started.wait(5)
+      return 456
+
+    mock_get_user_id.side_effect = get_user_id
+    mock_get_advertiser_id.side_effect = get_advertiser_id
+
+    start = time.time()
+    results = self.loop.run_until_complete(asyncio.gather(
+      dfp.aio.get_user_id_by_email('a@example.com'),
+      dfp.aio.get_advertiser_id_by_name('Prebid', timeout=5)))
+
+    self.assertEqual(results, [123, 456])
+    self.assertLess(time.time() - start, 5)
+    mock_get_user_id.assert_called_once_with('a@example.com')
+    mock_get_advertiser_id.assert_called_once_with('Prebid')
+
+  @patch('dfp.create_orders.create_order')
+  def test_timeout(self, mock_create_order, mock_dfp_client):
+    """
+    Ensure a call that takes longer than its timeout raises TimeoutError.
+    """
+    mock_create_order.side_effect = lambda *args: time.sleep(0.5)
+
+    with self.assertRaises(asyncio.TimeoutError):
+      self.loop.run_until_complete(
+        dfp.aio.create_order('Order', 1, 2, timeout=0.01))
+
+  @patch('settings.DFP_MAX_WORKERS', 1, create=True)
+  @patch('dfp.create_line_items.create_line_items')
+  def test_cancel_queued_call(self, mock_create_line_items, mock_dfp_client):
+    """
+    Ensure cancelling a call that hasn't started yet keeps it from running.
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def create_line_items(line_items):
+      started.set()
+      release.wait(5)
+      return [1]
+
+    mock_create_line_items.side_effect = create_line_items
+
+    first = dfp.aio.create_line_items(['a'])
+    second = dfp.aio.create_line_items(['b'])
+    started.wait(5)
+    second.cancel()
+    # Let the cancellation reach the thread pool.
+    self.loop.run_until_complete(asyncio.sleep(0))
+    release.set()
+
+    self.assertEqual(self.loop.run_until_complete(first), [1])
+    self.assertTrue(second.cancelled())
+    mock_create_line_items.assert_called_once_with(['a'])
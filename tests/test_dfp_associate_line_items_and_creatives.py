@@ -4,12 +4,16 @@ from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.associate_line_items_and_creatives
 
 
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPCreateLICAsTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_association(self, mock_dfp_client):
     """
     Ensure it calls DFP with expected associations.
@@ -127,3 +131,37 @@ class DFPCreateLICAsTests(TestCase):
       .GetService.return_value
       .createLineItemCreativeAssociations.assert_called_once_with(expected_arg)
       )
+
+  def test_association_batches(self, mock_dfp_client):
+    """
+    Ensure it creates associations in batches that share one sizes array.
+    """
+
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItemCreativeAssociations) = MagicMock(
+        side_effect=lambda licas: licas)
+
+    with patch('dfp.associate_line_items_and_creatives.logger') as logger:
+      dfp.associate_line_items_and_creatives.make_licas(
+        [987654, 7654321, 5432109], [111222, 223344],
+        size_overrides=[{'width': '300', 'height': '250'}],
+        batch_size=4, max_workers=2)
+    logger.info.assert_called_once_with(
+      u'Created 6 line item <> creative associations.')
+
+    create_licas_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItemCreativeAssociations)
+    self.assertEqual(create_licas_mock.call_count, 2)
+
+    licas = [lica for call in create_licas_mock.call_args_list
+      for lica in call[0][0]]
+    self.assertEqual(
+      [(lica['lineItemId'], lica['creativeId']) for lica in licas],
+      [(987654, 111222), (987654, 223344), (7654321, 111222),
+        (7654321, 223344), (5432109, 111222), (5432109, 223344)]
+    )
+    self.assertTrue(all(lica['sizes'] is licas[0]['sizes'] for lica in licas))
+    self.assertEqual(licas[0]['sizes'], [{'width': '300', 'height': '250'}])
@@ -0,0 +1,150 @@
+import threading
+import time
+from unittest import TestCase
+
+import dfp.batch
+from dfp.exceptions import MultipleErrors
+
+
+class DFPBatchTests(TestCase):
+
+  def test_chunk(self):
+    """
+    Ensure items are split into batches of at most the batch size.
+    """
+    self.assertEqual(list(dfp.batch.chunk(range(5), 2)), [[0, 1], [2, 3], [4]])
+    self.assertEqual(list(dfp.batch.chunk([], 2)), [])
+    with self.assertRaises(ValueError):
+      list(dfp.batch.chunk(range(5), 0))
+
+  def test_run_in_batches_preserves_order(self):
+    """
+    Ensure results are in input order even when batches finish out of order.
+    """
+    def slow_first_batch(batch):
+      if batch[0] == 0:
+        time.sleep(0.05)
+      return [item * 10 for item in batch]
+
+    self.assertEqual(
+      dfp.batch.run_in_batches(slow_first_batch, range(7), batch_size=2,
+        max_workers=3),
+      [0, 10, 20, 30, 40, 50, 60]
+    )
+
+  def test_run_in_batches_concurrency(self):
+    """
+    Ensure no more than max_workers batches run at the same time.
+    """
+    lock = threading.Lock()
+    running = [0]
+    max_running = [0]
+
+    def track_concurrency(batch):
+      with lock:
+        running[0] += 1
+        max_running[0] = max(max_running[0], running[0])
+      time.sleep(0.01)
+      with lock:
+        running[0] -= 1
+      return batch
+
+    dfp.batch.run_in_batches(track_concurrency, range(20), batch_size=1,
+      max_workers=3)
+
+    self.assertLessEqual(max_running[0], 3)
+    self.assertGreater(max_running[0], 1)
+
+  def test_map_batches_consumes_lazily(self):
+    """
+    Ensure a generator of items is not consumed far ahead of the results.
+    """
+    consumed = []
+
+    def items():
+      for item in range(100):
+        consumed.append(item)
+        yield item
+
+    results = dfp.batch.map_batches(lambda batch: batch, items(),
+      batch_size=1, max_workers=2)
+    self.assertEqual(next(results), [0])
+    self.assertLessEqual(len(consumed), 5)
+    results.close()
+
+  def test_run_in_batches_raises(self):
+    """
+    Ensure a failing batch raises its error.
+    """
+    def fail_on_three(batch):
+      if 3 in batch:
+        raise ValueError('bad batch')
+      return batch
+
+    with self.assertRaises(ValueError):
+      dfp.batch.run_in_batches(fail_on_three, range(10), batch_size=2,
+        max_workers=2)
+
+  def test_map_batches_return_exceptions(self):
+    """
+    Ensure a failing batch yields its error, no more batches start, and the
+    batches already started still yield their results.
+    """
+    called = []
+
+    def fail_on_zero(batch):
+      called.extend(batch)
+      if 0 in batch:
+        raise ValueError('bad batch')
+      return batch
+
+    results = list(dfp.batch.map_batches(fail_on_zero, range(10),
+      batch_size=1, max_workers=2, return_exceptions=True))
+
+    self.assertIsInstance(results[0], ValueError)
+    self.assertEqual(results[1:], [[1], [2], [3]])
+    self.assertEqual(sorted(called), [0, 1, 2, 3])
+
+  def test_run_concurrently(self):
+    """
+    Ensure independent calls run at the same time and return by name.
+    """
+    barrier = threading.Barrier(3) if hasattr(threading, 'Barrier') else None
+
+    def wait_for_others(value):
+      def call():
+        if barrier is not None:
+          barrier.wait(timeout=5)
+        return value
+      return call
+
+    results = dfp.batch.run_concurrently(
+      {'a': wait_for_others(1), 'b': wait_for_others(2),
+        'c': wait_for_others(3)}, max_workers=3)
+
+    self.assertEqual(results, {'a': 1, 'b': 2, 'c': 3})
+
+  def test_run_concurrently_reports_all_errors(self):
+    """
+    Ensure every call runs, and all errors are raised together.
+    """
+    calls = []
+
+    def fail(message):
+      def call():
+        calls.append(message)
+        raise ValueError(message)
+      return call
+
+    with self.assertRaises(MultipleErrors) as context:
+      dfp.batch.run_concurrently({'user': fail('no user'),
+        'advertiser': fail('no advertiser'), 'keys': lambda: 1},
+        max_workers=2)
+
+    self.assertEqual(sorted(calls), ['no advertiser', 'no user'])
+    self.assertEqual(sorted(context.exception.errors), ['advertiser', 'user'])
+    self.assertIn('no advertiser', str(context.exception))
+
+    # A single error is raised as is.
+    with self.assertRaises(ValueError):
+      dfp.batch.run_concurrently({'user': fail('no user'), 'keys': lambda: 1})
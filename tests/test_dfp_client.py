@@ -0,0 +1,136 @@
+import threading
+import time
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.create_line_items
+
+
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPClientTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def test_get_client_loads_once(self, mock_dfp_client):
+    """
+    Ensure the client is only loaded from storage once per process.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    first_client = dfp.client.get_client()
+    second_client = dfp.client.get_client()
+
+    self.assertIs(first_client, second_client)
+    mock_dfp_client.assert_called_once()
+
+  def test_get_client_per_network(self, mock_dfp_client):
+    """
+    Ensure each network code gets its own client.
+    """
+    mock_dfp_client.side_effect = [MagicMock(), MagicMock()]
+
+    default_client = dfp.client.get_client()
+    other_client = dfp.client.get_client('12345678')
+
+    self.assertIsNot(default_client, other_client)
+    self.assertEqual(other_client.network_code, '12345678')
+    self.assertIs(dfp.client.get_client('12345678'), other_client)
+    self.assertEqual(mock_dfp_client.call_count, 2)
+
+  def test_get_service_cached(self, mock_dfp_client):
+    """
+    Ensure services are created once per service name and API version.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    dfp.client.get_service('LineItemService')
+    dfp.client.get_service('LineItemService')
+    dfp.client.get_service('LineItemService', version='v201805')
+
+    get_service_mock = mock_dfp_client.return_value.GetService
+    self.assertEqual(get_service_mock.call_count, 2)
+    get_service_mock.assert_any_call('LineItemService', version='v201802')
+    get_service_mock.assert_any_call('LineItemService', version='v201805')
+
+  def test_get_service_shared_by_threads(self, mock_dfp_client):
+    """
+    Ensure threads share a service, and a SOAP proxy is only built again
+    when every proxy is busy.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    started = threading.Event()
+    release = threading.Event()
+
+    def get_orders(statement):
+      started.set()
+      release.wait(5)
+      return statement
+
+    proxy = MagicMock()
+    proxy.getOrder.side_effect = get_orders
+    mock_dfp_client.return_value.GetService.return_value = proxy
+
+    service = dfp.client.get_service('OrderService')
+    thread = threading.Thread(target=service.getOrder, args=('order',))
+    thread.start()
+    started.wait(5)
+    self.assertIs(dfp.client.get_service('OrderService'), service)
+    self.assertEqual(
+      mock_dfp_client.return_value.GetService.call_count, 1)
+
+    # The only proxy is busy, so another one is built.
+    service.getOrders()
+    release.set()
+    thread.join()
+    self.assertEqual(
+      mock_dfp_client.return_value.GetService.call_count, 2)
+
+    # Both proxies are idle now.
+    service.getOrders()
+    mock_dfp_client.assert_called_once()
+    self.assertEqual(
+      mock_dfp_client.return_value.GetService.call_count, 2)
+
+  def test_get_service_flat_across_batches(self, mock_dfp_client):
+    """
+    Ensure repeated concurrent batch calls reuse the SOAP proxies, instead of
+    building new ones for each new worker thread.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    def create_line_items(line_items):
+      time.sleep(0.02)
+      return [{'id': line_item['name']} for line_item in line_items]
+
+    def build_service(service_name, version):
+      proxy = MagicMock()
+      proxy.createLineItems.side_effect = create_line_items
+      return proxy
+
+    get_service_mock = mock_dfp_client.return_value.GetService
+    get_service_mock.side_effect = build_service
+    line_items = [{'name': num} for num in range(8)]
+
+    call_counts = []
+    for _ in range(3):
+      self.assertEqual(dfp.create_line_items.create_line_items(line_items,
+        batch_size=1, max_workers=4), list(range(8)))
+      call_counts.append(get_service_mock.call_count)
+
+    self.assertLessEqual(call_counts[0], 4)
+    self.assertEqual(call_counts[1:], [call_counts[0]] * 2)
+
+  def test_reset_client(self, mock_dfp_client):
+    """
+    Ensure resetting reloads the client and its services.
+    """
+    mock_dfp_client.side_effect = [MagicMock(), MagicMock()]
+
+    first_service = dfp.client.get_service('UserService')
+    dfp.client.reset_client()
+    second_service = dfp.client.get_service('UserService')
+
+    self.assertIsNot(first_service, second_service)
+    self.assertEqual(mock_dfp_client.call_count, 2)
@@ -4,12 +4,16 @@ from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.create_creatives
 
 
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPCreateCreativesTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_create_creatives_items_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with creative info.
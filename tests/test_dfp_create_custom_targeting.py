@@ -2,12 +2,16 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.create_custom_targeting
 
 
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPCreateCustomTargetingTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_create_targeting_key(self, mock_dfp_client):
     """
     Ensure it calls DFP to create a key and returns the key ID.
@@ -111,3 +115,57 @@ class DFPCreateCustomTargetingTests(TestCase):
       )
     
     self.assertEqual(response, 555666777)
+
+  def test_create_targeting_values_batches(self, mock_dfp_client):
+    """
+    Ensure it creates values in batches and returns IDs in order.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    # Mock response from DFP: each created value's ID is its name times 10.
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingValues) = MagicMock(
+        side_effect=lambda values: [
+          {'id': int(value['name']) * 10, 'name': value['name']}
+          for value in values
+        ]
+      )
+
+    response = dfp.create_custom_targeting.create_targeting_values(
+      ['1', '2', '3', '4', '5'], 2468, batch_size=2)
+
+    create_values_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingValues)
+    self.assertEqual(create_values_mock.call_count, 3)
+    self.assertEqual(
+      [value['name'] for value in create_values_mock.call_args_list[2][0][0]],
+      ['5']
+    )
+    self.assertEqual(response, [10, 20, 30, 40, 50])
+
+  def test_create_targeting_keys(self, mock_dfp_client):
+    """
+    Ensure it creates all keys with one call and returns their IDs.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingKeys) = MagicMock(return_value=[
+        {'id': 111, 'name': 'hb_bidder', 'displayName': 'hb_bidder'},
+        {'id': 333, 'name': 'hb_size', 'displayName': 'hb_size'},
+      ])
+
+    response = dfp.create_custom_targeting.create_targeting_keys(
+      ['hb_bidder', 'hb_size'])
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingKeys.assert_called_once_with([
+        {'displayName': 'hb_bidder', 'name': 'hb_bidder', 'type': 'FREEFORM'},
+        {'displayName': 'hb_size', 'name': 'hb_size', 'type': 'FREEFORM'},
+      ])
+      )
+    self.assertEqual(response, [111, 333])
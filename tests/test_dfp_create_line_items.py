@@ -3,13 +3,21 @@ from unittest import TestCase
 from mock import MagicMock, patch
 
 import settings
+import dfp.client
 import dfp.create_line_items
-from dfp.exceptions import BadSettingException, MissingSettingException
+from dfp.exceptions import (
+  BadSettingException,
+  BatchItemErrors,
+  MissingSettingException,
+)
 
 
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPCreateLineItemsTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_create_line_items_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with line item info.
@@ -267,3 +275,71 @@ class DFPCreateLineItemsTests(TestCase):
       [16273849, 444555666, 999888777]
     )
 
+
+  def test_create_line_items_batches(self, mock_dfp_client):
+    """
+    Ensure it splits line items into batches and returns IDs in input order.
+    """
+
+    # Mock DFP response: each line item's ID is its name.
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItems) = MagicMock(
+        side_effect=lambda line_items: [
+          {'id': line_item['name']} for line_item in line_items
+        ]
+      )
+
+    line_items_config = [{'name': num} for num in range(5)]
+    self.assertEqual(
+      dfp.create_line_items.create_line_items(line_items_config,
+        batch_size=2, max_workers=2),
+      [0, 1, 2, 3, 4]
+    )
+    self.assertEqual(
+      mock_dfp_client.return_value.GetService.return_value
+        .createLineItems.call_count,
+      3
+    )
+
+  def test_create_line_items_failed_batch(self, mock_dfp_client):
+    """
+    Ensure the line items of batches sent before or after a failed batch are
+    reported with the error.
+    """
+
+    def create_line_items(line_items):
+      if line_items[0]['name'] == 1:
+        raise ValueError('bad batch')
+      return [{'id': line_item['name']} for line_item in line_items]
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItems) = MagicMock(side_effect=create_line_items)
+    line_items_config = [{'name': num} for num in range(10)]
+
+    with self.assertRaises(BatchItemErrors) as context:
+      dfp.create_line_items.create_line_items(line_items_config,
+        batch_size=1, max_workers=2)
+
+    results = context.exception.results
+    self.assertEqual(results[:3], [0, None, 2])
+    self.assertEqual(results[3:], list(range(3, len(results))))
+    self.assertLess(len(results), 10)
+    failures = context.exception.failures
+    self.assertEqual([(position, item) for position, item, _ in failures],
+      [(1, {'name': 1})])
+    self.assertIsInstance(failures[0][2], ValueError)
+
+  def test_create_line_items_nothing_created(self, mock_dfp_client):
+    """
+    Ensure the error is raised as it is when no line item was created.
+    """
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createLineItems) = MagicMock(side_effect=ValueError('bad batch'))
+
+    with self.assertRaises(ValueError):
+      dfp.create_line_items.create_line_items([{'name': 0}, {'name': 1}],
+        batch_size=1, max_workers=2)
@@ -3,6 +3,7 @@ from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.create_orders
 from dfp.exceptions import BadSettingException, MissingSettingException
 
@@ -10,6 +11,9 @@ from dfp.exceptions import BadSettingException, MissingSettingException
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPCreateOrderTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   @patch('dfp.get_orders.get_order_by_name')
   def test_create_orders_call(self, mock_get_order_by_name, mock_dfp_client):
     """
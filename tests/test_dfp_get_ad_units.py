@@ -2,6 +2,7 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_ad_units
 from dfp.exceptions import (
   BadSettingException,
@@ -10,9 +11,39 @@ from dfp.exceptions import (
 )
 
 
+def make_ad_unit(ad_unit_id, name, parent_id, status='ACTIVE', day=1):
+  return {
+    'id': ad_unit_id,
+    'name': name,
+    'parentId': parent_id,
+    'status': status,
+    'lastModifiedDateTime': {
+      'date': {'year': 2018, 'month': 5, 'day': day},
+      'hour': 12,
+      'minute': 0,
+      'second': 0,
+      'timeZoneID': 'America/New_York',
+    },
+  }
+
+# The network's root ad unit, with two sections that each have a
+# leaderboard, and an archived ad unit.
+ad_units = [
+  make_ad_unit('1', 'ca-pub-1234', None),
+  make_ad_unit('2', 'News', '1'),
+  make_ad_unit('3', 'Leaderboard', '2'),
+  make_ad_unit('4', 'Sports', '1'),
+  make_ad_unit('6', 'Old', '1', status='ARCHIVED'),
+  make_ad_unit('5', 'Leaderboard', '4', day=2),
+]
+
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPGetAdUnitTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+    dfp.get_ad_units.reset_ad_unit_index()
+
   def test_get_ad_unit_by_name_call(self, mock_dfp_client):
     """
     Ensure we make the correct call to DFP when getting an ad unit
@@ -118,48 +149,86 @@ class DFPGetAdUnitTests(TestCase):
       ad_unit = dfp.get_ad_units.get_ad_unit_by_name(
         'Not an Existing Placement')
 
-  @patch('dfp.get_ad_units.get_ad_unit_by_name')
-  def test_get_ad_unit_ids_by_name(self, mock_get_ad_unit_by_name, 
-    mock_dfp_client):
+  def test_get_ad_unit_ids_by_name(self, mock_dfp_client):
     """
-    Ensures we return ad unit IDs.
-    """
-
-    # Fake returned ad unit. Return a different one each time
-    # it is called.
-    mock_get_ad_unit_by_name.side_effect = [
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 9988776655,
-        'name': 'Placement One.',
-        'description': None,
-        'adUnitCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      },
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 13571357,
-        'name': 'Placement Two.',
-        'description': None,
-        'adUnitCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      }
+    Ensures we return ad unit IDs by name or path, downloading the ad units
+    only once.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    get_ad_units_by_statement = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement)
+    get_ad_units_by_statement.side_effect = [
+      {'results': ad_units[:3]},
+      {'results': ad_units[3:]},
+      {'totalResultSetSize': 6, 'startIndex': 1000},
     ]
+
     ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(
-      ['Placement One.', 'Placement Two.'])
-    self.assertEqual(ad_unit_ids, [9988776655, 13571357])
+      ['Sports', 'News/Leaderboard'])
+    self.assertEqual(ad_unit_ids, ['4', '3'])
+    ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(
+      ['Sports/Leaderboard'])
+    self.assertEqual(ad_unit_ids, ['5'])
+
+    self.assertEqual(get_ad_units_by_statement.call_count, 3)
+    self.assertEqual(get_ad_units_by_statement.call_args_list[0][0][0],
+      {'query': ' LIMIT 500 OFFSET 0', 'values': None})
+
+  def test_get_ad_unit_ids_by_name_errors(self, mock_dfp_client):
+    """
+    Ensures ambiguous names are rejected and every missing ad unit is
+    reported at once.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement).side_effect = [
+        {'results': ad_units},
+        {'totalResultSetSize': 6, 'startIndex': 500},
+      ]
+
+    with self.assertRaises(BadSettingException) as context:
+      dfp.get_ad_units.get_ad_unit_ids_by_name(['Leaderboard'])
+    self.assertIn('News/Leaderboard, Sports/Leaderboard',
+      str(context.exception))
+
+    with self.assertRaises(DFPObjectNotFound) as context:
+      dfp.get_ad_units.get_ad_unit_ids_by_name(['Old', 'Nope', 'News'])
+    self.assertIn('Old, Nope', str(context.exception))
+
+  def test_ad_unit_index_refresh(self, mock_dfp_client):
+    """
+    Ensures a refresh fetches only modified ad units and updates the paths
+    of moved subtrees.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    get_ad_units_by_statement = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getAdUnitsByStatement)
+    moved_section = make_ad_unit('4', 'Sports', '2', day=3)
+    get_ad_units_by_statement.side_effect = [
+      {'results': ad_units},
+      {},
+      {'results': [moved_section]},
+      {},
+    ]
+
+    index = dfp.get_ad_units.get_ad_unit_index()
+    self.assertEqual(index.get_path('5'), 'Sports/Leaderboard')
+    self.assertEqual(
+      sorted(child['id'] for child in index.get_children('1')), ['2', '4', '6'])
+
+    index = dfp.get_ad_units.get_ad_unit_index(refresh=True)
+    self.assertEqual(index.get_path('5'), 'News/Sports/Leaderboard')
+    self.assertEqual(index.get_ad_unit_id('News/Sports/Leaderboard'), '5')
+    self.assertIsNone(index.get_ad_unit_id('Sports/Leaderboard'))
+
+    refresh_statement = get_ad_units_by_statement.call_args_list[2][0][0]
+    self.assertEqual(refresh_statement['query'],
+      'WHERE lastModifiedDateTime > :lastModifiedDateTime LIMIT 500 OFFSET 0')
+    self.assertEqual(refresh_statement['values'][0]['value']['value'],
+      ad_units[-1]['lastModifiedDateTime'])
 
   @patch.multiple('settings',
     DFP_TARGETED_AD_UNIT_NAMES=['My Placement!', 'Another placment'])
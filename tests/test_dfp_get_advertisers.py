@@ -5,6 +5,7 @@ from googleads import dfp
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.get_advertisers
 from dfp.exceptions import (
   BadSettingException,
@@ -16,6 +17,9 @@ from dfp.exceptions import (
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPGetAdvertisersTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_get_advertiser_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with correct filter info.
@@ -2,12 +2,16 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_custom_targeting
 
 
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPGetCustomTargetingTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_get_targeting_by_key_name_call_no_key(self, mock_dfp_client):
     """
     Ensure it makes one call to DFP to get the key info.
@@ -98,12 +102,12 @@ class DFPGetCustomTargetingTests(TestCase):
       .getCustomTargetingKeysByStatement.assert_called_once()
       )
 
-    # It should not fetch values because the key does not exist.
+    # The first page holds every value, so no more pages are fetched.
     self.assertEqual(
       mock_dfp_client.return_value
         .GetService.return_value
         .getCustomTargetingValuesByStatement.call_count,
-      2
+      1
     )
 
     self.assertEqual(response,
@@ -167,3 +171,128 @@ class DFPGetCustomTargetingTests(TestCase):
     response = dfp.get_custom_targeting.get_key_id_by_name('hb_pb')
 
     self.assertEqual(response, None)
+
+  def test_get_key_ids_by_name(self, mock_dfp_client):
+    """
+    Ensure it fetches all keys with one statement.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    # Mock response from DFP for key fetching.
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingKeysByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': [
+            {'id': 123456, 'name': 'hb_bidder'},
+            {'id': 987654, 'name': 'hb_pb'},
+          ]
+      })
+
+    response = dfp.get_custom_targeting.get_key_ids_by_name(
+      ['hb_bidder', 'hb_pb', 'hb_size'])
+
+    get_keys_mock = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingKeysByStatement)
+    get_keys_mock.assert_called_once()
+    statement = get_keys_mock.call_args[0][0]
+    self.assertTrue(statement['query'].startswith(
+      'WHERE name IN (:name0, :name1, :name2)'))
+    self.assertEqual(
+      [value['value']['value'] for value in statement['values']],
+      ['hb_bidder', 'hb_pb', 'hb_size'])
+
+    self.assertEqual(response, {'hb_bidder': 123456, 'hb_pb': 987654})
+
+  def test_get_targeting_by_key_name_with_key_id(self, mock_dfp_client):
+    """
+    Ensure it does not look up the key when given its ID.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingValuesByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 0,
+          'startIndex': 0
+      })
+
+    response = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      key_id=987654)
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingKeysByStatement.assert_not_called()
+      )
+    self.assertEqual(response, [])
+
+  def test_get_targeting_by_key_name_pages(self, mock_dfp_client):
+    """
+    Ensure every page of values is fetched and the values keep their order.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    def get_values(statement):
+      offset = int(statement['query'].split('OFFSET ')[1])
+      return {
+        'totalResultSetSize': 1200,
+        'startIndex': offset,
+        'results': [{
+          'customTargetingKeyId': 987654,
+          'id': value_id,
+          'name': str(value_id),
+          'displayName': str(value_id),
+          'matchType': 'EXACT',
+          'status': 'ACTIVE',
+        } for value_id in range(offset, min(offset + 500, 1200))]
+      }
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingValuesByStatement).side_effect = get_values
+
+    response = dfp.get_custom_targeting.get_targeting_by_key_name('hb_pb',
+      key_id=987654, max_workers=2)
+
+    self.assertEqual([value['id'] for value in response], list(range(1200)))
+    self.assertEqual(response[0], {
+      'customTargetingKeyId': 987654,
+      'displayName': '0',
+      'id': 0,
+      'name': '0'
+    })
+    self.assertEqual(
+      mock_dfp_client.return_value
+        .GetService.return_value
+        .getCustomTargetingValuesByStatement.call_count,
+      3
+    )
+
+  def test_get_value_catalog(self, mock_dfp_client):
+    """
+    Ensure values are collected into a catalog of IDs by name.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getCustomTargetingValuesByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': [
+            {'customTargetingKeyId': 987654, 'id': 11, 'name': '12.50',
+              'displayName': '12.50'},
+            {'customTargetingKeyId': 987654, 'id': 12, 'name': '20.00',
+              'displayName': '20.00'},
+          ]
+      })
+
+    catalog = dfp.get_custom_targeting.get_value_catalog('hb_pb',
+      key_id=987654)
+
+    self.assertEqual(catalog.key_id, 987654)
+    self.assertEqual(list(catalog.items()), [('12.50', 11), ('20.00', 12)])
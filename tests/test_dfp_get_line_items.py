@@ -0,0 +1,46 @@
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.get_line_items
+
+
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPGetLineItemsTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def test_get_line_items_by_order_id(self, mock_dfp_client):
+    """
+    Ensure we page through all unarchived line items in the order.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    get_line_items_by_statement = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemsByStatement)
+    get_line_items_by_statement.side_effect = [
+      {'results': [{'id': 1}, {'id': 2}]},
+      {'results': [{'id': 3}]},
+      {'totalResultSetSize': 3},
+    ]
+
+    line_items = dfp.get_line_items.get_line_items_by_order_id(1234)
+
+    self.assertEqual(line_items, [{'id': 1}, {'id': 2}, {'id': 3}])
+    self.assertEqual(get_line_items_by_statement.call_count, 3)
+    first_statement = get_line_items_by_statement.call_args_list[0][0][0]
+    self.assertEqual(first_statement, {
+      'query': ('WHERE orderId = :orderId AND isArchived = false '
+        'LIMIT 500 OFFSET 0'),
+      'values': [{
+        'key': 'orderId',
+        'value': {
+          'xsi_type': 'NumberValue',
+          'value': 1234
+        }
+      }]
+    })
+    self.assertEqual(
+      get_line_items_by_statement.call_args_list[1][0][0]['query'],
+      'WHERE orderId = :orderId AND isArchived = false LIMIT 500 OFFSET 500')
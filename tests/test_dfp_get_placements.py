@@ -2,6 +2,7 @@
 from unittest import TestCase
 from mock import MagicMock, Mock, patch
 
+import dfp.client
 import dfp.get_placements
 from dfp.exceptions import (
   BadSettingException,
@@ -13,6 +14,9 @@ from dfp.exceptions import (
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPGetPlacementsTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_get_placement_by_name_call(self, mock_dfp_client):
     """
     Ensure we make the correct call to DFP when getting a a placement
@@ -118,48 +122,62 @@ class DFPGetPlacementsTests(TestCase):
       placement = dfp.get_placements.get_placement_by_name(
         'Not an Existing Placement')
 
-  @patch('dfp.get_placements.get_placement_by_name')
-  def test_get_placement_ids_by_name(self, mock_get_placement_by_name, 
-    mock_dfp_client):
+  def test_get_placement_ids_by_name(self, mock_dfp_client):
     """
-    Ensures we return placement IDs.
-    """
-
-    # Fake returned placement. Return a different one each time
-    # it is called.
-    mock_get_placement_by_name.side_effect = [
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 9988776655,
-        'name': 'Placement One.',
-        'description': None,
-        'placementCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      },
-      {
-        'targetingDescription': None,
-        'targetingSiteName': None,
-        'targetingAdLocation': None,
-        'id': 13571357,
-        'name': 'Placement Two.',
-        'description': None,
-        'placementCode': "111222333444555666",
-        'status': "ACTIVE",
-        'isAdSenseTargetingEnabled': False,
-        'adSenseTargetingLocale': "und",
-        'targetedAdUnitIds': ['123456789'],
-        'lastModifiedDateTime': {},
-      }
-    ]
+    Ensures we return placement IDs in input order, looking up every name
+    with one request.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    get_placements_by_statement = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement)
+    get_placements_by_statement.return_value = {
+      'totalResultSetSize': 2,
+      'startIndex': 0,
+      'results': [
+        {'id': 13571357, 'name': 'Placement Two.'},
+        {'id': 9988776655, 'name': 'Placement One.'},
+      ]
+    }
+
     placement_ids = dfp.get_placements.get_placement_ids_by_name(
-      ['Placement One.', 'Placement Two.'])
-    self.assertEqual(placement_ids, [9988776655, 13571357])
+      ['Placement One.', 'Placement Two.', 'Placement One.'])
+    self.assertEqual(placement_ids, [9988776655, 13571357, 9988776655])
+
+    get_placements_by_statement.assert_called_once_with({
+      'query': 'WHERE name IN (:name0, :name1) LIMIT 500 OFFSET 0',
+      'values': [
+        {
+          'key': 'name0',
+          'value': {'xsi_type': 'TextValue', 'value': 'Placement One.'}
+        },
+        {
+          'key': 'name1',
+          'value': {'xsi_type': 'TextValue', 'value': 'Placement Two.'}
+        },
+      ]
+    })
+
+  def test_get_placement_ids_by_name_batches(self, mock_dfp_client):
+    """
+    Ensures names are looked up in batches and every missing name is
+    reported at once.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    get_placements_by_statement = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getPlacementsByStatement)
+    get_placements_by_statement.side_effect = [
+      {'results': [{'id': 1, 'name': 'One'}]},
+      {'totalResultSetSize': 0, 'startIndex': 0},
+    ]
+
+    with self.assertRaises(DFPObjectNotFound) as context:
+      dfp.get_placements.get_placement_ids_by_name(
+        ['One', 'Two', 'Three'], batch_size=2)
+
+    self.assertEqual(get_placements_by_statement.call_count, 2)
+    self.assertIn('Two, Three', str(context.exception))
 
   @patch.multiple('settings',
     DFP_TARGETED_PLACEMENT_NAMES=['My Placement!', 'Another placment'])
@@ -5,6 +5,7 @@ from googleads import dfp
 from mock import MagicMock, Mock, patch
 
 import settings
+import dfp.client
 import dfp.get_users
 from dfp.exceptions import DFPObjectNotFound, MissingSettingException
 
@@ -12,6 +13,9 @@ from dfp.exceptions import DFPObjectNotFound, MissingSettingException
 @patch('googleads.dfp.DfpClient.LoadFromStorage')
 class DFPGetUsersTests(TestCase):
 
+  def setUp(self):
+    dfp.client.reset_client()
+
   def test_get_user_call(self, mock_dfp_client):
     """
     Ensure it calls DFP once with correct user filter info.
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.get_placements
+import dfp.get_users
+import dfp.metadata_cache
+from dfp.metadata_cache import MetadataCache
+
+
+class DFPMetadataCacheTests(TestCase):
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp()
+    self.cache_path = os.path.join(self.cache_dir, 'metadata.db')
+    dfp.client.reset_client()
+    dfp.metadata_cache.reset_metadata_cache()
+
+  def tearDown(self):
+    dfp.metadata_cache.reset_metadata_cache()
+    shutil.rmtree(self.cache_dir)
+
+  def test_expiry(self):
+    """
+    Ensure entries expire after their entity's TTL.
+    """
+    cache = MetadataCache(self.cache_path, ttls={'users': 100})
+    cache.set_many('users', {'a@example.com': 1}, now=1000)
+    cache.set_many('placements', {'Leaderboard': 2}, now=1000)
+
+    self.assertEqual(cache.get_many('users', ['a@example.com'], now=1100),
+      {'a@example.com': 1})
+    self.assertEqual(cache.get_many('users', ['a@example.com'], now=1101), {})
+    self.assertEqual(
+      cache.get_many('placements', ['Leaderboard'], now=50000),
+      {'Leaderboard': 2})
+
+  def test_invalidate(self):
+    """
+    Ensure entries can be deleted by entity and key, and namespaces are kept
+    separate.
+    """
+    cache = MetadataCache(self.cache_path, namespace='123')
+    other_cache = MetadataCache(self.cache_path, namespace='456')
+    cache.set_many('placements', {'One': 1, 'Two': 2})
+    cache.set_many('users', {'a@example.com': 3})
+    other_cache.set_many('placements', {'One': 4})
+
+    cache.invalidate('placements', ['One'])
+    self.assertEqual(cache.get_many('placements', ['One', 'Two']), {'Two': 2})
+    cache.invalidate()
+    self.assertEqual(cache.get_many('users', ['a@example.com']), {})
+    self.assertEqual(other_cache.get_many('placements', ['One']), {'One': 4})
+
+  @patch('googleads.dfp.DfpClient.LoadFromStorage')
+  def test_read_through(self, mock_dfp_client):
+    """
+    Ensure repeated lookups only fetch from DFP once, and only the missing
+    names are fetched.
+    """
+    mock_dfp_client.return_value = MagicMock(network_code='123')
+    service = mock_dfp_client.return_value.GetService.return_value
+    service.getUsersByStatement.return_value = {'results': [{'id': 55}]}
+    service.getPlacementsByStatement.side_effect = [
+      {'results': [{'id': 1, 'name': 'One'}]},
+      {'results': [{'id': 2, 'name': 'Two'}]},
+    ]
+
+    with patch('settings.DFP_METADATA_CACHE_FILE', self.cache_path,
+      create=True):
+      for _ in range(2):
+        self.assertEqual(
+          dfp.get_users.get_user_id_by_email('a@example.com'), 55)
+      self.assertEqual(dfp.get_placements.get_placement_ids_by_name(['One']),
+        [1])
+      self.assertEqual(
+        dfp.get_placements.get_placement_ids_by_name(['Two', 'One']), [2, 1])
+
+    service.getUsersByStatement.assert_called_once()
+    self.assertEqual(service.getPlacementsByStatement.call_count, 2)
+    self.assertEqual(
+      service.getPlacementsByStatement.call_args[0][0]['values'][0]['value'],
+      {'xsi_type': 'TextValue', 'value': 'Two'})
@@ -0,0 +1,81 @@
+import datetime
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.oauth_cache
+from dfp.oauth_cache import CachedServiceAccountClient, TokenCache
+
+
+class DFPOAuthCacheTests(TestCase):
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp()
+    self.cache_path = os.path.join(self.cache_dir, 'tokens.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.cache_dir)
+
+  def test_token_cache_expiry(self):
+    """
+    Ensure cached tokens are only returned while they are not about to expire.
+    """
+    token_cache = TokenCache(self.cache_path)
+    with token_cache.lock():
+      token_cache.set('my-key', 'my-token', 10000)
+
+    self.assertEqual(token_cache.get('my-key', now=5000), ('my-token', 10000))
+    self.assertIsNone(token_cache.get('my-key', now=9800))
+    self.assertIsNone(token_cache.get('other-key', now=5000))
+
+  def test_token_cache_shared(self):
+    """
+    Ensure a token stored by one cache is visible to another, e.g. one in a
+    different process.
+    """
+    with TokenCache(self.cache_path).lock():
+      TokenCache(self.cache_path).set('my-key', 'my-token', 10000)
+
+    self.assertEqual(TokenCache(self.cache_path).get('my-key', now=5000),
+      ('my-token', 10000))
+
+  @patch('googleads.oauth2.GoogleServiceAccountClient.Refresh', autospec=True)
+  @patch('google.oauth2.service_account.Credentials.from_service_account_file')
+  def test_client_reuses_cached_token(self, mock_from_file, mock_refresh):
+    """
+    Ensure a second client reuses the token retrieved by the first.
+    """
+    mock_from_file.side_effect = [MagicMock(), MagicMock()]
+
+    def refresh(oauth2_client):
+      oauth2_client.creds.token = 'fresh-token'
+      oauth2_client.creds.expiry = (
+        datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+    mock_refresh.side_effect = refresh
+
+    CachedServiceAccountClient('key.json', 'my-scope',
+      TokenCache(self.cache_path))
+    second_client = CachedServiceAccountClient('key.json', 'my-scope',
+      TokenCache(self.cache_path))
+
+    mock_refresh.assert_called_once()
+    self.assertEqual(second_client.creds.token, 'fresh-token')
+
+  @patch('googleads.dfp.DfpClient.LoadFromStorage')
+  def test_load_client_unsupported_config(self, mock_load_from_storage):
+    """
+    Ensure configurations with extra options are loaded by googleads.
+    """
+    yaml_path = os.path.join(self.cache_dir, 'googleads.yaml')
+    with open(yaml_path, 'w') as yaml_file:
+      yaml_file.write('dfp:\n'
+        '  application_name: my-app\n'
+        '  path_to_private_key_file: key.json\n'
+        'proxy_config:\n'
+        '  http: proxy:8080\n')
+
+    dfp.oauth_cache.load_client(yaml_path, self.cache_path)
+
+    mock_load_from_storage.assert_called_once_with(yaml_path)
@@ -0,0 +1,94 @@
+import threading
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.pagination
+
+
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPPaginationTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def mock_pages(self, mock_dfp_client, total, page_size, extra=0):
+    """
+    Makes getOrdersByStatement return `total` orders, then `extra` more
+    orders that appear after the total was reported.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    offsets = []
+    lock = threading.Lock()
+
+    def get_orders(statement):
+      offset = int(statement['query'].split('OFFSET ')[1])
+      with lock:
+        offsets.append(offset)
+      end = min(offset + page_size, total + extra)
+      return {
+        'totalResultSetSize': total,
+        'results': [{'id': order_id} for order_id in range(offset, end)],
+      }
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getOrdersByStatement).side_effect = get_orders
+    return offsets
+
+  def test_iter_results_in_order(self, mock_dfp_client):
+    """
+    Ensure every result is yielded once, in order, when pages are fetched
+    concurrently.
+    """
+    offsets = self.mock_pages(mock_dfp_client, total=23, page_size=5)
+
+    results = list(dfp.pagination.iter_results('OrderService',
+      'getOrdersByStatement', page_size=5, max_workers=3))
+
+    self.assertEqual([order['id'] for order in results], list(range(23)))
+    self.assertEqual(sorted(offsets), [0, 5, 10, 15, 20])
+
+  def test_iter_results_more_than_total(self, mock_dfp_client):
+    """
+    Ensure results added after the total was reported are still yielded.
+    """
+    self.mock_pages(mock_dfp_client, total=10, page_size=5, extra=7)
+
+    results = list(dfp.pagination.iter_results('OrderService',
+      'getOrdersByStatement', page_size=5, max_workers=2))
+
+    self.assertEqual([order['id'] for order in results], list(range(17)))
+
+  def test_iter_results_query(self, mock_dfp_client):
+    """
+    Ensure the query, bind variables and page size are used.
+    """
+    self.mock_pages(mock_dfp_client, total=2, page_size=10)
+    values = [{'key': 'name', 'value': {'xsi_type': 'TextValue', 'value': 'a'}}]
+
+    list(dfp.pagination.iter_results('OrderService', 'getOrdersByStatement',
+      query='WHERE name = :name', values=values, page_size=10))
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getOrdersByStatement.assert_called_once_with({
+        'query': 'WHERE name = :name ORDER BY id ASC LIMIT 10 OFFSET 0',
+        'values': values,
+      }))
+
+  def test_iter_results_keeps_order(self, mock_dfp_client):
+    """
+    Ensure a query's own ORDER BY is kept.
+    """
+    self.mock_pages(mock_dfp_client, total=2, page_size=10)
+
+    list(dfp.pagination.iter_results('OrderService', 'getOrdersByStatement',
+      query='order by name desc', page_size=10))
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getOrdersByStatement.assert_called_once_with({
+        'query': 'order by name desc LIMIT 10 OFFSET 0',
+        'values': None,
+      }))
@@ -0,0 +1,118 @@
+import threading
+import time
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+from dfp.rate_limiter import (
+  RateLimitedService,
+  RateLimiter,
+  get_rate_limiter,
+  is_quota_error,
+)
+
+
+class QuotaFault(Exception):
+
+  def __init__(self, error_string):
+    super(QuotaFault, self).__init__('[{0} @ ]'.format(error_string))
+    self.errors = [{'errorString': error_string}]
+
+
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPRateLimiterTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def test_is_quota_error(self, mock_dfp_client):
+    """
+    Ensure quota errors are told apart from other errors.
+    """
+    self.assertTrue(is_quota_error(QuotaFault('QuotaError.EXCEEDED_QUOTA')))
+    self.assertTrue(is_quota_error(
+      Exception('[QuotaError.EXCEEDED_QUOTA @ ]')))
+    self.assertFalse(is_quota_error(QuotaFault('ApiError.UNKNOWN')))
+    self.assertFalse(is_quota_error(ValueError('nope')))
+
+  def test_adaptive_concurrency(self, mock_dfp_client):
+    """
+    Ensure quota errors halve the concurrency limit, and successful requests
+    restore it gradually.
+    """
+    limiter = RateLimiter(max_concurrency=8)
+
+    def exceed_quota():
+      raise QuotaFault('QuotaError.EXCEEDED_QUOTA')
+
+    for _ in range(2):
+      with self.assertRaises(QuotaFault):
+        limiter.call(exceed_quota)
+    self.assertEqual(limiter.concurrency_limit, 2)
+    self.assertEqual(limiter.num_quota_errors, 2)
+
+    limiter.call(lambda: None)
+    self.assertEqual(limiter.concurrency_limit, 2.5)
+    for _ in range(100):
+      limiter.call(lambda: None)
+    self.assertEqual(limiter.concurrency_limit, 8)
+
+  def test_concurrency_limit(self, mock_dfp_client):
+    """
+    Ensure no more requests than the limit run at once.
+    """
+    limiter = RateLimiter(max_concurrency=2)
+    lock = threading.Lock()
+    counts = {'running': 0, 'max': 0}
+
+    def request():
+      with lock:
+        counts['running'] += 1
+        counts['max'] = max(counts['max'], counts['running'])
+      time.sleep(0.01)
+      with lock:
+        counts['running'] -= 1
+
+    threads = [threading.Thread(target=limiter.call, args=(request,))
+      for _ in range(6)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(counts['max'], 2)
+    self.assertEqual(limiter.num_requests, 6)
+    self.assertGreater(limiter.num_throttled, 0)
+
+  def test_token_bucket(self, mock_dfp_client):
+    """
+    Ensure requests beyond the burst wait for tokens, and the wait is
+    reported.
+    """
+    limiter = RateLimiter(requests_per_second=50, max_concurrency=4)
+
+    start = time.time()
+    for _ in range(60):
+      limiter.call(lambda: None)
+
+    # 50 requests fit in the burst; the other 10 take about 0.2 seconds.
+    self.assertGreaterEqual(time.time() - start, 0.15)
+    self.assertGreaterEqual(limiter.wait_seconds, 0.15)
+    self.assertIn(u'60 DFP requests', limiter.summary())
+
+  def test_get_service_is_rate_limited(self, mock_dfp_client):
+    """
+    Ensure service calls go through the network's shared rate limiter.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    mock_service = mock_dfp_client.return_value.GetService.return_value
+    mock_service.getUsersByStatement.return_value = {'results': []}
+
+    service = dfp.client.get_service('UserService')
+
+    self.assertIsInstance(service, RateLimitedService)
+    self.assertEqual(service.getUsersByStatement('statement'),
+      {'results': []})
+    mock_service.getUsersByStatement.assert_called_once_with('statement')
+    self.assertEqual(get_rate_limiter().num_requests, 1)
@@ -0,0 +1,162 @@
+import socket
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.create_line_items
+from dfp.exceptions import BatchItemErrors
+from dfp.retry import (
+  call_with_bisection,
+  call_with_retries,
+  is_item_error,
+  is_retryable_error,
+)
+
+
+class DFPFault(Exception):
+
+  def __init__(self, *api_errors):
+    super(DFPFault, self).__init__(', '.join(
+      '[{0} @ {1}]'.format(error_string, field_path)
+      for error_string, field_path in api_errors))
+    self.errors = [{'errorString': error_string, 'fieldPath': field_path}
+      for error_string, field_path in api_errors]
+
+
+@patch('time.sleep')
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPRetryTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def test_classify_errors(self, mock_dfp_client, mock_sleep):
+    """
+    Ensure transient errors are retryable, and item errors are told apart
+    from errors about the whole request.
+    """
+    self.assertTrue(is_retryable_error(
+      DFPFault(('ServerError.SERVER_ERROR', ''))))
+    self.assertTrue(is_retryable_error(socket.timeout()))
+    self.assertFalse(is_retryable_error(socket.timeout(), idempotent=False))
+    self.assertTrue(is_retryable_error(
+      DFPFault(('QuotaError.EXCEEDED_QUOTA', '')), idempotent=False))
+    self.assertFalse(is_retryable_error(
+      DFPFault(('UniqueError.NOT_UNIQUE', 'lineItem[2].name'))))
+    self.assertFalse(is_retryable_error(ValueError('bad')))
+
+    self.assertTrue(is_item_error(
+      DFPFault(('UniqueError.NOT_UNIQUE', 'lineItem[2].name'))))
+    self.assertFalse(is_item_error(
+      DFPFault(('PermissionError.PERMISSION_DENIED', ''))))
+
+  @patch.multiple('settings', DFP_MAX_RETRIES=2, create=True)
+  def test_call_with_retries(self, mock_dfp_client, mock_sleep):
+    """
+    Ensure transient errors are retried with backoff up to the limit, and
+    permanent errors are not retried.
+    """
+    func = MagicMock(side_effect=[DFPFault(('ServerError.SERVER_ERROR', '')),
+      'ok'])
+    self.assertEqual(call_with_retries(func, 1, key='value'), 'ok')
+    self.assertEqual(func.call_count, 2)
+    func.assert_called_with(1, key='value')
+    self.assertEqual(mock_sleep.call_count, 1)
+
+    func = MagicMock(side_effect=DFPFault(('ServerError.SERVER_ERROR', '')))
+    with self.assertRaises(DFPFault):
+      call_with_retries(func)
+    self.assertEqual(func.call_count, 3)
+
+    func = MagicMock(side_effect=DFPFault(('AuthenticationError.X', '')))
+    with self.assertRaises(DFPFault):
+      call_with_retries(func)
+    self.assertEqual(func.call_count, 1)
+
+  def test_network_errors_only_retried_for_reads(self, mock_dfp_client,
+    mock_sleep):
+    """
+    Ensure a service retries reads after network errors, but not creates,
+    which DFP may have done already.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    proxy = mock_dfp_client.return_value.GetService.return_value
+    proxy.getLineItemsByStatement.side_effect = [socket.timeout(),
+      {'results': []}]
+    proxy.createLineItems.side_effect = socket.timeout()
+
+    service = dfp.client.get_service('LineItemService')
+    self.assertEqual(service.getLineItemsByStatement({'query': ''}),
+      {'results': []})
+    self.assertEqual(proxy.getLineItemsByStatement.call_count, 2)
+
+    with self.assertRaises(socket.timeout):
+      service.createLineItems([{'name': 'a'}])
+    self.assertEqual(proxy.createLineItems.call_count, 1)
+
+  def test_call_with_bisection(self, mock_dfp_client, mock_sleep):
+    """
+    Ensure a batch with bad items still creates the good ones, and reports
+    each bad item.
+    """
+    bad_items = set([2, 5])
+    requests = []
+
+    def create(items):
+      requests.append(list(items))
+      for position, item in enumerate(items):
+        if item in bad_items:
+          raise DFPFault(('UniqueError.NOT_UNIQUE',
+            'lineItem[{0}].name'.format(position)))
+      return [item * 10 for item in items]
+
+    with self.assertRaises(BatchItemErrors) as context:
+      call_with_bisection(create, list(range(8)))
+
+    self.assertEqual(context.exception.results,
+      [0, 10, None, 30, 40, None, 60, 70])
+    self.assertEqual([(position, item) for position, item, _
+      in context.exception.failures], [(2, 2), (5, 5)])
+    self.assertLess(len(requests), 16)
+
+    self.assertEqual(call_with_bisection(create, [0, 1]), [0, 10])
+
+  def test_call_with_bisection_whole_request_error(self, mock_dfp_client,
+    mock_sleep):
+    """
+    Ensure an error about the whole request is raised without bisecting.
+    """
+    create = MagicMock(side_effect=DFPFault(
+      ('PermissionError.PERMISSION_DENIED', '')))
+    with self.assertRaises(DFPFault):
+      call_with_bisection(create, list(range(8)))
+    create.assert_called_once()
+
+  def test_create_line_items_retries_and_bisects(self, mock_dfp_client,
+    mock_sleep):
+    """
+    Ensure line item creation survives a transient error and a bad item.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    service = mock_dfp_client.return_value.GetService.return_value
+    responses = [DFPFault(('ServerError.SERVER_ERROR', ''))]
+
+    def create_line_items(line_items):
+      if responses:
+        raise responses.pop()
+      for position, line_item in enumerate(line_items):
+        if line_item['name'] == 'bad':
+          raise DFPFault(('UniqueError.NOT_UNIQUE',
+            'lineItem[{0}].name'.format(position)))
+      return [{'id': line_item['name']} for line_item in line_items]
+
+    service.createLineItems.side_effect = create_line_items
+
+    self.assertEqual(dfp.create_line_items.create_line_items(
+      [{'name': 'a'}, {'name': 'b'}], max_workers=1), ['a', 'b'])
+
+    with self.assertRaises(BatchItemErrors) as context:
+      dfp.create_line_items.create_line_items(
+        [{'name': 'c'}, {'name': 'bad'}, {'name': 'd'}], max_workers=1)
+    self.assertEqual(context.exception.results, ['c', None, 'd'])
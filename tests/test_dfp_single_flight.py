@@ -0,0 +1,123 @@
+import threading
+import time
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+from dfp.single_flight import SingleFlight, get_single_flight
+
+
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPSingleFlightTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def test_coalesces_concurrent_calls(self, mock_dfp_client):
+    """
+    Ensure identical calls in flight at the same time make one call, and
+    each caller gets its own copy of the result.
+    """
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def read():
+      calls.append(1)
+      release.wait(timeout=5)
+      return {'results': [1, 2]}
+
+    def caller():
+      results.append(single_flight.call('key', read))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    while not calls:
+      time.sleep(0.001)
+    waiters = [threading.Thread(target=caller) for _ in range(3)]
+    for waiter in waiters:
+      waiter.start()
+    while single_flight.num_requests < 4:
+      time.sleep(0.001)
+    release.set()
+    leader.join()
+    for waiter in waiters:
+      waiter.join()
+
+    self.assertEqual(len(calls), 1)
+    self.assertEqual(results, [{'results': [1, 2]}] * 4)
+    self.assertEqual(len(set(id(result) for result in results)), 4)
+    self.assertEqual(single_flight.num_hits, 3)
+    self.assertEqual(single_flight.num_merges, 1)
+
+    # Calls made after the first one finished are made again.
+    single_flight.call('key', read)
+    self.assertEqual(len(calls), 2)
+
+  def test_shares_errors(self, mock_dfp_client):
+    """
+    Ensure callers waiting for a failed call get its error.
+    """
+    single_flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def read():
+      release.wait(timeout=5)
+      raise ValueError('bad statement')
+
+    def caller():
+      try:
+        single_flight.call('key', read)
+      except ValueError as error:
+        errors.append(error)
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in threads:
+      thread.start()
+    while single_flight.num_requests < 3:
+      time.sleep(0.001)
+    release.set()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(len(errors), 3)
+
+  def test_get_service_coalesces_reads(self, mock_dfp_client):
+    """
+    Ensure identical statement reads from different threads share one
+    request, and other service calls don't.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    service = mock_dfp_client.return_value.GetService.return_value
+    release = threading.Event()
+
+    def get_keys(statement):
+      release.wait(timeout=5)
+      return {'results': [{'id': 1}]}
+
+    service.getCustomTargetingKeysByStatement.side_effect = get_keys
+    statement = {'query': 'WHERE name = :name', 'values': [
+      {'key': 'name', 'value': {'value': 'hb_pb'}}]}
+
+    def read():
+      dfp.client.get_service('CustomTargetingService') \
+        .getCustomTargetingKeysByStatement(statement)
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+      thread.start()
+    while get_single_flight().num_requests < 2:
+      time.sleep(0.001)
+    release.set()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(service.getCustomTargetingKeysByStatement.call_count, 1)
+    self.assertEqual(get_single_flight().num_hits, 1)
+
+    dfp.client.get_service('CustomTargetingService').createCustomTargetingKeys(
+      [])
+    self.assertEqual(get_single_flight().num_requests, 2)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.update_line_items
+
+
+@patch('googleads.dfp.DfpClient.LoadFromStorage')
+class DFPUpdateLineItemsTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+
+  def test_update_line_items_batches(self, mock_dfp_client):
+    """
+    Ensure line items are updated in batches.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    update_line_items = (mock_dfp_client.return_value
+      .GetService.return_value
+      .updateLineItems)
+    update_line_items.side_effect = lambda line_items: line_items
+
+    line_items = [{'id': line_item_id} for line_item_id in range(5)]
+    updated_ids = dfp.update_line_items.update_line_items(line_items,
+      batch_size=2, max_workers=1)
+
+    self.assertEqual(updated_ids, [0, 1, 2, 3, 4])
+    self.assertEqual(update_line_items.call_count, 3)
+
+  def test_archive_line_items(self, mock_dfp_client):
+    """
+    Ensure line items are archived by ID, in batches.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    perform_line_item_action = (mock_dfp_client.return_value
+      .GetService.return_value
+      .performLineItemAction)
+    perform_line_item_action.side_effect = [
+      {'numChanges': 2},
+      {'numChanges': 1},
+    ]
+
+    num_archived = dfp.update_line_items.archive_line_items([11, 22, 33],
+      batch_size=2)
+
+    self.assertEqual(num_archived, 3)
+    perform_line_item_action.assert_any_call({'xsi_type': 'ArchiveLineItems'},
+      {'query': 'WHERE id IN (11, 22) LIMIT 500 OFFSET 0', 'values': None})
+    perform_line_item_action.assert_any_call({'xsi_type': 'ArchiveLineItems'},
+      {'query': 'WHERE id IN (33) LIMIT 500 OFFSET 0', 'values': None})
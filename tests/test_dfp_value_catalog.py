@@ -0,0 +1,61 @@
+import io
+from unittest import TestCase
+
+from dfp.value_catalog import ValueCatalog
+
+
+class DFPValueCatalogTests(TestCase):
+
+  def test_lookup(self):
+    """
+    Ensure values can be looked up by name, and the first of several values
+    with the same name is kept.
+    """
+    catalog = ValueCatalog(987654, [('0.10', 11), ('0.20', 12), ('0.10', 13)])
+
+    self.assertEqual(len(catalog), 2)
+    self.assertEqual(catalog['0.10'], 11)
+    self.assertEqual(catalog.get('0.20'), 12)
+    self.assertIsNone(catalog.get('0.30'))
+    self.assertIn('0.20', catalog)
+    self.assertNotIn('0.30', catalog)
+
+    catalog.update({'0.30': 14})
+    catalog['0.20'] = 15
+    self.assertEqual(list(catalog.items()),
+      [('0.10', 11), ('0.20', 15), ('0.30', 14)])
+
+  def test_dump_and_load(self):
+    """
+    Ensure a catalog is the same after writing it and reading it back.
+    """
+    catalog = ValueCatalog(987654,
+      [(u'0.10', 11), (u'caf\xe9', 123456789012), (u'', 13)])
+    catalog_file = io.BytesIO()
+    catalog.dump(catalog_file)
+    catalog_file.seek(0)
+
+    loaded = ValueCatalog.load(catalog_file)
+
+    self.assertEqual(loaded.key_id, 987654)
+    self.assertEqual(list(loaded.items()), list(catalog.items()))
+
+  def test_dump_and_load_empty(self):
+    """
+    Ensure an empty catalog without a key can be written and read back.
+    """
+    catalog_file = io.BytesIO()
+    ValueCatalog().dump(catalog_file)
+    catalog_file.seek(0)
+
+    loaded = ValueCatalog.load(catalog_file)
+
+    self.assertIsNone(loaded.key_id)
+    self.assertEqual(len(loaded), 0)
+
+  def test_dump_rejects_newlines(self):
+    """
+    Ensure names that would corrupt the file are rejected.
+    """
+    with self.assertRaises(ValueError):
+      ValueCatalog(1, [(u'a\nb', 1)]).dump(io.BytesIO())
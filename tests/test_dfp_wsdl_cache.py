@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.wsdl_cache
+from dfp.wsdl_cache import WsdlCache
+
+
+WSDL_URL = ('https://ads.google.com/apis/ads/publisher/v201802/'
+  'LineItemService?wsdl')
+
+class DFPWsdlCacheTests(TestCase):
+
+  def setUp(self):
+    dfp.client.reset_client()
+    self.cache_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.cache_dir)
+
+  def test_cache_by_version(self):
+    """
+    Ensure documents are stored in one file per API version.
+    """
+    wsdl_cache = WsdlCache(self.cache_dir)
+    wsdl_cache.add(WSDL_URL, b'<definitions/>')
+    wsdl_cache.add('http://www.w3.org/2001/xml.xsd', b'<schema/>')
+
+    self.assertEqual(wsdl_cache.get(WSDL_URL), b'<definitions/>')
+    self.assertTrue(os.path.exists(wsdl_cache.get_path('v201802')))
+    self.assertTrue(os.path.exists(wsdl_cache.get_path('common')))
+
+    # The documents survive a new cache instance, e.g. a new process.
+    self.assertEqual(WsdlCache(self.cache_dir).get(WSDL_URL),
+      b'<definitions/>')
+
+  def test_clear(self):
+    """
+    Ensure clearing a version removes its documents.
+    """
+    wsdl_cache = WsdlCache(self.cache_dir)
+    wsdl_cache.add(WSDL_URL, b'<definitions/>')
+    wsdl_cache.clear('v201802')
+
+    self.assertIsNone(wsdl_cache.get(WSDL_URL))
+
+  @patch('googleads.dfp.DfpClient.LoadFromStorage')
+  def test_client_uses_cache(self, mock_dfp_client):
+    """
+    Ensure the loaded client uses the WSDL cache from settings.
+    """
+    mock_dfp_client.return_value = MagicMock(soap_impl='zeep')
+
+    with patch('settings.DFP_WSDL_CACHE_DIR', self.cache_dir):
+      dfp_client = dfp.client.get_client()
+
+    self.assertIsInstance(dfp_client.cache, WsdlCache)
+    self.assertEqual(dfp_client.cache.cache_dir, self.cache_dir)
+
+  @patch('googleads.dfp.DfpClient.LoadFromStorage')
+  def test_client_cache_disabled(self, mock_dfp_client):
+    """
+    Ensure the client keeps its default cache when the setting is None.
+    """
+    mock_dfp_client.return_value = MagicMock(soap_impl='zeep', cache=None)
+
+    with patch('settings.DFP_WSDL_CACHE_DIR', None):
+      dfp_client = dfp.client.get_client()
+
+    self.assertIsNone(dfp_client.cache)
+
+  @patch('googleads.dfp.DfpClient.LoadFromStorage')
+  def test_warm_up(self, mock_dfp_client):
+    """
+    Ensure warming up creates each service cold and warm.
+    """
+    mock_dfp_client.return_value = MagicMock(soap_impl='zeep')
+
+    with patch('settings.DFP_WSDL_CACHE_DIR', self.cache_dir):
+      timings = dfp.wsdl_cache.warm_up(['OrderService', 'UserService'])
+
+    self.assertEqual([timing[0] for timing in timings],
+      ['OrderService', 'UserService'])
+    self.assertEqual(
+      mock_dfp_client.return_value.GetService.call_count, 4)
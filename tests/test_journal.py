@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+import tasks.journal
+from tasks.journal import SetupJournal
+
+
+class JournalTests(TestCase):
+
+  def setUp(self):
+    self.journal_dir = tempfile.mkdtemp()
+    self.journal_path = os.path.join(self.journal_dir, 'run.jsonl')
+
+  def tearDown(self):
+    shutil.rmtree(self.journal_dir)
+
+  def test_replay(self):
+    """
+    Ensure replaying a journal rebuilds the objects the run created.
+    """
+    journal = SetupJournal(self.journal_path)
+    journal.start(order_name='My Order')
+    journal.record('order', order_id=123, order_name='My Order')
+    journal.record('creatives', creative_ids=[4, 5])
+    journal.record('targeting_values', key_name='hb_pb',
+      values={'0.10': 11, '0.20': 12})
+    journal.record('line_items', names=['a', 'b'], ids=[21, 22])
+    journal.record('licas', line_item_ids=[21])
+
+    state = SetupJournal(self.journal_path).replay()
+
+    self.assertEqual(state.order_id, 123)
+    self.assertEqual(state.order_ids, {'My Order': 123})
+    self.assertEqual(state.creative_ids, [4, 5])
+    self.assertEqual(state.value_ids, {'hb_pb': {'0.10': 11, '0.20': 12}})
+    self.assertEqual(state.line_item_ids, {'a': 21, 'b': 22})
+    self.assertEqual(state.associated_line_item_ids, set([21]))
+    self.assertFalse(state.done)
+
+  def test_replay_ignores_incomplete_entry(self):
+    """
+    Ensure a partially written last entry doesn't prevent resuming.
+    """
+    journal = SetupJournal(self.journal_path)
+    journal.start()
+    journal.record('order', order_id=123)
+    with open(self.journal_path, 'a') as journal_file:
+      journal_file.write('{"event": "creat')
+
+    self.assertEqual(journal.replay().order_id, 123)
+
+  def test_start_discards_previous_run(self):
+    """
+    Ensure starting a journal discards the previous run's entries.
+    """
+    journal = SetupJournal(self.journal_path)
+    journal.start()
+    journal.record('order', order_id=123)
+    journal.start()
+
+    self.assertIsNone(journal.replay().order_id)
+
+  def test_get_journal_path(self):
+    """
+    Ensure the journal path is based on the bidder code and order name.
+    """
+    with patch('settings.DFP_JOURNAL_DIR', '/tmp/journals', create=True):
+      self.assertEqual(
+        tasks.journal.get_journal_path('My Order/1', 'rubicon'),
+        '/tmp/journals/rubicon-My_Order_1.jsonl')
+    with patch('settings.DFP_JOURNAL_DIR', None, create=True):
+      self.assertIsNone(tasks.journal.get_journal_path('My Order', 'rubicon'))
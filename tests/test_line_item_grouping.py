@@ -0,0 +1,54 @@
+
+from unittest import TestCase
+
+from tasks.line_item_grouping import (
+  GroupingReport,
+  get_grouping_tradeoff,
+  get_tradeoff_summary_string,
+  group_prices,
+)
+from tasks.price_utils import get_price_table
+
+
+class LineItemGroupingTests(TestCase):
+
+  def test_group_prices(self):
+    """
+    It groups consecutive prices within the maximum rounding error of each
+    group's lowest price.
+    """
+    prices = [0, 10000, 20000, 30000, 40000, 50000, 100000, 150000]
+    self.assertEqual(group_prices(prices, 20000),
+      [[0, 1, 2], [3, 4, 5], [6], [7]])
+    self.assertEqual(group_prices(prices, 0),
+      [[position] for position in range(len(prices))])
+    self.assertEqual(group_prices([], 20000), [])
+
+  def test_grouping_report(self):
+    """
+    It reports the line item count and the rounding errors.
+    """
+    prices = [0, 10000, 20000, 30000]
+    report = GroupingReport(prices, group_prices(prices, 10000), 10000)
+    self.assertEqual(report.num_prices, 4)
+    self.assertEqual(report.num_line_items, 2)
+    self.assertEqual(report.max_error, 10000)
+    self.assertEqual(report.mean_error, 5000.0)
+    self.assertEqual(report.summary(),
+      u'max error 0.01: 2 line items (actual max error 0.01, mean error '
+      '0.0050)')
+
+  def test_grouping_tradeoff(self):
+    """
+    It cuts the line items of a dense granularity by an order of magnitude
+    at a rounding error of $0.50.
+    """
+    prices = get_price_table('dense')
+    reports = get_grouping_tradeoff(prices, [500000, 0, 500000])
+    self.assertEqual([report.max_rounding_error for report in reports],
+      [0, 500000])
+    self.assertEqual(reports[0].num_line_items, 425)
+    self.assertLessEqual(reports[1].num_line_items, 42)
+    self.assertLessEqual(reports[1].max_error, 500000)
+    self.assertEqual(len(get_tradeoff_summary_string(reports).split(u'\n')),
+      2)
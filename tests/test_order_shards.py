@@ -0,0 +1,50 @@
+
+from unittest import TestCase
+
+from mock import patch
+
+from dfp.exceptions import BadSettingException
+from tasks.order_shards import (
+  get_max_line_items_per_order,
+  get_num_shards,
+  get_shard_order_names,
+  split_line_items,
+)
+
+
+class OrderShardsTests(TestCase):
+
+  def test_get_num_shards(self):
+    """
+    It returns the number of orders needed for the line items.
+    """
+    self.assertEqual(get_num_shards(0, 450), 1)
+    self.assertEqual(get_num_shards(450, 450), 1)
+    self.assertEqual(get_num_shards(451, 450), 2)
+    self.assertEqual(get_num_shards(2001, 450), 5)
+
+  @patch('settings.DFP_MAX_LINE_ITEMS_PER_ORDER', 0, create=True)
+  def test_bad_max_line_items_setting(self):
+    """
+    It defaults to 450 line items per order, and rejects a negative limit.
+    """
+    self.assertEqual(get_max_line_items_per_order(), 450)
+    with patch('settings.DFP_MAX_LINE_ITEMS_PER_ORDER', -1):
+      with self.assertRaises(BadSettingException):
+        get_max_line_items_per_order()
+
+  def test_get_shard_order_names(self):
+    """
+    It keeps the order name for a single order, and numbers several.
+    """
+    self.assertEqual(get_shard_order_names(u'Prebid', 1), [u'Prebid'])
+    self.assertEqual(get_shard_order_names(u'Prebid', 3),
+      [u'Prebid (1/3)', u'Prebid (2/3)', u'Prebid (3/3)'])
+
+  def test_split_line_items(self):
+    """
+    It splits line items into consecutive runs of nearly equal size.
+    """
+    self.assertEqual(split_line_items(list(range(7)), 3),
+      [[0, 1, 2], [3, 4], [5, 6]])
+    self.assertEqual(split_line_items([], 1), [[]])
@@ -1,12 +1,19 @@
 
 from unittest import TestCase
 
+from mock import patch
+
+from dfp.exceptions import BadSettingException
 from tasks.price_utils import (
   num_to_micro_amount,
   num_to_str,
+  get_custom_price_table,
   get_prices_array,
   get_prices_summary_string,
+  get_price_table,
+  is_price_granularity,
   micro_amount_to_num,
+  PriceTable,
 )
 
 
@@ -148,6 +155,61 @@ class UtilsTests(TestCase):
     }
     self.assertEqual(len(get_prices_array(config)), 1501)
 
+  @patch('settings.PREBID_PRICE_PRECISION', 2, create=True)
+  def test_get_prices_array_bucket_list(self):
+    """
+    It returns every bucket's prices up to its max, using each bucket's own
+    precision.
+    """
+
+    config = [
+      {
+        'min' : 0,
+        'max' : 0.5,
+        'increment': 0.25,
+      },
+      {
+        'precision': 3,
+        'min' : 0.5,
+        'max' : 0.53,
+        'increment': 0.005,
+      },
+      {
+        'min' : 0.53,
+        'max' : 0.7,
+        'increment': 0.01,
+      },
+    ]
+    self.assertEqual(
+      get_prices_array(config),
+      [0, 250000, 500000, 505000, 510000, 515000, 520000, 525000, 530000,
+        540000, 550000, 560000, 570000, 580000, 590000, 600000, 610000,
+        620000, 630000, 640000, 650000, 660000, 670000, 680000, 690000]
+    )
+
+  def test_get_prices_array_bad_buckets(self):
+    """
+    It throws an exception for overlapping, unordered or zero-increment
+    buckets.
+    """
+
+    overlapping = [
+      {'min': 0, 'max': 5, 'increment': 0.1},
+      {'min': 4, 'max': 10, 'increment': 0.5},
+    ]
+    with self.assertRaises(BadSettingException):
+      get_prices_array(overlapping)
+
+    unordered = [
+      {'min': 5, 'max': 10, 'increment': 0.5},
+      {'min': 0, 'max': 5, 'increment': 0.1},
+    ]
+    with self.assertRaises(BadSettingException):
+      get_prices_array(unordered)
+
+    with self.assertRaises(BadSettingException):
+      get_prices_array([{'min': 0, 'max': 5, 'increment': 0.001}])
+
   def test_get_prices_summary_string(self):
     """
     It returns the expected string summary of the array.
@@ -171,3 +233,61 @@ class UtilsTests(TestCase):
         precision=4),
       '8.2200, 8.0600, 8.4271, 8.0000'
     )
+
+  def test_get_price_table(self):
+    """
+    It returns the prices of Prebid's named granularities, up to and
+    including each one's cap.
+    """
+    low = get_price_table('low')
+    self.assertEqual(len(low), 11)
+    self.assertEqual(low[0], 0)
+    self.assertEqual(low[-1], 5000000)
+    self.assertEqual(low.price_strs[:3], ('0.00', '0.50', '1.00'))
+
+    dense = get_price_table('dense')
+    self.assertEqual(len(dense), 425)
+    self.assertEqual(dense[-1], 20000000)
+    self.assertEqual(list(dense),
+      sorted(set(dense)))
+
+    # Tables are only computed once.
+    self.assertIs(get_price_table('low'), low)
+
+    with self.assertRaises(BadSettingException):
+      get_price_table('ultra')
+
+  def test_is_price_granularity(self):
+    """
+    It only accepts the names of Prebid's granularities.
+    """
+    self.assertTrue(is_price_granularity('medium'))
+    self.assertFalse(is_price_granularity('ultra'))
+    self.assertFalse(is_price_granularity([{'min': 0, 'max': 5,
+      'increment': 0.5}]))
+    self.assertFalse(is_price_granularity({'min': 0, 'max': 5,
+      'increment': 0.5}))
+
+  def test_price_table_line_item_names(self):
+    """
+    It names a line item for each price, and reuses the names.
+    """
+    table = PriceTable([0, 500000, 1250000])
+    names = table.get_line_item_names(u'mybidder: HB $')
+    self.assertEqual(names, (u'mybidder: HB $0.00', u'mybidder: HB $0.50',
+      u'mybidder: HB $1.25'))
+    self.assertIs(table.get_line_item_names(u'mybidder: HB $'), names)
+
+  def test_custom_price_table_precision(self):
+    """
+    It formats the prices of each bucket with the bucket's precision.
+    """
+    table = get_custom_price_table([
+      {'min': 0, 'max': 0.02, 'increment': 0.005, 'precision': 3},
+      {'min': 0.02, 'max': 0.1, 'increment': 0.04},
+    ])
+    self.assertEqual(table.prices, (0, 5000, 10000, 15000, 20000, 60000))
+    self.assertEqual(table.price_strs,
+      ('0.000', '0.005', '0.010', '0.015', '0.02', '0.06'))
+    self.assertEqual(get_prices_summary_string(table),
+      '0.000, 0.005, 0.010, ... 0.015, 0.02, 0.06')
@@ -0,0 +1,124 @@
+from unittest import TestCase
+from mock import patch
+
+import tasks.reconcile_line_items
+from dfp.create_line_items import create_line_item_config
+
+
+key_ids = {'hb_bidder': 1, 'hb_pb': 2, 'hb_size': 3}
+sizes = [{'width': '300', 'height': '250'}]
+pb_value_ids = {100000: 21, 200000: 22, 300000: 23}
+
+def make_config(cpm, name=None, placement_ids=[555], line_item_sizes=sizes,
+  bidder_value_id=11):
+  return create_line_item_config(
+    name=name or 'bidder: HB ${0}'.format(cpm),
+    order_id=1234,
+    use_placements=True,
+    placement_ids=placement_ids,
+    ad_unit_ids=[],
+    cpm_micro_amount=cpm,
+    sizes=line_item_sizes,
+    hb_bidder_key_id=1,
+    hb_pb_key_id=2,
+    hb_size_key_id=3,
+    hb_bidder_value_id=bidder_value_id,
+    hb_pb_value_id=pb_value_ids[cpm],
+    hb_size_value_ids=[31],
+  )
+
+def make_line_item(line_item_id, cpm, **kwargs):
+  line_item = make_config(cpm, **kwargs)
+  line_item['id'] = line_item_id
+  return line_item
+
+
+class ReconcileLineItemsTests(TestCase):
+
+  def test_plan_unchanged(self):
+    """
+    Ensure line items that already match are left alone, even when DFP
+    returns sizes as numbers.
+    """
+    existing = make_line_item(901, 100000,
+      line_item_sizes=[{'width': 300, 'height': 250}])
+
+    plan = tasks.reconcile_line_items.plan_line_items([make_config(100000)],
+      [existing], key_ids)
+
+    self.assertEqual(plan.creates, [])
+    self.assertEqual(plan.updates, [])
+    self.assertEqual(plan.archive_ids, [])
+    self.assertEqual(plan.num_unchanged, 1)
+
+  def test_plan_changes(self):
+    """
+    Ensure the plan creates missing line items, updates changed ones and
+    archives ones that are no longer needed.
+    """
+    existing = [
+      make_line_item(901, 100000, placement_ids=[444]),
+      make_line_item(902, 300000),
+      make_line_item(903, 300000, name='duplicate'),
+    ]
+    desired = [make_config(100000), make_config(200000), make_config(300000)]
+
+    plan = tasks.reconcile_line_items.plan_line_items(desired, existing,
+      key_ids)
+
+    self.assertEqual(plan.creates, [desired[1]])
+    self.assertEqual([line_item['id'] for line_item in plan.updates], [901])
+    self.assertEqual(
+      plan.updates[0]['targeting']['inventoryTargeting'],
+      {'targetedPlacementIds': [555]})
+    self.assertEqual(plan.archive_ids, [903])
+    self.assertEqual(plan.num_unchanged, 1)
+
+  def test_plan_leaves_other_bidders_and_sizes(self):
+    """
+    Ensure line items for other bidders or sizes in the order are neither
+    archived nor updated.
+    """
+    leaderboard = [{'width': '728', 'height': '90'}]
+    existing = [
+      make_line_item(100, 100000, line_item_sizes=leaderboard),
+      make_line_item(200, 100000, bidder_value_id=12,
+        line_item_sizes=leaderboard),
+      make_line_item(300, 200000),
+      make_line_item(400, 300000, line_item_sizes=leaderboard),
+    ]
+    desired = [make_config(100000, line_item_sizes=leaderboard)]
+
+    plan = tasks.reconcile_line_items.plan_line_items(desired, existing,
+      key_ids)
+
+    self.assertEqual(plan.creates, [])
+    self.assertEqual(plan.updates, [])
+    self.assertEqual(plan.archive_ids, [400])
+    self.assertEqual(plan.num_unchanged, 1)
+    self.assertEqual(plan.num_other, 2)
+
+  @patch('dfp.update_line_items.archive_line_items')
+  @patch('dfp.update_line_items.update_line_items')
+  @patch('dfp.get_line_items.get_line_items_by_order_id')
+  def test_reconcile_line_items(self, mock_get_line_items, mock_update,
+    mock_archive):
+    """
+    Ensure reconciling applies updates and archives and returns the line
+    items to create.
+    """
+    mock_get_line_items.return_value = [
+      make_line_item(901, 100000, name='old name'),
+      make_line_item(902, 300000),
+    ]
+    desired = [make_config(100000), make_config(200000)]
+
+    to_create = tasks.reconcile_line_items.reconcile_line_items(1234, desired,
+      key_ids)
+
+    self.assertEqual(to_create, [desired[1]])
+    mock_get_line_items.assert_called_once_with(1234)
+    updated = mock_update.call_args[0][0]
+    self.assertEqual([line_item['name'] for line_item in updated],
+      [desired[0]['name']])
+    mock_archive.assert_called_once_with([902])